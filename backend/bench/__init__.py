@@ -0,0 +1 @@
+"""Offline benchmarks for the watcher pipeline (run from `backend/`)."""
@@ -0,0 +1,81 @@
+"""Benchmark: IVF approximate search vs brute force for DocIndex queries.
+
+Usage (from `backend/`):
+    python -m bench.ann --rows 50000 200000 --nprobe 1 4 8 16 32
+
+For each corpus size, reports brute-force latency, IVF build time, and for
+each `nprobe` the recall@10 against the exact ranking and the per-query
+latency. Also times incremental inserts and deletes of 1% of the rows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from bench.vector_store import make_vectors
+from rag.ann import IVFIndex
+
+
+def run(rows: int, dim: int, queries: int, k: int, nprobes: List[int]) -> List[Dict]:
+    vectors = make_vectors(rows, dim)
+    q = make_vectors(queries, dim, seed=11)
+
+    t0 = time.perf_counter()
+    exact = np.argpartition(-(q @ vectors.T), k - 1, axis=1)[:, :k]
+    brute_ms = (time.perf_counter() - t0) * 1000 / queries
+
+    t0 = time.perf_counter()
+    index = IVFIndex(dim, min_rows=0)
+    index.add(list(range(rows)), vectors)
+    build_s = time.perf_counter() - t0
+
+    results = []
+    for nprobe in nprobes:
+        t0 = time.perf_counter()
+        ids, _ = index.search(q, k, nprobe=nprobe)
+        ms = (time.perf_counter() - t0) * 1000 / queries
+        got = [[index.key_of[i] for i in row if i >= 0] for row in ids.tolist()]
+        recall = np.mean([len(set(g) & set(e)) / k for g, e in zip(got, exact.tolist())])
+        results.append(
+            {
+                "rows": rows,
+                "lists": len(index.centroids),
+                "nprobe": nprobe,
+                f"recall@{k}": round(float(recall), 4),
+                "ivf_query_ms": round(ms, 3),
+                "brute_query_ms": round(brute_ms, 3),
+                "build_s": round(build_s, 2),
+            }
+        )
+
+    churn = max(1, rows // 100)
+    t0 = time.perf_counter()
+    index.remove(list(range(churn)))
+    delete_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    index.add(list(range(churn)), vectors[:churn])
+    insert_ms = (time.perf_counter() - t0) * 1000
+    results.append({"rows": rows, "churn_rows": churn, "delete_ms": round(delete_ms, 2), "insert_ms": round(insert_ms, 2)})
+    return results
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="*", default=[50000, 200000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args(argv)
+    for n in args.rows:
+        for row in run(n, args.dim, args.queries, args.k, args.nprobe):
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
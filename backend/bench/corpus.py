@@ -0,0 +1,153 @@
+"""Seeded synthetic Markdown corpora and edit streams for benchmarks.
+
+`Corpus` writes nothing; its `texts` are {filename: text} so callers
+decide where (and whether) the docs land on disk. Everything is derived
+from `seed`, so two runs with the same arguments produce identical docs
+and identical edits, which keeps results comparable across commits.
+
+Filenames are single 8-letter pseudo-words (``tokamiru.md``), and filler
+words are at most 7 letters. A doc name therefore only shows up in
+another doc's text where the generator put a reference, so the graph's
+edge count follows `refs` instead of chance keyword hits.
+"""
+
+from __future__ import annotations
+
+import itertools
+import random
+import re
+from typing import Dict, List, Optional, Tuple
+
+CONSONANTS = "bdfgklmnprstvz"
+VOWELS = "aeiou"
+EDIT_PATTERNS = ("numeric", "append", "remove", "rewrite", "burst", "mixed")
+NUMERIC_FACTS = (
+    "Requests are handled within {n} days.",
+    "The window is {n} days from delivery.",
+    "Agents escalate after {n} hours.",
+    "Limit is {n} items per order.",
+)
+
+
+def doc_names(n_docs: int, seed: int = 7) -> List[str]:
+    """`n_docs` distinct 8-letter filenames (4 consonant-vowel syllables)."""
+    syllables = [c + v for c in CONSONANTS for v in VOWELS]
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < n_docs:
+        names.add("".join(rng.choices(syllables, k=4)))
+    return [f"{name}.md" for name in sorted(names, key=lambda _: rng.random())]
+
+
+class Corpus:
+    """Generated docs plus the state needed to produce consistent edits.
+
+    `refs` is the mean number of references per doc. Targets are drawn
+    with Zipf-like weights (`skew`), so a few hub docs collect many
+    dependents, as policy docs do in real folders. `implicit` is the share
+    of references written as the bare name (``tokamiru``) instead of the
+    filename (``tokamiru.md``).
+    """
+
+    def __init__(
+        self,
+        n_docs: int,
+        refs: float = 3.0,
+        paragraphs: Tuple[int, int] = (3, 8),
+        words: Tuple[int, int] = (20, 60),
+        skew: float = 1.0,
+        implicit: float = 0.2,
+        seed: int = 7,
+    ):
+        self.rng = random.Random(seed)
+        self.refs = refs
+        self.paragraphs = paragraphs
+        self.words = words
+        self.implicit = implicit
+        self.names = doc_names(n_docs, seed)
+        self.vocab = ["".join(self.rng.choices("abcdefghijklmnopqrstuvwxyz", k=self.rng.randint(3, 7))) for _ in range(5000)]
+        # hub docs first: weight of rank r is 1 / (r + 1) ** skew
+        self._cum_weights = list(itertools.accumulate(1.0 / (r + 1) ** skew for r in range(n_docs)))
+        self.texts: Dict[str, str] = {fn: self._doc(fn) for fn in self.names}
+
+    def pick_docs(self, k: int) -> List[str]:
+        """`k` docs drawn with the hub weights (repeats possible)."""
+        return self.rng.choices(self.names, cum_weights=self._cum_weights, k=k)
+
+    def new_doc(self) -> Tuple[str, str]:
+        """A doc under a name not in `texts` yet, possibly referencing others; added to `texts`."""
+        syllables = [c + v for c in CONSONANTS for v in VOWELS]
+        fn = None
+        while fn is None or fn in self.texts:
+            fn = "".join(self.rng.choices(syllables, k=4)) + ".md"
+        self.texts[fn] = self._doc(fn)
+        return fn, self.texts[fn]
+
+    def _paragraph(self, source: Optional[str] = None, n_refs: int = 0) -> str:
+        rng = self.rng
+        words = rng.choices(self.vocab, k=rng.randint(*self.words))
+        for target in self.pick_docs(n_refs) if n_refs else ():
+            if target == source:
+                continue
+            stem = target[:-3]
+            mention = stem if rng.random() < self.implicit else f"see {target}"
+            words.insert(rng.randrange(len(words) + 1), mention)
+        text = " ".join(words).capitalize() + "."
+        if rng.random() < 0.5:
+            text += " " + rng.choice(NUMERIC_FACTS).format(n=rng.randint(2, 90))
+        return text
+
+    def _doc(self, fn: str) -> str:
+        rng = self.rng
+        n_pars = rng.randint(*self.paragraphs)
+        # Poisson-ish reference count around `refs`, spread over paragraphs
+        n_refs = sum(rng.random() < self.refs / (2 * n_pars) for _ in range(2 * n_pars))
+        spread = [0] * n_pars
+        for _ in range(n_refs):
+            spread[rng.randrange(n_pars)] += 1
+        title = f"# {fn[:-3].capitalize()}"
+        return "\n\n".join([title] + [self._paragraph(fn, k) for k in spread]) + "\n"
+
+    def edits(self, pattern: str, count: int, burst_size: int = 20) -> List[Dict[str, str]]:
+        """`count` successive edit bursts, each {filename: new_text}.
+
+        Patterns: "numeric" changes one number, "append" adds a paragraph,
+        "remove" drops one, "rewrite" replaces one with new text, "burst"
+        makes numeric edits to `burst_size` docs at once, and "mixed"
+        picks one of the single-doc patterns per burst. Edits build on each
+        other and update `texts`.
+        """
+        if pattern not in EDIT_PATTERNS:
+            raise ValueError(f"unknown edit pattern {pattern!r}")
+        bursts = []
+        for _ in range(count):
+            kind = self.rng.choice(EDIT_PATTERNS[:4]) if pattern == "mixed" else pattern
+            if kind == "burst":
+                targets = list(dict.fromkeys(self.pick_docs(burst_size)))
+                burst = {fn: self._edit(fn, "numeric") for fn in targets}
+            else:
+                fn = self.pick_docs(1)[0]
+                burst = {fn: self._edit(fn, kind)}
+            self.texts.update(burst)
+            bursts.append(burst)
+        return bursts
+
+    def _edit(self, fn: str, kind: str) -> str:
+        rng = self.rng
+        title, *pars = self.texts[fn].rstrip("\n").split("\n\n")
+        if kind == "numeric":
+            candidates = [i for i, p in enumerate(pars) if re.search(r"\d", p)]
+            if not candidates:
+                pars.append(self._paragraph(fn))
+            else:
+                i = rng.choice(candidates)
+                old = re.findall(r"\d+", pars[i])[-1]
+                new = str(rng.choice([n for n in range(2, 91) if str(n) != old]))
+                pars[i] = re.sub(r"\d+(?=\D*$)", new, pars[i])
+        elif kind == "append" or not pars:
+            pars.append(self._paragraph(fn, rng.randint(0, 1)))
+        elif kind == "remove":
+            pars.pop(rng.randrange(len(pars)))
+        else:
+            pars[rng.randrange(len(pars))] = self._paragraph(fn, rng.randint(0, 1))
+        return "\n\n".join([title] + pars) + "\n"
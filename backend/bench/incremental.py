@@ -0,0 +1,162 @@
+"""Check: the incrementally updated graph equals a fresh build.
+
+Usage (from `backend/`):
+    python -m bench.incremental                       # 300 docs, 30 bursts
+    python -m bench.incremental --docs 1000 --bursts 50 --pattern numeric
+
+A seeded `bench.corpus.Corpus` is written to a temp folder and one
+`DependencyGraph` is built over it, semantic layer included, with the
+`bench.pipeline.HashingModel` stub and exact search. The stub scores
+unrelated docs far below the real model, so `SEMANTIC_THRESHOLD` is
+lowered to `--threshold` to get semantic links at all. Each burst then
+edits docs with the corpus edit pattern, and every `--churn`th burst also
+deletes `--delete` docs and adds `--add` new ones. The long-lived graph
+takes the burst through `apply_batch`; a second graph is built from
+scratch over the same folder and its edges, the reverse index behind
+`edges_to` and the patched `reverse_csr` must be identical (confidences
+within 1e-5), and the kept `n_edges` must match the edge list.
+
+Prints one JSON line per mismatching burst and a summary with the
+incremental update and full build times; exits 1 on any mismatch.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from bench.corpus import EDIT_PATTERNS, Corpus
+from bench.pipeline import HashingModel, _summary, _write
+
+TOLERANCE = 1e-5
+
+
+def _edges(graph) -> Dict[Tuple[str, str], Tuple[str, float]]:
+    return {(e["from_doc"], e["to_doc"]): (e["ref_type"], e["confidence"]) for e in graph.edges()}
+
+
+def _diff(got: Dict, want: Dict) -> List[Dict]:
+    out = []
+    for key in sorted(got.keys() | want.keys()):
+        a, b = got.get(key), want.get(key)
+        if a is None or b is None or a[0] != b[0] or abs(a[1] - b[1]) > TOLERANCE:
+            out.append({"edge": list(key), "incremental": a, "full": b})
+    return out
+
+
+def _same_csr(a, b) -> bool:
+    return (
+        a.names == b.names
+        and np.array_equal(a.indptr, b.indptr)
+        and np.array_equal(a.indices, b.indices)
+        and np.allclose(a.weights, b.weights, atol=TOLERANCE)
+    )
+
+
+def run(args) -> int:
+    from doc_watcher import DependencyGraph
+    from rag.doc_index import DocIndex
+    from rag.embedding_cache import EmbeddingCache
+    from rag.model_service import EmbeddingService
+
+    rng = random.Random(args.seed)
+    corpus = Corpus(args.docs, seed=args.seed)
+    bursts = corpus.edits(args.pattern, args.bursts)
+    mismatches = 0
+    times: Dict[str, List[float]] = {"incremental": [], "full": []}
+    with tempfile.TemporaryDirectory(prefix="bench-incremental-") as tmp:
+        docs_dir = os.path.join(tmp, "docs")
+        os.makedirs(docs_dir)
+        _write(docs_dir, corpus.texts)
+        model = HashingModel(args.dim)
+        service = EmbeddingService("bench-hashing", loader=lambda name: model)
+
+        def index_factory(cache_name: str):
+            def make_index(path: str, texts=None) -> DocIndex:
+                cache = EmbeddingCache(
+                    "bench-hashing",
+                    emb_file=os.path.join(tmp, cache_name + ".npz"),
+                    meta_file=os.path.join(tmp, cache_name + ".json"),
+                )
+                return DocIndex(
+                    path, model_name="bench-hashing", service=service, storage="memory", search="exact", cache=cache, texts=texts
+                )
+
+            return make_index
+
+        graph = DependencyGraph(docs_dir, index_factory=index_factory("live"))
+        on_disk = set(corpus.texts)
+        for i, burst in enumerate(bursts):
+            _write(docs_dir, burst)
+            updated, removed = set(burst), set()
+            if args.churn and (i + 1) % args.churn == 0:
+                for fn in rng.sample(sorted(on_disk - updated), min(args.delete, len(on_disk - updated))):
+                    os.remove(os.path.join(docs_dir, fn))
+                    removed.add(fn)
+                for _ in range(args.add):
+                    fn, text = corpus.new_doc()
+                    _write(docs_dir, {fn: text})
+                    updated.add(fn)
+            on_disk = (on_disk | updated) - removed
+
+            t0 = time.perf_counter()
+            graph.apply_batch(updated=sorted(updated), removed=sorted(removed))
+            times["incremental"].append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            full = DependencyGraph(docs_dir, index_factory=index_factory("full"))
+            times["full"].append(time.perf_counter() - t0)
+
+            diff = _diff(_edges(graph), _edges(full))
+            for fn in sorted(on_disk):
+                got = {e["from_doc"]: (e["ref_type"], e["confidence"]) for e in graph.edges_to(fn)}
+                want = {e["from_doc"]: (e["ref_type"], e["confidence"]) for e in full.edges_to(fn)}
+                if _diff(got, want):
+                    diff.append({"edges_to": fn})
+            if not _same_csr(graph.reverse_csr(), full.reverse_csr()):
+                diff.append({"reverse_csr": True})
+            if graph.n_edges != len(graph.edges()):
+                diff.append({"n_edges": graph.n_edges, "edges": len(graph.edges())})
+            if diff:
+                mismatches += 1
+                print(json.dumps({"burst": i, "updated": len(updated), "removed": len(removed), "diff": diff[:10]}))
+
+        result = {
+            "docs": len(on_disk),
+            "bursts": len(bursts),
+            "edges": len(graph.edges()),
+            "semantic_edges": sum(1 for e in graph.edges() if e["ref_type"] == "semantic"),
+            "mismatches": mismatches,
+            "apply_batch": _summary(times["incremental"]),
+            "full_build": _summary(times["full"]),
+        }
+    print(json.dumps(result))
+    return mismatches
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, default=300)
+    ap.add_argument("--bursts", type=int, default=30)
+    ap.add_argument("--pattern", choices=EDIT_PATTERNS, default="mixed")
+    ap.add_argument("--churn", type=int, default=3, help="add and delete docs every N bursts (0: never)")
+    ap.add_argument("--add", type=int, default=2)
+    ap.add_argument("--delete", type=int, default=2)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--threshold", type=float, default=0.25, help="SEMANTIC_THRESHOLD for the run")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    os.environ["SEMANTIC_THRESHOLD"] = str(args.threshold)
+    if run(args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
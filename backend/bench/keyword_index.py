@@ -0,0 +1,115 @@
+"""Benchmark: implicit keyword matching, legacy loop vs `KeywordIndex`.
+
+Usage (from `backend/`):
+    python -m bench.keyword_index            # 1k and 10k docs
+    python -m bench.keyword_index --docs 1000 --strict
+
+The legacy loop is O(docs x filenames), so at 10k docs it is timed on a
+sample of source docs and extrapolated; the index results are checked
+against the legacy results on that sample.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+from ref_index import KeywordIndex, name_keywords
+
+TOPICS = (
+    "refund policy support script faq shipping warranty terms customer order "
+    "return days window email template agent escalation billing invoice account"
+).split()
+
+
+def make_corpus(n_docs: int, seed: int = 7) -> Dict[str, str]:
+    """Seeded synthetic corpus: filenames from 1-3 topic terms, filler text
+    from a large pseudo-word vocabulary with occasional topic terms."""
+    rng = random.Random(seed)
+    topics = TOPICS + [f"{t}{i}" for t in TOPICS for i in range(20)]
+    filler = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9))) for _ in range(5000)]
+    texts = {}
+    for i in range(n_docs):
+        stem = "_".join(rng.sample(topics, rng.randint(1, 3)))
+        fn = f"{stem}-{i}.md"
+        paragraphs = []
+        for _ in range(rng.randint(2, 6)):
+            words = rng.choices(filler, k=rng.randint(20, 60))
+            words += rng.choices(topics, k=rng.randint(0, 3))
+            rng.shuffle(words)
+            paragraphs.append(" ".join(words))
+        texts[fn] = "\n\n".join(paragraphs).lower()
+    return texts
+
+
+def legacy_implicit(fn: str, lowered: str, name_keys: Dict[str, set]) -> Dict[str, int]:
+    # the loop build_dependencies used before the inverted index
+    out = {}
+    for candidate, keys in name_keys.items():
+        if candidate == fn:
+            continue
+        match_count = sum(1 for k in keys if k and k in lowered)
+        if len(keys) > 0 and match_count >= max(1, len(keys) // 3):
+            out[candidate] = match_count
+    return out
+
+
+def indexed_implicit(fn: str, index: KeywordIndex) -> Dict[str, int]:
+    out = {}
+    for candidate, match_count in index.match_counts(fn).items():
+        n_keys = len(index.keywords(candidate))
+        if candidate != fn and match_count >= max(1, n_keys // 3):
+            out[candidate] = match_count
+    return out
+
+
+def run(n_docs: int, sample: int, strict: bool) -> Dict:
+    texts = make_corpus(n_docs)
+    names = list(texts)
+    sampled = names[: min(sample, n_docs)]
+
+    name_keys = {fn: name_keywords(fn) for fn in names}
+    t0 = time.perf_counter()
+    legacy = {fn: legacy_implicit(fn, texts[fn], name_keys) for fn in sampled}
+    legacy_s = (time.perf_counter() - t0) * n_docs / len(sampled)
+
+    t0 = time.perf_counter()
+    index = KeywordIndex(texts, strict=strict)
+    for fn in names:
+        index.add_name(fn)
+    for fn in names:
+        index.set_doc(fn, texts[fn])
+    build_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    indexed = {fn: indexed_implicit(fn, index) for fn in names}
+    query_s = time.perf_counter() - t0
+
+    result = {
+        "docs": n_docs,
+        "strict": strict,
+        "legacy_full_pass_s": round(legacy_s, 3),
+        "legacy_extrapolated": len(sampled) < n_docs,
+        "index_build_s": round(build_s, 3),
+        "index_query_all_s": round(query_s, 3),
+        "speedup": round(legacy_s / max(build_s + query_s, 1e-9), 1),
+    }
+    if not strict:
+        result["matches_legacy_on_sample"] = all(indexed[fn] == legacy[fn] for fn in sampled)
+    return result
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, nargs="*", default=[1000, 10000])
+    parser.add_argument("--sample", type=int, default=500, help="legacy loop sample size")
+    parser.add_argument("--strict", action="store_true", help="word-boundary keyword mode")
+    args = parser.parse_args(argv)
+    for n in args.docs:
+        print(json.dumps(run(n, args.sample, args.strict)))
+
+
+if __name__ == "__main__":
+    main()
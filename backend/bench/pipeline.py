@@ -0,0 +1,300 @@
+"""Benchmark: the change pipeline end to end on synthetic corpora.
+
+Usage (from `backend/`):
+    python -m bench.pipeline                               # 100, 1k and 10k docs
+    python -m bench.pipeline --docs 50000 --edits 20 --semantic-max-docs 0
+    python -m bench.pipeline --refs 6 --pattern burst --out new.json --compare old.json
+
+For each corpus size a seeded `bench.corpus.Corpus` is written to a temp
+folder, the dependency graph and `DocIndex` are built from scratch, and a
+stream of edit bursts is replayed through the same steps as
+`handle_change_batch`: `detect_changes`, the incremental graph update
+(`build_dependencies`), `resolve_impacts`, the snapshot save, and the
+enrichment (fast path, else the fake LLM). Per stage it reports the mean,
+p50, p95 and max in ms; `end_to_end` is file written -> enriched event.
+
+Embeddings come from `HashingModel`, a feature-hashing stub, and the LLM is
+`FakeLLM` with no latency, so the run is offline and deterministic apart
+from timings. The semantic layer (a full pass at build, then
+`SemanticLayer.update` per burst) is skipped above `--semantic-max-docs`;
+the result records whether it ran.
+
+Each size runs in a fresh process so `peak_rss_mb` is that run's own high
+water mark. Results are printed as JSON lines; `--out` also writes them
+with run metadata, and `--compare` diffs them against an earlier file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+from bench.corpus import EDIT_PATTERNS, Corpus
+
+WORD = re.compile(r"\w+")
+
+
+class HashingModel:
+    """Stub sentence encoder: signed feature hashing of lowercased words.
+
+    Deterministic and offline; texts that share words get similar vectors,
+    so the semantic layer still finds (and misses) links realistically.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._slots: Dict[str, tuple] = {}
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD.findall(text.lower()):
+                slot = self._slots.get(word)
+                if slot is None:
+                    h = zlib.crc32(word.encode("utf-8"))
+                    slot = self._slots[word] = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+                out[row, slot[0]] += slot[1]
+        return out
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _summary(samples: List[float]) -> Dict:
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(_pct(ms, 0.5), 3),
+        "p95_ms": round(_pct(ms, 0.95), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _write(docs_dir: str, texts: Dict[str, str]) -> None:
+    for fn, text in texts.items():
+        with open(os.path.join(docs_dir, fn), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def run(n_docs: int, args) -> Dict:
+    """One corpus size, start to finish (runs in its own process)."""
+    from doc_watcher import DependencyGraph, detect_changes, resolve_impacts
+    from rag.doc_index import DocIndex
+    from rag.embedding_cache import EmbeddingCache
+    from rag.fake_llm import FakeLLM
+    from rag.fast_path import FastPathClassifier
+    from rag.model_service import EmbeddingService
+    from state_store import StateStore
+
+    started = time.perf_counter()
+    corpus = Corpus(n_docs, refs=args.refs, paragraphs=tuple(args.paragraphs), skew=args.skew, seed=args.seed)
+    initial = dict(corpus.texts)
+    bursts = corpus.edits(args.pattern, args.edits, burst_size=args.burst_size)
+    result: Dict = {
+        "docs": n_docs,
+        "paragraphs": sum(text.count("\n\n") for text in initial.values()),
+        "pattern": args.pattern,
+        "bursts": len(bursts),
+        "generate_s": round(time.perf_counter() - started, 3),
+    }
+    memory: Dict[str, float] = {}
+
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as tmp:
+        docs_dir = os.path.join(tmp, "docs")
+        os.makedirs(docs_dir)
+        _write(docs_dir, initial)
+
+        model = HashingModel(args.dim)
+        service = EmbeddingService("bench-hashing", loader=lambda name: model)
+        emb_file, meta_file = os.path.join(tmp, "emb.npz"), os.path.join(tmp, "emb_meta.json")
+
+        def make_index(path: str, texts=None) -> DocIndex:
+            cache = EmbeddingCache("bench-hashing", emb_file=emb_file, meta_file=meta_file)
+            return DocIndex(
+                path, model_name="bench-hashing", service=service, storage="memory", search=args.search, cache=cache, texts=texts
+            )
+
+        # DocIndex: cold (every paragraph encoded), then warm (all from the cache) and queries
+        t0 = time.perf_counter()
+        index = make_index(docs_dir)
+        result["doc_index_cold_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        t0 = time.perf_counter()
+        index = make_index(docs_dir)
+        result["doc_index_warm_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        queries = [initial[fn] for fn in corpus.pick_docs(args.queries)]
+        del initial
+        t0 = time.perf_counter()
+        index.query_many(queries, top_k=10)
+        result["doc_index_query_ms"] = round((time.perf_counter() - t0) * 1000 / len(queries), 3)
+        del index
+        memory["doc_index"] = _peak_rss_mb()
+
+        semantic = n_docs <= args.semantic_max_docs
+        result["semantic"] = semantic
+        t0 = time.perf_counter()
+        graph = DependencyGraph(docs_dir, index_factory=make_index if semantic else (lambda path, texts=None: None))
+        result["build_dependencies_full_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        result["edges"] = len(graph.edges())
+        memory["graph"] = _peak_rss_mb()
+
+        prev_state: Dict = {}
+        t0 = time.perf_counter()
+        for fn in sorted(corpus.names):
+            detect_changes(os.path.join(docs_dir, fn), prev_state)
+        result["initial_scan_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        store = StateStore(os.path.join(tmp, "state.sqlite3"))
+        store.save(prev_state)
+
+        fast_path = FastPathClassifier(embed=None)
+        llm = FakeLLM(latency=0.0)
+        stages: Dict[str, List[float]] = {
+            name: []
+            for name in ("detect_changes", "build_dependencies", "resolve_impacts", "save_state", "enrich", "end_to_end")
+        }
+        impacted = []
+        for burst in bursts:
+            _write(docs_dir, burst)
+            t_start = time.perf_counter()
+            events = []
+            for fn in burst:
+                t0 = time.perf_counter()
+                changed = detect_changes(os.path.join(docs_dir, fn), prev_state)
+                stages["detect_changes"].append(time.perf_counter() - t0)
+                if changed:
+                    events.append(changed)
+            t0 = time.perf_counter()
+            graph.apply_batch(updated=[e["changed_doc"] for e in events])
+            stages["build_dependencies"].append(time.perf_counter() - t0)
+            for changed in events:
+                t0 = time.perf_counter()
+                resolve_impacts(changed, graph, docs_dir)
+                stages["resolve_impacts"].append(time.perf_counter() - t0)
+                impacted.append(len(changed["impacted_docs"]))
+            t0 = time.perf_counter()
+            store.save(prev_state)
+            stages["save_state"].append(time.perf_counter() - t0)
+            for changed in events:
+                t0 = time.perf_counter()
+                if fast_path.classify(changed) is None:
+                    llm(changed)
+                stages["enrich"].append(time.perf_counter() - t0)
+            stages["end_to_end"].append(time.perf_counter() - t_start)
+        store.close()
+        memory["edits"] = _peak_rss_mb()
+
+    result["events"] = len(impacted)
+    result["impacted_mean"] = round(sum(impacted) / len(impacted), 2) if impacted else 0.0
+    result["fast_path_escalation_rate"] = fast_path.stats()["escalation_rate"]
+    result["stages"] = {name: _summary(samples) for name, samples in stages.items()}
+    result["peak_rss_mb"] = memory
+    result["total_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _metrics(result: Dict, prefix: str = ""):
+    """Flatten a result into (name, number) pairs for comparison."""
+    for key, value in result.items():
+        if isinstance(value, dict):
+            yield from _metrics(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield prefix + key, value
+
+
+def compare(base: Dict, new: List[Dict], tolerance: float) -> int:
+    """Print per-metric ratios new/base; returns how many exceed `tolerance`."""
+    by_docs = {r["docs"]: r for r in base["results"]}
+    regressions = 0
+    for result in new:
+        old = by_docs.get(result["docs"])
+        if old is None:
+            continue
+        old_metrics = dict(_metrics(old))
+        for name, value in _metrics(result):
+            before = old_metrics.get(name)
+            if not before or not (name.endswith("_ms") or name.startswith("peak_rss_mb.")):
+                continue
+            ratio = value / before
+            regressed = ratio > 1 + tolerance
+            regressions += regressed
+            print(json.dumps({"docs": result["docs"], "metric": name, "base": before, "new": value, "ratio": round(ratio, 3), "regressed": regressed}))
+    return regressions
+
+
+def _meta(args) -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "args": vars(args),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, nargs="+", default=[100, 1000, 10000])
+    ap.add_argument("--refs", type=float, default=3.0, help="mean references per doc")
+    ap.add_argument("--paragraphs", type=int, nargs=2, default=[3, 8], metavar=("MIN", "MAX"))
+    ap.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of reference targets")
+    ap.add_argument("--pattern", choices=EDIT_PATTERNS, default="mixed")
+    ap.add_argument("--edits", type=int, default=50, help="edit bursts per size")
+    ap.add_argument("--burst-size", type=int, default=20)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--search", choices=["exact", "ivf"], default="exact")
+    ap.add_argument("--semantic-max-docs", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="write results with run metadata to this JSON file")
+    ap.add_argument("--compare", help="earlier --out file to diff against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="ratio above 1 + tolerance counts as a regression")
+    args = ap.parse_args()
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for n_docs in args.docs:
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run, (n_docs, args))
+        print(json.dumps(result))
+        results.append(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": _meta(args), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        if compare(base, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Benchmark: import time and time to first event after a (re)start.
+
+Usage (from `backend/`):
+    python -m bench.startup                        # 2k and 20k docs
+    python -m bench.startup --docs 50000 --semantic-max-docs 0 --out startup.json
+
+Import time: each module in `MODULES` is imported in a fresh interpreter,
+with GOOGLE_API_KEY unset. The result records the ms, whether the import
+succeeded, and which heavy modules (`HEAVY`) it pulled in.
+
+Time to first event: for each corpus size a seeded `bench.corpus.Corpus`
+is written to a temp folder. Fresh processes then replay what the server
+does on start: load the state store, scan the folder and open the
+dependency graph. Each one then edits one doc and runs `handle_change_batch`
+until the event is emitted. The runs are:
+- `first_boot`: empty state store, no graph snapshot
+- `restart_rebuild`: warm state store, graph built from scratch (the
+  behaviour with GRAPH_SNAPSHOT=false)
+- `restart_snapshot`: warm state store, graph restored from the snapshot
+  the previous run saved, then revalidated
+
+`ready_ms` runs from process spawn to the graph being ready to serve, and
+`first_event_ms` to the emitted event, so interpreter start and imports
+are included. The edit is made as soon as the graph is ready, while the
+warm-up thread is still compiling the graph's matchers and, after a
+restore, rebuilding the semantic layer's paragraph index (`warm_up_ms`);
+the saved hits are reused, so no doc is queried again. The state store,
+snapshot and embedding cache live in the temp folder. Embeddings come
+from the `bench.pipeline.HashingModel` stub, and the semantic layer is
+skipped above `--semantic-max-docs`. Results are printed as JSON lines;
+`--out` also writes them to a file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from bench.corpus import Corpus
+
+MODULES = ("server", "doc_watcher", "rag.llm_runner", "rag.doc_index", "rag.model_service")
+HEAVY = ("torch", "sentence_transformers", "google.generativeai")
+RUNS = ("first_boot", "restart_rebuild", "restart_snapshot")
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+error = None
+try:
+    import {module}
+except BaseException as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+print(json.dumps({{
+    "ms": round((time.perf_counter() - started) * 1000, 1),
+    "error": error,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def _env(**extra) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}
+    env.update(extra)
+    return env
+
+
+def measure_import(module: str) -> Dict:
+    code = _IMPORT_PROBE.format(module=module, heavy=HEAVY)
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True
+    )
+    return {"module": module, **json.loads(out.stdout.strip().splitlines()[-1])}
+
+
+def child(args) -> None:
+    """One (re)start in this process: scan, open the graph, then one edit -> event."""
+    started = time.perf_counter()
+    import doc_watcher as dw
+    from bench.pipeline import HashingModel
+    from rag.doc_index import DocIndex
+    from rag.embedding_cache import EmbeddingCache
+    from rag.model_service import EmbeddingService
+
+    result: Dict = {"run": args.child, "import_ms": round((time.perf_counter() - started) * 1000, 1)}
+    docs_dir = os.path.join(args.dir, "docs")
+    cache_dir = os.path.join(args.dir, "cache")
+    snapshot_dir = os.path.join(cache_dir, "graph_snapshot")
+    # keep the run's state out of backend/.cache
+    dw.DOCS_DIR = docs_dir
+    dw.CACHE_DIR = cache_dir
+    dw.STATE_DB = os.path.join(cache_dir, "state.sqlite3")
+    dw.PREV_STATE_FILE = os.path.join(cache_dir, "prev_paragraphs.json")
+
+    model = HashingModel()
+    service = EmbeddingService("bench-hashing", loader=lambda name: model)
+
+    def make_index(path: str, texts=None):
+        if not args.semantic:
+            return None
+        cache = EmbeddingCache(
+            "bench-hashing",
+            emb_file=os.path.join(cache_dir, "emb.npz"),
+            meta_file=os.path.join(cache_dir, "emb_meta.json"),
+        )
+        return DocIndex(path, model_name="bench-hashing", service=service, storage="memory", cache=cache, texts=texts)
+
+    events: List[Dict] = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        prev = dw.load_prev_state()
+        if dw.scan_all_docs_and_update(prev) or not prev:
+            dw.save_prev_state(prev)
+        result["scan_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+        t0 = time.perf_counter()
+        graph = dw.open_dependency_graph(
+            docs_dir,
+            index_factory=make_index,
+            snapshot_dir=snapshot_dir if args.child == "restart_snapshot" else None,
+        )
+        dw._graph = graph
+        result["graph_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        result["restored"] = graph.restored
+        result["ready_at"] = time.time()
+        warm: Dict = {}
+
+        def warm_up():
+            # as the server's warm-up thread does; the embedding model here is the stub
+            t = time.perf_counter()
+            graph.compile()
+            graph.prepare_semantic()
+            warm["warm_up_ms"] = round((time.perf_counter() - t) * 1000, 1)
+
+        warm_thread = threading.Thread(target=warm_up, daemon=True)
+        warm_thread.start()
+
+        path = os.path.join(docs_dir, args.edit)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"\n\nRevised on restart ({args.child}): limits apply per account.\n")
+        t0 = time.perf_counter()
+        dw.handle_change_batch([path], prev, on_event=events.append)
+        result["event_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        result["event_at"] = time.time()
+        result["events"] = len(events)
+        warm_thread.join()
+        result.update(warm)
+
+        # saved for the next run, not part of the time to first event
+        t0 = time.perf_counter()
+        graph.save_snapshot(snapshot_dir)
+        result["snapshot_save_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        dw.get_state_store().close()
+    print(json.dumps(result))
+
+
+def run(n_docs: int, args) -> Dict:
+    """All restart scenarios for one corpus size, each in a fresh process."""
+    corpus = Corpus(n_docs, seed=args.seed)
+    edits = corpus.pick_docs(len(RUNS))
+    result: Dict = {"docs": n_docs, "semantic": n_docs <= args.semantic_max_docs}
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as tmp:
+        docs_dir = os.path.join(tmp, "docs")
+        os.makedirs(docs_dir)
+        for fn, text in corpus.texts.items():
+            with open(os.path.join(docs_dir, fn), "w", encoding="utf-8") as f:
+                f.write(text)
+        for name, edit in zip(RUNS, edits):
+            cmd = [sys.executable, "-m", "bench.startup", "--child", name, "--dir", tmp, "--edit", edit]
+            if result["semantic"]:
+                cmd.append("--semantic")
+            spawned = time.time()
+            out = subprocess.run(cmd, cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True)
+            run_result = json.loads(out.stdout.strip().splitlines()[-1])
+            run_result["ready_ms"] = round((run_result.pop("ready_at") - spawned) * 1000, 1)
+            run_result["first_event_ms"] = round((run_result.pop("event_at") - spawned) * 1000, 1)
+            del run_result["run"]
+            result[name] = run_result
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--docs", type=int, nargs="+", default=[2000, 20000])
+    ap.add_argument("--semantic-max-docs", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="write results to this JSON file")
+    # internal: one restart scenario, run by `run` in a fresh interpreter
+    ap.add_argument("--child", choices=RUNS, help=argparse.SUPPRESS)
+    ap.add_argument("--dir", help=argparse.SUPPRESS)
+    ap.add_argument("--edit", help=argparse.SUPPRESS)
+    ap.add_argument("--semantic", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    results = []
+    for module in MODULES:
+        result = {"import": measure_import(module)}
+        print(json.dumps(result))
+        results.append(result)
+    for n_docs in args.docs:
+        result = run(n_docs, args)
+        print(json.dumps(result))
+        results.append(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
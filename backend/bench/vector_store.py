@@ -0,0 +1,112 @@
+"""Benchmark: quantized mmap vector store vs in-memory float32 vectors.
+
+Usage (from `backend/`):
+    python -m bench.vector_store --rows 100000 --dim 384
+
+Reports recall@10 of float16 / int8 scoring against the exact float32
+ranking, query latency, and memory: the float32 path holds the matrix and
+a `meta` list of dicts in process, while the store keeps vectors and texts
+in files that every process maps from the shared page cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+import numpy as np
+
+from rag.vector_store import DTYPES, MmapVectorStore
+
+
+def make_vectors(rows: int, dim: int, clusters: int = 256, seed: int = 7) -> np.ndarray:
+    """Normalized vectors around random centroids (embeddings are clustered)."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vecs = centroids[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def make_texts(rows: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    words = ["refund", "policy", "support", "days", "customer", "window", "order", "shipping", "warranty"]
+    return [" ".join(rng.choices(words, k=rng.randint(15, 60))) for _ in range(rows)]
+
+
+def top_k(sims: np.ndarray, k: int) -> np.ndarray:
+    part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    return part
+
+
+def run(rows: int, dim: int, queries: int, k: int) -> List[Dict]:
+    vectors = make_vectors(rows, dim)
+    texts = make_texts(rows)
+    docs = [f"doc_{i // 20}.md" for i in range(rows)]
+    q = make_vectors(queries, dim, seed=11)
+
+    tracemalloc.start()
+    meta = [{"doc": d, "text": t} for d, t in zip(docs, texts)]
+    meta_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    exact = top_k(q @ vectors.T, k)
+    base_ms = (time.perf_counter() - t0) * 1000 / queries
+    results = [
+        {
+            "backend": "float32 (in memory)",
+            "rows": rows,
+            "dim": dim,
+            "process_bytes": int(vectors.nbytes + meta_bytes),
+            "shared_file_bytes": 0,
+            f"recall@{k}": 1.0,
+            "query_ms": round(base_ms, 3),
+        }
+    ]
+    del meta
+
+    tmp = tempfile.mkdtemp()
+    try:
+        for dtype in DTYPES:
+            store = MmapVectorStore.write(f"{tmp}/{dtype}", vectors, texts, docs, dtype=dtype)
+            t0 = time.perf_counter()
+            approx = top_k(store.scores(q), k)
+            ms = (time.perf_counter() - t0) * 1000 / queries
+            recall = np.mean([len(set(a) & set(e)) / k for a, e in zip(approx.tolist(), exact.tolist())])
+            results.append(
+                {
+                    "backend": f"{dtype} (mmap store)",
+                    "rows": rows,
+                    "dim": dim,
+                    # only the small header lives on the heap; the rest is mapped
+                    "process_bytes": len(json.dumps(store.header)),
+                    "shared_file_bytes": int(store.nbytes),
+                    f"recall@{k}": round(float(recall), 4),
+                    "query_ms": round(ms, 3),
+                }
+            )
+            del store
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args(argv)
+    for row in run(args.rows, args.dim, args.queries, args.k):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Load test: websocket fan-out, sequential broadcast vs `ConnectionManager`.
+
+Usage (from `backend/`):
+    python -m bench.ws_fanout                       # 1000 clients
+    python -m bench.ws_fanout --clients 1000 --events 200 --slow 0.02 --dead 0.01 --policy disconnect
+
+Simulated clients stand in for browsers: each `send_text` awaits a
+per-client latency (fast clients ~0-2 ms, `--slow` share 50 ms) and a
+`--dead` share raise like a closed socket. Events are published at a fixed
+rate. Reports, per mode, how long publishing blocks the event loop, the
+delivery latency seen by fast clients (p50/p99), the time until every fast
+client has every event, and the manager's drop/prune counters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from event_log import encode_event
+from server import ConnectionManager
+
+
+class SimClient:
+    def __init__(self, latency: float, dead: bool):
+        self.latency = latency
+        self.dead = dead
+        self.received = 0
+        self.delays: List[float] = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        self.dead = True
+
+    async def send_text(self, text: str):
+        if self.dead:
+            raise RuntimeError("websocket closed")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.received += 1
+        self.delays.append(time.perf_counter() - json.loads(text)["t"])
+
+    async def send_json(self, message: dict):
+        await self.send_text(encode_event(message))
+
+
+class SequentialManager:
+    """The previous broadcast: await each client in turn, swallow errors."""
+
+    def __init__(self):
+        self.active_connections: List = []
+
+    def register(self, websocket) -> None:
+        self.active_connections.append(websocket)
+
+    async def broadcast(self, message: dict):
+        for connection in self.active_connections:
+            try:
+                await connection.send_json(message)
+            except Exception:
+                pass
+
+
+def make_clients(n: int, slow: float, dead: float, seed: int = 7) -> List[SimClient]:
+    rng = random.Random(seed)
+    clients = []
+    for _ in range(n):
+        r = rng.random()
+        if r < dead:
+            clients.append(SimClient(0.0, True))
+        elif r < dead + slow:
+            clients.append(SimClient(0.05, False))
+        else:
+            clients.append(SimClient(rng.uniform(0, 0.002), False))
+    return clients
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run(mode: str, args) -> Dict:
+    clients = make_clients(args.clients, args.slow, args.dead)
+    fast = [c for c in clients if not c.dead and c.latency < 0.05]
+    if mode == "sequential":
+        manager = SequentialManager()
+    else:
+        manager = ConnectionManager(max_queue=args.queue, slow_policy=args.policy)
+    for c in clients:
+        manager.register(c)
+
+    blocked: List[float] = []
+    started = time.perf_counter()
+    for i in range(args.events):
+        message = {"type": "change", "seq": i, "t": time.perf_counter(), "pad": "x" * args.payload}
+        t0 = time.perf_counter()
+        await manager.broadcast(message)
+        blocked.append(time.perf_counter() - t0)
+        await asyncio.sleep(1 / args.rate)
+    while any(c.received < args.events for c in fast) and time.perf_counter() - started < args.timeout:
+        await asyncio.sleep(0.01)
+    done = time.perf_counter() - started
+
+    delays = [d for c in fast for d in c.delays]
+    result = {
+        "mode": mode,
+        "clients": args.clients,
+        "events": args.events,
+        "publish_ms_p50": round(_pct(blocked, 0.5) * 1000, 3),
+        "publish_ms_max": round(max(blocked) * 1000, 3),
+        "fast_delivery_ms_p50": round(_pct(delays, 0.5) * 1000, 2),
+        "fast_delivery_ms_p99": round(_pct(delays, 0.99) * 1000, 2),
+        "fast_complete": sum(c.received >= args.events for c in fast),
+        "fast_clients": len(fast),
+        "seconds_to_complete": round(done, 3),
+    }
+    if isinstance(manager, ConnectionManager):
+        result.update({k: v for k, v in manager.stats().items() if k != "queued"})
+        for websocket in manager.active_connections:
+            manager.disconnect(websocket)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=1000)
+    ap.add_argument("--events", type=int, default=100)
+    ap.add_argument("--rate", type=float, default=50.0, help="events per second")
+    ap.add_argument("--payload", type=int, default=512, help="padding bytes per event")
+    ap.add_argument("--slow", type=float, default=0.02, help="share of 50 ms clients")
+    ap.add_argument("--dead", type=float, default=0.01, help="share of closed sockets")
+    ap.add_argument("--queue", type=int, default=256)
+    ap.add_argument("--policy", choices=["drop", "disconnect"], default="drop")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--modes", nargs="+", default=["sequential", "manager"])
+    args = ap.parse_args()
+    for mode in args.modes:
+        print(json.dumps(asyncio.run(run(mode, args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""Parallel cold start: read, split and hash the docs folder on a process pool.
+
+On first boot (or after a bulk change), every doc has to be read, split
+into paragraphs and hashed before the graph and the embedding index can
+be built. Done one file at a time, this takes minutes for tens of
+thousands of docs. `scan_files` spreads the work over
+`BOOTSTRAP_WORKERS` processes, in chunks of `BOOTSTRAP_CHUNK` files. It
+yields each chunk's results as soon as the chunk finishes, so the caller
+can stream them into the state store while the pool keeps working.
+
+`EmbeddingPrefetch` hands the paragraphs that the embedding cache does
+not hold yet to the shared embedding batcher, on a background thread. The
+first `DocIndex` build then only loads vectors.
+
+`progress` records the current phase (scan, embed, graph, ready) and its
+counts. It is reported on the console, by the server's `/indexing`
+endpoint and to websocket clients.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+BOOTSTRAP_WORKERS = int(os.environ.get("BOOTSTRAP_WORKERS", "0"))  # 0: one per CPU
+BOOTSTRAP_CHUNK = int(os.environ.get("BOOTSTRAP_CHUNK", "256"))
+# below this many files to read, a process pool costs more than it saves
+BOOTSTRAP_MIN_DOCS = int(os.environ.get("BOOTSTRAP_MIN_DOCS", "2000"))
+# how often streamed scan results are committed to the state store
+BOOTSTRAP_FLUSH_S = 2.0
+PROGRESS_INTERVAL_S = 1.0
+
+# (doc, fingerprint, [(paragraph, md5)], [(index paragraph, md5)] or None when identical)
+ScanResult = Tuple[str, Optional[Dict], Optional[List[Tuple[str, str]]], Optional[List[Tuple[str, str]]]]
+
+
+def bootstrap_workers() -> int:
+    return BOOTSTRAP_WORKERS if BOOTSTRAP_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+class BootstrapProgress:
+    """Phase and counts of the cold-start indexing, shared with the server.
+
+    Listeners get a `snapshot()` on every phase change and at most every
+    `interval` seconds while a phase advances.
+    """
+
+    def __init__(self, interval: float = PROGRESS_INTERVAL_S, echo: bool = True):
+        self.interval = interval
+        self.echo = echo
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Dict], None]] = []
+        self.phase = "idle"
+        self.done = 0
+        self.total = 0
+        self._started = time.monotonic()
+        self._phase_started = self._started
+        self._reported = 0.0
+
+    def subscribe(self, listener: Callable[[Dict], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def start(self, phase: str, total: int, done: int = 0) -> None:
+        with self._lock:
+            if self.phase in ("idle", "ready"):
+                self._started = time.monotonic()
+            self.phase, self.done, self.total = phase, done, total
+            self._phase_started = time.monotonic()
+        self._report(force=True)
+
+    def advance(self, n: int = 1) -> None:
+        with self._lock:
+            self.done += n
+            due = self.done >= self.total or time.monotonic() - self._reported >= self.interval
+        if due:
+            self._report()
+
+    def finish(self) -> None:
+        with self._lock:
+            self.phase, self.done, self.total = "ready", 0, 0
+        self._report(force=True)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "phase": self.phase,
+                "done": self.done,
+                "total": self.total,
+                "phase_s": round(now - self._phase_started, 2),
+                "elapsed_s": round(now - self._started, 2),
+                "ready": self.phase in ("idle", "ready"),
+            }
+
+    def _report(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._reported < self.interval and self.done < self.total:
+                return
+            self._reported = now
+            listeners = list(self._listeners)
+        snap = self.snapshot()
+        if self.echo:
+            if snap["ready"]:
+                print(f"Indexing ready after {snap['elapsed_s']:.1f}s")
+            else:
+                pct = f" ({snap['done'] * 100 // snap['total']}%)" if snap["total"] else ""
+                print(f"Indexing [{snap['phase']}] {snap['done']}/{snap['total']}{pct} {snap['phase_s']:.1f}s")
+        for listener in listeners:
+            try:
+                listener(snap)
+            except Exception:
+                # a failing listener must not stop the indexing
+                pass
+
+
+progress = BootstrapProgress()
+
+
+def _scan_chunk(docs_dir: str, names: List[str]) -> List[ScanResult]:
+    # runs in a worker process; same splitting and hashing as the watcher
+    from doc_watcher import md5_text, split_paragraphs
+    from rag.embedding_cache import index_paragraphs
+
+    out: List[ScanResult] = []
+    for fn in names:
+        path = os.path.join(docs_dir, fn)
+        try:
+            st = os.stat(path)
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            # deleted since the directory listing
+            out.append((fn, None, None, None))
+            continue
+        fingerprint = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "md5": md5_text(text), "checked_ns": time.time_ns()}
+        pars = [(p, md5_text(p)) for p in split_paragraphs(text)]
+        index = index_paragraphs(text)
+        # usually identical; only ship the index split when it differs
+        index_pars = None if index == [p for p, _ in pars] else [(p, md5_text(p)) for p in index]
+        out.append((fn, fingerprint, pars, index_pars))
+    return out
+
+
+def scan_files(
+    docs_dir: str, names: List[str], workers: Optional[int] = None, chunk: int = BOOTSTRAP_CHUNK
+) -> Iterator[ScanResult]:
+    """Read, split and hash `names` on a process pool, yielding results per finished chunk.
+
+    Results come in completion order, not in `names` order.
+    """
+    workers = workers or bootstrap_workers()
+    chunk = max(1, chunk)
+    # spawn: the caller is usually multi-threaded (server, embedding worker), so no fork
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(_scan_chunk, docs_dir, names[i : i + chunk]) for i in range(0, len(names), chunk)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+class EmbeddingPrefetch:
+    """Encode paragraphs missing from the embedding cache on a background thread.
+
+    `submit` returns at once. The thread groups the queued paragraphs into
+    batches of `batch_size` for the shared `EmbeddingService`. `close`
+    waits for the queue to drain and saves the cache.
+    """
+
+    def __init__(self, service, cache, batch_size: int = 512):
+        self.service = service
+        self.cache = cache
+        self.batch_size = batch_size
+        self.submitted = 0
+        self.encoded = 0
+        self.error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+        self._closing = False
+        self._seen = set()
+        self._queue: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-prefetch", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def create(cls) -> Optional["EmbeddingPrefetch"]:
+        """Prefetcher for the default model, or None without sentence-transformers."""
+        try:
+            from rag.embedding_cache import get_embedding_cache
+            from rag.model_service import DEFAULT_MODEL, get_embedding_service
+
+            service = get_embedding_service(DEFAULT_MODEL)
+            cache = get_embedding_cache(DEFAULT_MODEL)
+        except Exception:
+            return None
+        return cls(service, cache)
+
+    def submit(self, paragraphs: List[Tuple[str, str]]) -> None:
+        """Queue (text, md5) pairs; ones already cached or queued are skipped."""
+        for text, h in paragraphs:
+            if h in self._seen or h in self.cache:
+                continue
+            self._seen.add(h)
+            self.submitted += 1
+            self._queue.put((text, h))
+
+    def close(self) -> int:
+        """Wait for every queued paragraph, save the cache; returns how many were encoded."""
+        self._queue.put(None)
+        with self._lock:
+            # the scan is over; what remains is reported as the embed phase
+            self._closing = True
+            progress.start("embed", self.submitted, done=self.encoded)
+        self._thread.join()
+        if self.encoded:
+            self.cache.save()
+        return self.encoded
+
+    def _run(self) -> None:
+        # rows must be unit vectors, as DocIndex writes them
+        from rag.embedding_cache import normalize_rows
+
+        done = False
+        while not done:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            if not batch or self.error is not None:
+                continue
+            try:
+                vectors = normalize_rows(self.service.encode([text for text, _ in batch]))
+                self.cache.put_many([h for _, h in batch], vectors)
+            except Exception as e:
+                # DocIndex encodes whatever is still missing when it builds
+                self.error = e
+                continue
+            with self._lock:
+                self.encoded += len(batch)
+                if self._closing:
+                    progress.advance(len(batch))
@@ -25,7 +25,7 @@ adapt it into a Pathway streaming job later.
 
 from __future__ import annotations
 
-import hashlib
+import gc
 import json
 import os
 import re
@@ -33,11 +33,34 @@ import sys
 import threading
 import time
 from collections import defaultdict
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
+
+from bootstrap import BOOTSTRAP_FLUSH_S, BOOTSTRAP_MIN_DOCS, EmbeddingPrefetch, bootstrap_workers, progress, scan_files
+from graph_snapshot import GRAPH_SNAPSHOT, SNAPSHOT_DIR, GraphSnapshot
+from graph_view import GraphView
+from metrics import EVENT_TIMINGS, metrics
+from paragraph_graph import ParagraphGraph
+from propagation import ReverseCSR, propagate
+from rag.embedding_cache import current_embedding_cache, index_paragraphs, paragraph_hash as md5_text
+from ref_index import KeywordIndex, ReferenceMatcher, informative_tokens, tokenize
+from scheduler import EventScheduler
+from semantic_layer import SemanticLayer
+from state_store import StateStore
 
 CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache")
+# legacy JSON snapshot, imported into STATE_DB on first start
 PREV_STATE_FILE = os.path.join(CACHE_DIR, "prev_paragraphs.json")
+STATE_DB = os.path.join(CACHE_DIR, "state.sqlite3")
+# transitive impacts: hops to follow from the changed doc (1 = direct dependents only)
+# and the path confidence below which longer chains are pruned
+IMPACT_MAX_DEPTH = int(os.environ.get("IMPACT_MAX_DEPTH", "1"))
+IMPACT_MIN_CONFIDENCE = float(os.environ.get("IMPACT_MIN_CONFIDENCE", "0.3"))
+# "doc": score every paragraph of each dependent doc; "paragraph": follow
+# paragraph-level edges from the added/removed paragraphs only
+IMPACT_GRANULARITY = os.environ.get("IMPACT_GRANULARITY", "doc")
+# a stat match is only trusted if the file was written this long before it was
+# last read; otherwise a second write in the same mtime tick could be missed
+RACY_WINDOW_NS = 2_000_000_000
 # Allow overriding watched path via env var `DOCS_PATH` or `DOCS_DIR`.
 # If a file path is given (endswith .md), we'll watch its parent directory
 # but only react when that file changes.
@@ -59,10 +82,6 @@ def ensure_cache_dir() -> None:
     os.makedirs(CACHE_DIR, exist_ok=True)
 
 
-def md5_text(s: str) -> str:
-    return hashlib.md5(s.encode("utf-8")).hexdigest()
-
-
 def split_paragraphs(text: str) -> List[str]:
     # Normalize newlines and split on two-or-more newlines (semantic paragraphs)
     text = text.replace("\r\n", "\n").strip()
@@ -70,9 +89,28 @@ def split_paragraphs(text: str) -> List[str]:
     return parts
 
 
-def load_prev_state() -> Dict[str, List[Tuple[str, str]]]:
-    """Return mapping doc -> list of (paragraph_text, md5) in previous snapshot."""
-    ensure_cache_dir()
+# doc -> {"mtime_ns", "size", "md5" (whole text), "checked_ns"} for the snapshot in prev_state
+_fingerprints: Dict[str, Dict] = {}
+_state_store: Optional[StateStore] = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """Open the snapshot database once per process, importing a legacy JSON snapshot."""
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            ensure_cache_dir()
+            store = StateStore(STATE_DB)
+            if store.is_empty():
+                legacy = _load_legacy_state()
+                if legacy:
+                    store.save(legacy)
+            _state_store = store
+        return _state_store
+
+
+def _load_legacy_state() -> Dict[str, List[Tuple[str, str]]]:
     if not os.path.exists(PREV_STATE_FILE):
         return {}
     try:
@@ -84,11 +122,54 @@ def load_prev_state() -> Dict[str, List[Tuple[str, str]]]:
         return {}
 
 
+def load_prev_state() -> Dict[str, List[Tuple[str, str]]]:
+    """Return mapping doc -> list of (paragraph_text, md5) in previous snapshot."""
+    state, fingerprints = get_state_store().load()
+    _fingerprints.clear()
+    _fingerprints.update(fingerprints)
+    return state
+
+
 def save_prev_state(state: Dict[str, List[Tuple[str, str]]]) -> None:
-    ensure_cache_dir()
-    serializable = {k: [[p, h] for p, h in v] for k, v in state.items()}
-    with open(PREV_STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(serializable, f, indent=2, ensure_ascii=False)
+    # only docs whose paragraphs or fingerprints changed are written, in one transaction
+    get_state_store().save(state, _fingerprints)
+
+
+def _stat_unchanged(doc_name: str, st: os.stat_result) -> bool:
+    fp = _fingerprints.get(doc_name)
+    return (
+        fp is not None
+        and fp["mtime_ns"] == st.st_mtime_ns
+        and fp["size"] == st.st_size
+        and st.st_mtime_ns < fp["checked_ns"] - RACY_WINDOW_NS
+    )
+
+
+def read_if_changed(path: str, prev_state: Dict[str, List[Tuple[str, str]]]) -> Optional[str]:
+    """Return the doc's text, or None if it is unchanged since the snapshot.
+
+    Cheap checks first: a matching (mtime, size) skips the read entirely,
+    a matching whole-text hash skips paragraph splitting and hashing.
+    """
+    doc_name = os.path.basename(path)
+    st = os.stat(path)
+    known = doc_name in prev_state
+    if known and _stat_unchanged(doc_name, st):
+        metrics.inc("fingerprint_skips", check="stat")
+        return None
+    text = read_doc(path)
+    digest = md5_text(text)
+    previous = _fingerprints.get(doc_name)
+    _fingerprints[doc_name] = {
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "md5": digest,
+        "checked_ns": time.time_ns(),
+    }
+    if known and previous is not None and previous["md5"] == digest:
+        metrics.inc("fingerprint_skips", check="hash")
+        return None
+    return text
 
 
 def read_doc(path: str) -> str:
@@ -96,100 +177,730 @@ def read_doc(path: str) -> str:
         return f.read()
 
 
-def build_dependencies(docs_dir: str) -> List[Dict]:
-    """Scan all docs and produce a simple dependency list.
+def paragraph_tokens(text: str) -> List[Tuple[str, FrozenSet[str]]]:
+    """(paragraph, token set) pairs, as used to score impacted paragraphs."""
+    return [(p, tokenize(p)) for p in split_paragraphs(text)]
 
-    Returns list of dicts: {from_doc, to_doc, ref_type, confidence}
+
+def _lexical_edge(fn: str, candidate: str, n_keys: int, match_count: int, explicit: bool, base: bool) -> Optional[Dict]:
+    """Best explicit / explicit_base / implicit edge from `fn` to `candidate`, or None.
+
+    `explicit` / `base` say whether `fn` mentions the candidate's filename /
+    base name (see `ReferenceMatcher`); `match_count` is how many of the
+    candidate's `n_keys` filename keywords occur in `fn` (see `KeywordIndex`).
+    """
+    best = None
+    # explicit references: any mention of the other filename
+    if explicit:
+        best = {"from_doc": fn, "to_doc": candidate, "ref_type": "explicit", "confidence": 0.95}
+
+    # Check for exact filename match in text (without extension)
+    # e.g. "refund_policy_v2" in text
+    edge = None
+    if base:
+        edge = {"from_doc": fn, "to_doc": candidate, "ref_type": "explicit_base", "confidence": 0.9}
+    # Cheap implicit keyword match: if > 30% of keywords match
+    elif n_keys > 0 and match_count >= max(1, n_keys // 3):
+        edge = {
+            "from_doc": fn,
+            "to_doc": candidate,
+            "ref_type": "implicit",
+            # capped so path products in `propagate` stay within [0, 1]
+            "confidence": min(1.0, 0.5 + 0.1 * match_count),
+        }
+
+    # keep highest confidence per pair (earlier pass wins ties)
+    if edge and (best is None or edge["confidence"] > best["confidence"]):
+        best = edge
+    return best
+
+
+def _semantic_layer(docs_dir: str, index_factory=None, texts: Dict[str, str] = None) -> Optional[SemanticLayer]:
+    """A `SemanticLayer` over a fresh paragraph index of `texts`, the docs of `docs_dir`.
+
+    `index_factory(docs_dir, texts=texts)` builds the index (default:
+    `DocIndex`) and may return None to skip the layer. Raises when
+    sentence-transformers is unavailable.
+    """
+    if index_factory is None:
+        from rag.doc_index import DocIndex as index_factory
+
+    index = index_factory(docs_dir, texts=texts)
+    return None if index is None else SemanticLayer(index)
+
+
+def _semantic_targets(fn: str, links: Dict[str, float]) -> Dict[str, Dict]:
+    return {
+        to_doc: {"from_doc": fn, "to_doc": to_doc, "ref_type": "semantic", "confidence": score}
+        for to_doc, score in links.items()
+    }
+
+
+def _paragraph_embedder():
+    """Normalized paragraph vectors for the paragraph graph, or None without a model.
+
+    Vectors go through the shared embedding cache: ones DocIndex or an
+    earlier call already encoded are reused, new ones are written back.
+    """
+    try:
+        from rag.embedding_cache import get_embedding_cache, normalize_rows
+        from rag.model_service import DEFAULT_MODEL, get_embedding_service
+
+        service = get_embedding_service(DEFAULT_MODEL)
+        cache = get_embedding_cache(DEFAULT_MODEL)
+    except Exception:
+        return None
+
+    def embed(texts: List[str]):
+        # the text DocIndex stores for the same paragraph, so both share cache rows
+        texts = ["\n\n".join(index_paragraphs(t)) or t for t in texts]
+        hashes = [md5_text(t) for t in texts]
+        todo = cache.missing(hashes)
+        if todo:
+            by_hash = dict(zip(hashes, texts))
+            cache.put_many(todo, normalize_rows(service.encode([by_hash[h] for h in todo])))
+            cache.save()
+        return cache.get_many(hashes)
+
+    return embed
+
+
+class DependencyGraph:
+    """Long-lived dependency graph kept in sync with `docs_dir`.
+
+    The graph is built once with a full scan. Afterwards `apply_batch`
+    recomputes only the outgoing edges of the touched files and, when a
+    file appears or disappears, the incoming edges that mention its name. `edges()` returns the same edge set as a full `build_dependencies`.
+
+    With `strict_keywords=True` implicit links need whole-word keyword hits
+    instead of substring hits (``refund`` no longer matches ``refunds``).
+
+    With `paragraph_level=True` a `ParagraphGraph` is kept alongside, linking
+    individual paragraphs of docs that share a doc-level edge.
+
+    `index_factory(docs_dir, texts=texts)` builds the embedding index of
+    the semantic layer over the graph's doc texts (default: `DocIndex`);
+    offline benchmarks pass one with a stub model, or one returning None
+    to skip the layer. The index is built once, by the first full pass,
+    and then follows each batch through `SemanticLayer.update`.
+
+    Given a `GraphSnapshot` of the same folder and keyword mode, the graph
+    is restored from it instead of scanned (`restored` is then True); call
+    `revalidate` to catch up with docs edited since it was saved. The
+    semantic layer's index is rebuilt from the restored texts by
+    `prepare_semantic`, or else by the next batch, and the saved hits are
+    reused.
     """
-    files = [f for f in os.listdir(docs_dir) if f.endswith(".md")]
-    deps = []
-    filename_set = set(files)
-
-    # build a lightweight keyword index from filenames (without extension)
-    name_keywords = {fn: set(re.findall(r"\w+", os.path.splitext(fn)[0].lower())) for fn in files}
-
-    # Use explicit filename mentions first
-    for fn in files:
-        text = read_doc(os.path.join(docs_dir, fn))
-        lowered = text.lower()
-        # explicit references: any mention of another filename
-        for candidate in files:
+
+    def __init__(
+        self,
+        docs_dir: str,
+        strict_keywords: bool = False,
+        paragraph_level: bool = False,
+        index_factory=None,
+        snapshot: Optional[GraphSnapshot] = None,
+    ):
+        self.docs_dir = docs_dir
+        self.strict_keywords = strict_keywords
+        self.paragraph_level = paragraph_level
+        self.index_factory = index_factory
+        self.paragraph_graph: Optional[ParagraphGraph] = None
+        self._lock = threading.RLock()
+        self._texts: Dict[str, str] = {}
+        self._lowered: Dict[str, str] = {}
+        # doc -> MD5 of the text held, compared against the files by `revalidate`
+        self._md5: Dict[str, str] = {}
+        self._matcher = ReferenceMatcher()
+        self._keywords = KeywordIndex(self._lowered, strict=strict_keywords)
+        # from_doc -> to_doc -> best lexical edge
+        self._lexical: Dict[str, Dict[str, Dict]] = {}
+        # from_doc -> to_doc -> semantic edge
+        self._semantic: Dict[str, Dict[str, Dict]] = {}
+        # reverse adjacency of both layers: to_doc -> from_docs
+        self._incoming: Dict[str, Set[str]] = {}
+        self._incoming_semantic: Dict[str, Set[str]] = {}
+        # per-doc paragraph hits behind the semantic layer; None until the first full pass
+        self._semantic_layer: Optional[SemanticLayer] = None
+        # (options, hits, query vectors) a restore took from the snapshot, until `prepare_semantic`
+        self._semantic_saved: Optional[Tuple[Dict, Dict, Dict]] = None
+        # doc -> [(paragraph, tokens)], filled on first use and dropped when the doc changes
+        self._paragraphs: Dict[str, List[Tuple[str, FrozenSet[str]]]] = {}
+        # bumped on every change; the CSR view is refreshed lazily per version
+        self.version = 0
+        self._csr: Optional[ReverseCSR] = None
+        self._csr_version = -1
+        # docs whose dependents changed since `_csr` was built; None forces a full build
+        self._csr_dirty: Optional[Set[str]] = None
+        # distinct (from_doc, to_doc) pairs over both layers, as `edges` returns them
+        self._n_edges = 0
+        self._view: Optional[GraphView] = None
+        self.restored = snapshot is not None and snapshot.matches(docs_dir, strict_keywords)
+        # version the snapshot was saved at, before any `revalidate`
+        self.restored_version: Optional[int] = snapshot.version if self.restored else None
+        if self.restored:
+            self._restore(snapshot)
+        else:
+            self.rebuild()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, doc_name: str) -> bool:
+        return doc_name in self._texts
+
+    def docs(self) -> List[str]:
+        with self._lock:
+            return list(self._texts)
+
+    def rebuild(self) -> None:
+        """Full scan of `docs_dir` (startup, or to resync after a bulk change)."""
+        with self._lock:
+            files = [f for f in os.listdir(self.docs_dir) if f.endswith(".md")]
+            self._texts = {fn: read_doc(os.path.join(self.docs_dir, fn)) for fn in files}
+            self._lowered = {fn: text.lower() for fn, text in self._texts.items()}
+            self._md5 = {fn: md5_text(text) for fn, text in self._texts.items()}
+            self._matcher = ReferenceMatcher(files)
+            self._keywords = KeywordIndex(self._lowered, strict=self.strict_keywords)
+            for fn in files:
+                self._keywords.add_name(fn)
+            for fn in files:
+                self._keywords.set_doc(fn, self._lowered[fn])
+            self._lexical = {}
+            self._n_edges = 0
+            self._incoming = {}
+            self._paragraphs = {}
+            for fn in files:
+                self._set_outgoing(fn, self._outgoing(fn))
+            self._semantic_layer = None
+            self._semantic_saved = None
+            self._update_semantic(files, [])
+            if self.paragraph_level:
+                self.paragraph_graph = ParagraphGraph(embed=_paragraph_embedder())
+                self._sync_paragraphs(files, [])
+            self.version += 1
+
+    def _restore(self, snapshot: GraphSnapshot) -> None:
+        # same state as `rebuild` would produce for the saved texts, without scanning them;
+        # only new containers are created here, none of them garbage: pausing the
+        # cyclic collector saves the repeated full passes it would make over them
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with self._lock:
+                self._texts = snapshot.texts()
+                self._lowered = {fn: text.lower() for fn, text in self._texts.items()}
+                self._md5 = dict(snapshot.md5)
+                self._matcher = ReferenceMatcher(snapshot.docs)
+                doc_keys, key_docs = snapshot.keyword_postings()
+                self._keywords = KeywordIndex.restore(
+                    self._lowered, snapshot.docs, doc_keys, key_docs, strict=self.strict_keywords
+                )
+                layers = snapshot.layers()
+                self._lexical = {fn: layers["lexical"].get(fn, {}) for fn in snapshot.docs}
+                self._incoming = {}
+                for fn, targets in self._lexical.items():
+                    for target in targets:
+                        self._incoming.setdefault(target, set()).add(fn)
+                self._paragraphs = {}
+                self._set_semantic(layers["semantic"])
+                self._semantic_layer = None
+                self._semantic_saved = snapshot.semantic_state()
+                self.version = snapshot.version
+        finally:
+            if enabled:
+                gc.enable()
+        if self.paragraph_level:
+            with self._lock:
+                self.paragraph_graph = ParagraphGraph(embed=_paragraph_embedder())
+                self._sync_paragraphs(snapshot.docs, [])
+
+    def compile(self) -> None:
+        """Build the reference and keyword automata a restore leaves for the first scan."""
+        with self._lock:
+            self._matcher.compile()
+            self._keywords.compile()
+
+    def prepare_semantic(self) -> None:
+        """Rebuild the semantic layer a restore left out: its index, and the saved hits.
+
+        Only the paragraph index is built, from the restored texts (its
+        vectors come from the embedding cache); no doc is queried again.
+        `warm_up` calls this so the first event does not wait for it, and
+        `apply_batch` does it otherwise. If the saved layer was made with
+        other options, the next batch makes a full pass instead.
+        """
+        with self._lock:
+            saved, self._semantic_saved = self._semantic_saved, None
+            if saved is None or self._semantic_layer is not None:
+                return
+            options, hits, queries = saved
+            try:
+                layer = _semantic_layer(self.docs_dir, self.index_factory, self._texts)
+            except Exception:
+                # no model or indexing failed; the next batch's full pass reports it
+                return
+            if layer is None or layer.options() != options or queries.keys() != self._texts.keys():
+                return
+            layer.restore(hits, queries)
+            self._semantic_layer = layer
+
+    def revalidate(self, digests: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """Catch up with the folder after a restore; returns (updated, removed) docs.
+
+        `digests` maps every doc now on disk to the MD5 of its text. Docs
+        whose text differs from the one held, or that are new, are
+        re-applied; docs missing from `digests` are dropped.
+        """
+        with self._lock:
+            updated = sorted(fn for fn, digest in digests.items() if self._md5.get(fn) != digest)
+            removed = sorted(fn for fn in self._texts if fn not in digests)
+        if updated or removed:
+            self.apply_batch(updated=updated, removed=removed)
+        return updated, removed
+
+    def save_snapshot(self, path: str = SNAPSHOT_DIR) -> int:
+        """Write the current state as a `GraphSnapshot`; returns the version saved."""
+        with self._lock:
+            # edge dicts are replaced, never mutated, so shallow copies are enough
+            texts = dict(self._texts)
+            md5 = dict(self._md5)
+            layers = {
+                "lexical": {fn: dict(targets) for fn, targets in self._lexical.items() if targets},
+                "semantic": {fn: dict(targets) for fn, targets in self._semantic.items()},
+            }
+            doc_keywords = {fn: set(keys) for fn, keys in self._keywords.doc_keywords().items()}
+            semantic = self._semantic_saved
+            if self._semantic_layer is not None:
+                semantic = (self._semantic_layer.options(), *self._semantic_layer.state())
+            version = self.version
+        GraphSnapshot.write(
+            path, self.docs_dir, self.strict_keywords, version, texts, md5, layers, doc_keywords, semantic
+        )
+        return version
+
+    def apply_batch(self, updated: List[str] = (), removed: List[str] = ()) -> None:
+        """Apply a burst of created/modified/deleted docs in one graph update.
+
+        New names are registered before any outgoing edges are recomputed,
+        so docs created together can reference each other, and the semantic
+        layer is refreshed once for the whole batch.
+        """
+        removed = list(removed)
+        texts = {}
+        for doc_name in updated:
+            try:
+                texts[doc_name] = read_doc(os.path.join(self.docs_dir, doc_name))
+            except FileNotFoundError:
+                removed.append(doc_name)
+        with self._lock:
+            # the restored hits hold for the texts before this batch
+            self.prepare_semantic()
+            dropped = [doc_name for doc_name in removed if doc_name in self._texts and doc_name not in texts]
+            for doc_name in dropped:
+                self._set_outgoing(doc_name, {})
+                for store in (self._texts, self._lowered, self._md5, self._lexical, self._paragraphs):
+                    store.pop(doc_name, None)
+                self._matcher.remove(doc_name)
+                self._keywords.remove_doc(doc_name)
+                self._keywords.remove_name(doc_name)
+                for fn in self._incoming.pop(doc_name, ()):
+                    if self._lexical[fn].pop(doc_name, None) is not None:
+                        self._count_pair(fn, doc_name, self._semantic, -1)
+                self._mark_dependents([doc_name])
+
+            new = []
+            for doc_name, text in texts.items():
+                if doc_name not in self._texts:
+                    new.append(doc_name)
+                self._texts[doc_name] = text
+                self._lowered[doc_name] = text.lower()
+                self._md5[doc_name] = md5_text(text)
+                self._paragraphs.pop(doc_name, None)
+                self._keywords.set_doc(doc_name, self._lowered[doc_name])
+            for doc_name in new:
+                self._matcher.add(doc_name)
+                self._keywords.add_name(doc_name)
+            for doc_name in new:
+                self._refresh_incoming(doc_name)
+            for doc_name in texts:
+                self._set_outgoing(doc_name, self._outgoing(doc_name))
+
+            if texts or dropped:
+                with metrics.span("embedding"):
+                    sources = self._update_semantic(list(texts), dropped)
+                self._sync_paragraphs(list(texts), dropped, sources)
+                self.version += 1
+
+    def _sync_paragraphs(self, updated: List[str], removed: List[str], sources: Optional[Set[str]] = None) -> None:
+        """Mirror the batch into the paragraph graph.
+
+        `sources` are the other docs whose semantic links were recomputed;
+        with it only the edges from those docs and the edges touching
+        `updated` or `removed` are passed on. None passes every edge.
+        """
+        if self.paragraph_graph is None:
+            return
+        layers = (self._lexical, self._semantic)
+        if sources is None:
+            pairs = {(fn, target) for layer in layers for fn, targets in layer.items() for target in targets}
+        else:
+            changed = set(updated) | set(removed)
+            sources = sources | changed
+            pairs = {(fn, target) for layer in layers for fn in sources for target in layer.get(fn, ())}
+            for target in changed:
+                for incoming in (self._incoming, self._incoming_semantic):
+                    pairs.update((fn, target) for fn in incoming.get(target, ()))
+        self.paragraph_graph.update(
+            {fn: [(p, md5_text(p)) for p in split_paragraphs(self._texts[fn])] for fn in updated},
+            removed,
+            pairs,
+            sources,
+        )
+
+    def _mark_dependents(self, targets: Iterable[str]) -> None:
+        # rows of `reverse_csr` to recompute on its next call
+        if self._csr_dirty is not None:
+            self._csr_dirty.update(targets)
+
+    def _count_pair(self, fn: str, target: str, other: Dict[str, Dict[str, Dict]], delta: int) -> None:
+        # an edge added to or removed from one layer changes `n_edges` unless `other` has the pair
+        if target not in other.get(fn, ()):
+            self._n_edges += delta
+
+    def _set_outgoing(self, fn: str, out: Dict[str, Dict]) -> None:
+        old = self._lexical.get(fn, {})
+        self._mark_dependents(old.keys() | out.keys())
+        for target in old.keys() - out.keys():
+            self._incoming.get(target, set()).discard(fn)
+            self._count_pair(fn, target, self._semantic, -1)
+        for target in out.keys() - old.keys():
+            self._incoming.setdefault(target, set()).add(fn)
+            self._count_pair(fn, target, self._semantic, 1)
+        self._lexical[fn] = out
+
+    def _update_semantic(self, updated: List[str], removed: List[str]) -> Optional[Set[str]]:
+        """Refresh semantic links; returns the docs whose links were reset, None for all."""
+        # a full pass when there is no layer yet (first build, or after a
+        # restore), afterwards only the links the batch can change
+        try:
+            if self._semantic_layer is None:
+                layer = _semantic_layer(self.docs_dir, self.index_factory, self._texts)
+                links = layer.build(self._texts) if layer is not None else {}
+                self._set_semantic({fn: _semantic_targets(fn, targets) for fn, targets in links.items()})
+                self._semantic_layer = layer
+                return None
+            links = self._semantic_layer.update(self._texts, updated, removed)
+        except Exception:
+            # sentence-transformers not available or indexing failed; continue
+            self._semantic_layer = None
+            self._set_semantic({})
+            return None
+        for fn in removed:
+            self._set_semantic_outgoing(fn, {})
+        for fn, targets in links.items():
+            self._set_semantic_outgoing(fn, _semantic_targets(fn, targets))
+        for fn in removed:
+            if not self._incoming_semantic.get(fn, True):
+                del self._incoming_semantic[fn]
+        return set(links)
+
+    def _set_semantic_outgoing(self, fn: str, out: Dict[str, Dict]) -> None:
+        old = self._semantic.get(fn, {})
+        self._mark_dependents(old.keys() | out.keys())
+        for target in old.keys() - out.keys():
+            self._incoming_semantic.get(target, set()).discard(fn)
+            self._count_pair(fn, target, self._lexical, -1)
+        for target in out.keys() - old.keys():
+            self._incoming_semantic.setdefault(target, set()).add(fn)
+            self._count_pair(fn, target, self._lexical, 1)
+        if out:
+            self._semantic[fn] = out
+        else:
+            self._semantic.pop(fn, None)
+
+    def _set_semantic(self, layer: Dict[str, Dict[str, Dict]]) -> None:
+        incoming: Dict[str, Set[str]] = {}
+        for fn, targets in layer.items():
+            for target in targets:
+                incoming.setdefault(target, set()).add(fn)
+        self._semantic = layer
+        self._incoming_semantic = incoming
+        self._n_edges = sum(len(targets) for targets in self._lexical.values()) + sum(
+            len(targets.keys() - self._lexical.get(fn, {}).keys()) for fn, targets in layer.items()
+        )
+        # a whole new layer (full build or restore): the next CSR is built from scratch
+        self._csr_dirty = None
+
+    @property
+    def n_edges(self) -> int:
+        """Number of edges `edges()` returns, kept up to date without building them."""
+        return self._n_edges
+
+    def edges(self) -> List[Dict]:
+        """All edges, de-duplicated to the highest confidence per pair."""
+        with self._lock:
+            best = {}
+            for layer in (self._lexical, self._semantic):
+                for targets in layer.values():
+                    for d in targets.values():
+                        key = (d["from_doc"], d["to_doc"])
+                        if key not in best or d["confidence"] > best[key]["confidence"]:
+                            best[key] = d
+            return [dict(d) for d in best.values()]
+
+    def edges_to(self, doc_name: str) -> List[Dict]:
+        """Edges whose `to_doc` is `doc_name` (the docs that depend on it)."""
+        with self._lock:
+            out = []
+            sources = self._incoming.get(doc_name, set()) | self._incoming_semantic.get(doc_name, set())
+            for fn in sorted(sources):
+                d = self._lexical.get(fn, {}).get(doc_name)
+                s = self._semantic.get(fn, {}).get(doc_name)
+                if s and (d is None or s["confidence"] > d["confidence"]):
+                    d = s
+                if d:
+                    out.append(dict(d))
+            return out
+
+    def reverse_csr(self) -> ReverseCSR:
+        """Array-backed reverse adjacency of the current edges (cached per version).
+
+        After the first build only the rows of docs whose dependents
+        changed are recomputed; the returned CSR itself is never mutated.
+        """
+        with self._lock:
+            if self._csr_version != self.version:
+                if self._csr is None or self._csr_dirty is None:
+                    self._csr = ReverseCSR(self.edges())
+                elif self._csr_dirty:
+                    self._csr = self._csr.patched({fn: self._dependents(fn) for fn in self._csr_dirty})
+                self._csr_dirty = set()
+                self._csr_version = self.version
+            return self._csr
+
+    def _dependents(self, doc_name: str) -> Dict[str, float]:
+        # from_doc -> best confidence over both layers, as `edges` keeps it
+        out: Dict[str, float] = {}
+        for layer, incoming in ((self._lexical, self._incoming), (self._semantic, self._incoming_semantic)):
+            for fn in incoming.get(doc_name, ()):
+                edge = layer.get(fn, {}).get(doc_name)
+                if edge is not None and edge["confidence"] > out.get(fn, -1.0):
+                    out[fn] = edge["confidence"]
+        return out
+
+    def view(self) -> GraphView:
+        """Read-only snapshot for queries (cached per version)."""
+        with self._lock:
+            if self._view is None or self._view.version != self.version:
+                self._view = GraphView(self.version, list(self._texts), self.edges())
+            return self._view
+
+    def paragraphs(self, doc_name: str) -> Optional[List[Tuple[str, FrozenSet[str]]]]:
+        """Cached (paragraph, tokens) pairs of `doc_name`, or None if unknown."""
+        with self._lock:
+            pars = self._paragraphs.get(doc_name)
+            if pars is None and doc_name in self._texts:
+                pars = self._paragraphs[doc_name] = paragraph_tokens(self._texts[doc_name])
+            return pars
+
+    def _outgoing(self, fn: str) -> Dict[str, Dict]:
+        # one automaton pass finds every filename / base name the doc mentions,
+        # and the keyword postings give implicit match counts per candidate
+        explicit, base = self._matcher.scan(self._texts[fn], self._lowered[fn])
+        counts = self._keywords.match_counts(fn)
+        out = {}
+        for candidate in explicit | base | counts.keys():
             if candidate == fn:
                 continue
-            if re.search(r"\b" + re.escape(candidate) + r"\b", text):
-                deps.append({
-                    "from_doc": fn,
-                    "to_doc": candidate,
-                    "ref_type": "explicit",
-                    "confidence": 0.95,
-                })
-
-    # Cheap implicit keyword matches
-    for fn in files:
-        text = read_doc(os.path.join(docs_dir, fn))
-        lowered = text.lower()
-        for candidate, keys in name_keywords.items():
-            if candidate == fn:
+            edge = _lexical_edge(
+                fn,
+                candidate,
+                len(self._keywords.keywords(candidate)),
+                counts.get(candidate, 0),
+                candidate in explicit,
+                candidate in base,
+            )
+            if edge:
+                out[candidate] = edge
+        return out
+
+    def _refresh_incoming(self, target: str) -> None:
+        n_keys = len(self._keywords.keywords(target))
+        counts = self._keywords.incoming_counts(target)
+        pattern = re.compile(r"\b" + re.escape(target) + r"\b")
+        target_base = os.path.splitext(target)[0]
+        self._mark_dependents([target])
+        for fn, targets in self._lexical.items():
+            if fn == target:
                 continue
-            
-            # IMPROVED: Check for exact filename match in text (without extension)
-            # e.g. "refund_policy_v2" in text
-            candidate_base = os.path.splitext(candidate)[0]
-            if candidate_base in lowered:
-                 deps.append({
-                    "from_doc": fn,
-                    "to_doc": candidate,
-                    "ref_type": "explicit_base",
-                    "confidence": 0.9,
-                })
-                 continue
-
-            match_count = sum(1 for k in keys if k and k in lowered)
-            # Lower threshold: if > 30% of keywords match
-            if len(keys) > 0 and match_count >= max(1, len(keys) // 3):
-                deps.append({
-                    "from_doc": fn,
-                    "to_doc": candidate,
-                    "ref_type": "implicit",
-                    "confidence": 0.5 + 0.1 * match_count,
-                })
-
-    # Try to strengthen implicit links using a paragraph embedding index if available
+            explicit = pattern.search(self._texts[fn]) is not None
+            base = target_base in self._lowered[fn]
+            edge = _lexical_edge(fn, target, n_keys, counts.get(fn, 0), explicit, base)
+            if edge:
+                if target not in targets:
+                    self._count_pair(fn, target, self._semantic, 1)
+                targets[target] = edge
+                self._incoming.setdefault(target, set()).add(fn)
+            elif targets.pop(target, None) is not None:
+                self._incoming[target].discard(fn)
+                self._count_pair(fn, target, self._semantic, -1)
+
+
+_graph: Optional[DependencyGraph] = None
+_graph_lock = threading.Lock()
+# set by start_watchdog; exposes queue depth and coalescing stats
+_scheduler: Optional[EventScheduler] = None
+
+
+# graph version last written to SNAPSHOT_DIR (or restored from it)
+_snapshot_version = -1
+
+
+def get_dependency_graph() -> DependencyGraph:
+    """Process-wide dependency graph for DOCS_DIR, built (or restored) on first use."""
+    global _graph, _snapshot_version
+    with _graph_lock:
+        if _graph is None:
+            strict = os.environ.get("STRICT_KEYWORDS", "").lower() in ("1", "true", "yes")
+            paragraph_level = IMPACT_GRANULARITY == "paragraph"
+            _graph = open_dependency_graph(
+                DOCS_DIR,
+                strict_keywords=strict,
+                paragraph_level=paragraph_level,
+                snapshot_dir=SNAPSHOT_DIR if GRAPH_SNAPSHOT else None,
+            )
+            if _graph.restored:
+                _snapshot_version = _graph.restored_version
+            metrics.register("graph", _graph_stats)
+            metrics.register("embedding_cache", _embedding_cache_stats, counters=("hits", "misses"))
+        return _graph
+
+
+def open_dependency_graph(
+    docs_dir: str,
+    strict_keywords: bool = False,
+    paragraph_level: bool = False,
+    index_factory=None,
+    snapshot_dir: Optional[str] = SNAPSHOT_DIR,
+) -> DependencyGraph:
+    """Restore the graph from the snapshot in `snapshot_dir` and revalidate it, else build it.
+
+    Revalidation costs one `stat` per doc: files whose fingerprint is
+    unchanged since the last scan are trusted, the others are re-read and
+    hashed, and only docs whose MD5 differs from the snapshot are
+    re-applied. `snapshot_dir=None` always builds from scratch.
+    """
+    snapshot = None
+    if snapshot_dir is not None:
+        with metrics.span("snapshot_load"):
+            snapshot = GraphSnapshot.open(snapshot_dir)
+    graph = DependencyGraph(
+        docs_dir,
+        strict_keywords=strict_keywords,
+        paragraph_level=paragraph_level,
+        index_factory=index_factory,
+        snapshot=snapshot,
+    )
+    if graph.restored:
+        with metrics.span("snapshot_revalidate"):
+            updated, removed = graph.revalidate(_disk_digests(docs_dir))
+        print(
+            f"Restored dependency graph of {len(graph.docs())} docs from snapshot "
+            f"({len(updated)} updated, {len(removed)} removed since)"
+        )
+    return graph
+
+
+def _disk_digests(docs_dir: str) -> Dict[str, str]:
+    """doc -> MD5 of every doc on disk; a fresh stat fingerprint stands in for re-reading."""
+    out = {}
+    for fn in os.listdir(docs_dir):
+        if not fn.endswith(".md"):
+            continue
+        path = os.path.join(docs_dir, fn)
+        try:
+            if _stat_unchanged(fn, os.stat(path)):
+                out[fn] = _fingerprints[fn]["md5"]
+            else:
+                out[fn] = md5_text(read_doc(path))
+        except FileNotFoundError:
+            continue
+    return out
+
+
+def save_graph_snapshot() -> bool:
+    """Snapshot the process-wide graph if it changed since the last snapshot."""
+    global _snapshot_version
+    graph = _graph
+    if graph is None or not GRAPH_SNAPSHOT or graph.version == _snapshot_version:
+        return False
     try:
-        from rag.doc_index import DocIndex
-
-        idx = DocIndex(docs_dir)
-        # For each document, query the index with its full text to find top matching paragraphs from other docs
-        for fn in files:
-            path = os.path.join(docs_dir, fn)
-            text = read_doc(path)
-            results = idx.query(text, top_k=10)
-            seen = set()
-            for score, meta in results:
-                to_doc = meta.get("doc")
-                if to_doc == fn:
-                    continue
-                # threshold for implicit semantic link
-                if score >= 0.70 and (fn, to_doc) not in seen:
-                    deps.append({
-                        "from_doc": fn,
-                        "to_doc": to_doc,
-                        "ref_type": "semantic",
-                        "confidence": float(score),
-                    })
-                    seen.add((fn, to_doc))
+        with metrics.span("snapshot_save"):
+            _snapshot_version = graph.save_snapshot(SNAPSHOT_DIR)
     except Exception:
-        # sentence-transformers not available or indexing failed; continue
-        pass
+        import traceback
+
+        traceback.print_exc()
+        metrics.inc("errors", stage="snapshot_save")
+        return False
+    return True
+
+
+def warm_up() -> None:
+    """Get everything the first event needs ready: automata, embedding model, Gemini SDK.
 
-    # de-duplicate keeping highest confidence per pair
-    best = {}
-    for d in deps:
-        key = (d["from_doc"], d["to_doc"])
-        if key not in best or d["confidence"] > best[key]["confidence"]:
-            best[key] = d
+    Runs on a background thread once the watcher is serving, so neither
+    startup nor the first change pays for compiling the graph's matchers
+    after a restore, or for importing torch or the SDK. Failures are left
+    for the first real use to report.
+    """
+    with metrics.span("warm_up"):
+        if _graph is not None:
+            _graph.compile()
+            _graph.prepare_semantic()
+        try:
+            from rag.model_service import DEFAULT_MODEL, get_embedding_service, sentence_transformers_available
+
+            if sentence_transformers_available():
+                import rag.doc_index  # noqa: F401
+
+                get_embedding_service(DEFAULT_MODEL).warm_up(background=False)
+        except Exception:
+            pass
+        run_llm = os.environ.get("RUN_LLM", "false").lower() in ("1", "true", "yes")
+        if run_llm and os.environ.get("LLM_BACKEND", "gemini").lower() != "fake":
+            try:
+                from rag.llm_runner import get_client
+
+                get_client()
+            except Exception:
+                pass
 
-    return list(best.values())
+
+def _graph_stats() -> Dict:
+    # counters the graph keeps; a scrape must not build a view
+    return {"version": _graph.version, "docs": len(_graph), "edges": _graph.n_edges}
+
+
+def _embedding_cache_stats() -> Dict:
+    # only once the cache was loaded; a scrape must not load it
+    from rag.model_service import DEFAULT_MODEL
+
+    cache = current_embedding_cache(DEFAULT_MODEL)
+    return cache.stats() if cache is not None else {}
+
+
+def current_dependency_graph() -> Optional[DependencyGraph]:
+    """The process-wide graph if it has been built, without building it."""
+    return _graph
+
+
+def build_dependencies(docs_dir: str) -> List[Dict]:
+    """Scan all docs and produce a simple dependency list (full rebuild).
+
+    Returns list of dicts: {from_doc, to_doc, ref_type, confidence}
+    """
+    return DependencyGraph(docs_dir).edges()
 
 
 def detect_changes(doc_path: str, prev_state: Dict[str, List[Tuple[str, str]]]) -> Dict:
@@ -198,18 +909,22 @@ def detect_changes(doc_path: str, prev_state: Dict[str, List[Tuple[str, str]]])
     changed_event matches schema.md exactly.
     """
     doc_name = os.path.basename(doc_path)
-    text = read_doc(doc_path)
-    paragraphs = split_paragraphs(text)
-    new_pars = [(p, md5_text(p)) for p in paragraphs]
+    with metrics.span("read"):
+        text = read_if_changed(doc_path, prev_state)
+    if text is None:
+        return None
+    with metrics.span("hash"):
+        paragraphs = split_paragraphs(text)
+        new_pars = [(p, md5_text(p)) for p in paragraphs]
 
-    old_pars = prev_state.get(doc_name, [])
+        old_pars = prev_state.get(doc_name, [])
 
-    # Build dicts by hash for simple comparison (order-insensitive)
-    old_hashes = {h: p for p, h in old_pars}
-    new_hashes = {h: p for p, h in new_pars}
+        # Build dicts by hash for simple comparison (order-insensitive)
+        old_hashes = {h: p for p, h in old_pars}
+        new_hashes = {h: p for p, h in new_pars}
 
-    removed = [old_hashes[h] for h in old_hashes.keys() - new_hashes.keys()]
-    added = [new_hashes[h] for h in new_hashes.keys() - old_hashes.keys()]
+        removed = [old_hashes[h] for h in old_hashes.keys() - new_hashes.keys()]
+        added = [new_hashes[h] for h in new_hashes.keys() - old_hashes.keys()]
 
     if not removed and not added:
         return None
@@ -254,44 +969,106 @@ def truncate(s: str, n: int) -> str:
     return (s[: n - 3] + "...") if len(s) > n else s
 
 
-def resolve_impacts(changed_event: Dict, dependencies: List[Dict], docs_dir: str) -> Dict:
+def resolve_impacts(
+    changed_event: Dict,
+    dependencies: Union[DependencyGraph, List[Dict]],
+    docs_dir: str,
+    max_depth: int = None,
+    min_confidence: float = None,
+) -> Dict:
     """Given a changed_event and dependencies, fill impacted_docs mapping.
 
-    For each dependency where to_doc == changed_doc, collect relevant
+    `dependencies` is either the live `DependencyGraph` or a plain edge
+    list. For each dependency where to_doc == changed_doc, collect relevant
     snippets from the dependent document (simple paragraph similarity).
+    With a graph, edges come from its reverse index and paragraphs from its
+    token cache, so nothing is read from disk.
+
+    With `max_depth` > 1 (default `IMPACT_MAX_DEPTH`) dependents of
+    dependents are followed too, multiplying edge confidences along the
+    path and pruning chains below `min_confidence`. The event then also
+    carries `impact_paths`: doc -> {"hops", "confidence", "via"}.
+
+    If the graph keeps a paragraph layer, direct dependents are only the
+    docs with a paragraph linked to an added or removed paragraph, and
+    their snippets are exactly those linked paragraphs.
     """
+    max_depth = IMPACT_MAX_DEPTH if max_depth is None else max_depth
+    min_confidence = IMPACT_MIN_CONFIDENCE if min_confidence is None else min_confidence
     changed = changed_event["changed_doc"]
     impacted = defaultdict(list)
 
-    # index dependencies: from_doc -> list of deps referencing to_doc
-    for dep in dependencies:
-        if dep["to_doc"] == changed:
-            from_doc = dep["from_doc"]
-            # pick candidate snippets from from_doc that mention keywords from changed doc
-            path = os.path.join(docs_dir, from_doc)
-            if not os.path.exists(path):
-                continue
-            text = read_doc(path)
-            pars = split_paragraphs(text)
-            # score paragraphs by overlapping tokens with changed doc name and changed snippets
-            scores = []
-            key_terms = set(re.findall(r"\w+", os.path.splitext(changed)[0].lower()))
-            for p in pars:
-                tokens = set(re.findall(r"\w+", p.lower()))
-                score = len(tokens & key_terms)
-                scores.append((score, p))
-            # pick top paragraphs with score>0, limited to 3
-            for score, p in sorted(scores, key=lambda x: -x[0])[:3]:
-                if score > 0:
-                    impacted[from_doc].append(p)
-            # fallback: if nothing scored, include first paragraph as possible impact
-            if not impacted[from_doc] and pars:
-                impacted[from_doc].append(truncate(pars[0], 500))
+    linked = None
+    if isinstance(dependencies, DependencyGraph):
+        graph = dependencies
+        dependencies, paragraphs_of = graph.edges_to(changed), graph.paragraphs
+        reverse_csr = graph.reverse_csr
+        if graph.paragraph_graph is not None:
+            edited = [md5_text(p) for p in changed_event.get("old_snippets", []) + changed_event.get("new_snippets", [])]
+            linked = graph.paragraph_graph.dependents(changed, edited)
+    else:
+        edges = dependencies
+        dependencies = [dep for dep in edges if dep["to_doc"] == changed]
+
+        def paragraphs_of(fn: str):
+            return _read_paragraph_tokens(os.path.join(docs_dir, fn))
+
+        def reverse_csr() -> ReverseCSR:
+            return ReverseCSR(edges)
+
+    snippet_terms = set()
+    for snip in changed_event.get("old_snippets", []) + changed_event.get("new_snippets", []):
+        snippet_terms |= tokenize(snip)
+    snippet_terms = informative_tokens(snippet_terms)
+
+    # direct dependents in edge order, then (when enabled) longer chains by distance
+    targets = [(dep["from_doc"], changed) for dep in dependencies if linked is None or dep["from_doc"] in linked]
+    paths = None
+    if max_depth > 1:
+        paths = propagate(reverse_csr(), changed, max_depth, min_confidence)
+        if linked is not None:
+            paths = {fn: p for fn, p in paths.items() if _first_hop(paths, fn) in linked}
+        deeper = sorted((p["hops"], -p["confidence"], fn) for fn, p in paths.items() if p["hops"] > 1)
+        targets += [(fn, paths[fn]["via"]) for _, _, fn in deeper]
+
+    for from_doc, via in targets:
+        if linked is not None and from_doc in linked:
+            impacted[from_doc] = [p for p, _ in linked[from_doc]]
+            continue
+        # pick candidate snippets from from_doc that mention keywords from the doc it depends on
+        pars = paragraphs_of(from_doc)
+        if pars is None:
+            continue
+        key_terms = tokenize(os.path.splitext(via)[0])
+        # score paragraphs by overlapping tokens with that doc's name (counted double)
+        # and with the changed snippets
+        scores = [(2 * len(tokens & key_terms) + len(tokens & snippet_terms), p) for p, tokens in pars]
+        # pick top paragraphs with score>0, limited to 3
+        for score, p in sorted(scores, key=lambda x: -x[0])[:3]:
+            if score > 0:
+                impacted[from_doc].append(p)
+        # fallback: if nothing scored, include first paragraph as possible impact
+        if not impacted[from_doc] and pars:
+            impacted[from_doc].append(truncate(pars[0][0], 500))
 
     changed_event["impacted_docs"] = dict(impacted)
+    if paths is not None:
+        changed_event["impact_paths"] = {fn: paths[fn] for fn in changed_event["impacted_docs"] if fn in paths}
     return changed_event
 
 
+def _first_hop(paths: Dict[str, Dict], doc: str) -> str:
+    while paths[doc]["hops"] > 1:
+        doc = paths[doc]["via"]
+    return doc
+
+
+def _read_paragraph_tokens(path: str) -> Optional[List[Tuple[str, FrozenSet[str]]]]:
+    if not os.path.exists(path):
+        return None
+    return paragraph_tokens(read_doc(path))
+
+
 def emit_event(event: Dict, on_event=None) -> None:
     # Canonical JSON output on stdout (one per line). Downstream systems can read this stream.
     json_str = json.dumps(event, ensure_ascii=False)
@@ -300,43 +1077,244 @@ def emit_event(event: Dict, on_event=None) -> None:
         on_event(event)
 
 
-def scan_all_docs_and_update(prev_state: Dict[str, List[Tuple[str, str]]]) -> None:
-    # Ensure prev_state has entries for all docs (initial snapshot)
-    files = [f for f in os.listdir(DOCS_DIR) if f.endswith(".md")]
-    for fn in files:
-        if fn in prev_state:
+def scan_all_docs_and_update(prev_state: Dict[str, List[Tuple[str, str]]]) -> List[str]:
+    """Bring prev_state in line with the docs on disk; return the docs it touched.
+
+    Only files whose fingerprint differs from the snapshot are re-read, so a
+    restart over an unchanged folder costs one `stat` per file. When at
+    least `BOOTSTRAP_MIN_DOCS` files need reading (a first boot), they are
+    read, split and hashed on a process pool and saved as they arrive, see
+    `_scan_parallel`. Progress is reported through `bootstrap.progress`.
+    """
+    files = {f for f in os.listdir(DOCS_DIR) if f.endswith(".md")}
+    stale = []
+    for fn in sorted(files):
+        if fn in prev_state and _stat_unchanged(fn, os.stat(os.path.join(DOCS_DIR, fn))):
+            metrics.inc("fingerprint_skips", check="stat")
             continue
-        path = os.path.join(DOCS_DIR, fn)
-        pars = split_paragraphs(read_doc(path))
-        prev_state[fn] = [(p, md5_text(p)) for p in pars]
+        stale.append(fn)
+    progress.start("scan", len(stale))
+    if len(stale) >= BOOTSTRAP_MIN_DOCS and bootstrap_workers() > 1:
+        touched = _scan_parallel(stale, prev_state)
+    else:
+        touched = []
+        for fn in stale:
+            text = read_if_changed(os.path.join(DOCS_DIR, fn), prev_state)
+            progress.advance()
+            if text is None:
+                continue
+            pars = [(p, md5_text(p)) for p in split_paragraphs(text)]
+            if prev_state.get(fn) != pars:
+                prev_state[fn] = pars
+                touched.append(fn)
+    for fn in sorted(set(prev_state) - files):
+        del prev_state[fn]
+        _fingerprints.pop(fn, None)
+        touched.append(fn)
+    return touched
+
+
+def _scan_parallel(names: List[str], prev_state: Dict[str, List[Tuple[str, str]]]) -> List[str]:
+    """`scan_all_docs_and_update` for many files: hashing on a process pool.
+
+    Results are merged as each chunk finishes. The snapshot is committed to
+    the state store every `BOOTSTRAP_FLUSH_S` seconds, so an interrupted
+    first boot resumes where it stopped. New paragraphs go straight to the
+    embedding batcher, which encodes them while the scan continues.
+    """
+    prefetch = EmbeddingPrefetch.create()
+    touched = []
+    flushed = time.monotonic()
+    for fn, fingerprint, pars, index_pars in scan_files(DOCS_DIR, names):
+        progress.advance()
+        if fingerprint is None:
+            # deleted since the listing
+            if prev_state.pop(fn, None) is not None:
+                touched.append(fn)
+            _fingerprints.pop(fn, None)
+            continue
+        previous = _fingerprints.get(fn)
+        _fingerprints[fn] = fingerprint
+        if fn in prev_state and previous is not None and previous["md5"] == fingerprint["md5"]:
+            metrics.inc("fingerprint_skips", check="hash")
+            continue
+        if prefetch is not None:
+            prefetch.submit(pars if index_pars is None else index_pars)
+        if prev_state.get(fn) != pars:
+            prev_state[fn] = pars
+            touched.append(fn)
+        if time.monotonic() - flushed >= BOOTSTRAP_FLUSH_S:
+            save_prev_state(prev_state)
+            flushed = time.monotonic()
+    if prefetch is not None:
+        prefetch.close()
+    return touched
+
+
+_llm_pool = None
+_llm_pool_lock = threading.Lock()
+
+
+def get_llm_pool():
+    """Process-wide LLM worker pool, started on first use."""
+    global _llm_pool
+    with _llm_pool_lock:
+        if _llm_pool is None:
+            from rag.llm_pool import LLMWorkerPool
+
+            _llm_pool = LLMWorkerPool().start()
+            metrics.register(
+                "llm_pool",
+                _llm_pool.stats,
+                counters=("submitted", "completed", "failed", "superseded", "dropped", "timeouts", "retried", "batches"),
+            )
+            metrics.register(
+                "llm_cache", _llm_cache_stats, counters=("hits", "misses", "shared_inflight", "expired", "evicted")
+            )
+        return _llm_pool
+
+
+def _llm_cache_stats() -> Dict:
+    # only once the Gemini runner is loaded; a scrape must not import it
+    runner = sys.modules.get("rag.llm_runner")
+    cache = runner.current_llm_cache() if runner is not None else None
+    return cache.stats() if cache is not None else {}
+
+
+_fast_path = None
+_fast_path_lock = threading.Lock()
+
+
+def get_fast_path():
+    """Process-wide local classifier (None when FAST_PATH=0)."""
+    global _fast_path
+    if os.environ.get("FAST_PATH", "true").lower() not in ("1", "true", "yes"):
+        return None
+    with _fast_path_lock:
+        if _fast_path is None:
+            from rag.fast_path import FastPathClassifier
+
+            _fast_path = FastPathClassifier(
+                embed=_paragraph_embedder(), tokens=lambda text: informative_tokens(tokenize(text))
+            )
+            metrics.register("fast_path", _fast_path.stats, counters=("handled", "escalated"))
+        return _fast_path
+
+
+def _enqueue_llm(changed: Dict, on_event=None) -> None:
+    # optional: enrich the event with the LLM on the worker pool, off this thread;
+    # recognisable trivial changes are answered locally instead
+    if os.environ.get("RUN_LLM", "false").lower() not in ("1", "true", "yes"):
+        return
+    try:
+        fast_path = get_fast_path()
+        with metrics.timing() as timing, metrics.span("fast_path"):
+            local = fast_path.classify(changed) if fast_path else None
+        if local is not None:
+            if _llm_pool is not None:
+                # an older change to this doc must not overwrite the local answer
+                _llm_pool.cancel(changed["changed_doc"])
+            _emit_llm_result(changed, local, on_event, source="local", timings=timing)
+            return
+        submitted = time.perf_counter()
 
+        def _done(event: Dict, result: Dict) -> None:
+            # queue wait included: this is how long the enrichment took to arrive
+            elapsed = time.perf_counter() - submitted
+            metrics.observe("llm", elapsed)
+            _emit_llm_result(event, result, on_event, timings={"llm_ms": round(elapsed * 1000, 3)})
 
-def handle_change_event(path: str, prev_state: Dict[str, List[Tuple[str, str]]], on_event=None) -> None:
-    # Detect changes for the single file, assemble impacts, and emit JSON
+        get_llm_pool().submit(changed, _done)
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+
+
+def _emit_llm_result(
+    changed: Dict, llm_result: Dict, on_event=None, source: str = "llm", timings: Optional[Dict] = None
+) -> None:
+    # print LLM output as JSON for downstream systems
+    print("LLM result:", json.dumps(llm_result, ensure_ascii=False))
+    if on_event:
+        # follow-up for websocket clients, matched to the change by changed_doc
+        message = {"type": "llm_result", "changed_doc": changed["changed_doc"], "source": source, "llm": llm_result}
+        if EVENT_TIMINGS and timings is not None:
+            message["timings"] = timings
+        on_event(message)
+
+
+def handle_change_batch(paths: List[str], prev_state: Dict[str, List[Tuple[str, str]]], on_event=None) -> List[Dict]:
+    """Process a set of touched paths with a single graph update.
+
+    Paths whose file is gone are treated as deletions. Every changed doc
+    still produces its own event, but the dependency graph (including the
+    semantic layer) is refreshed once for the whole batch and the paragraph
+    snapshot is saved once. Returns the emitted events.
+
+    Every stage is timed into `metrics`; with EVENT_TIMINGS each event also
+    carries a "timings" block (stages up to its emission, in ms).
+    """
+    events: List[Dict] = []
+    started = time.perf_counter()
+    metrics.inc("batches")
     try:
-        changed = detect_changes(path, prev_state)
-        if not changed:
-            return
-        deps = build_dependencies(DOCS_DIR)
-        changed = resolve_impacts(changed, deps, DOCS_DIR)
-        emit_event(changed, on_event)
-        save_prev_state(prev_state)
-        # optional: call LLM runner if available and desired
-        if os.environ.get("RUN_LLM", "false").lower() in ("1", "true", "yes"):
+        graph = get_dependency_graph()
+        updated: List[str] = []
+        removed: List[str] = []
+        timings: List[Dict[str, float]] = []
+        state_dirty = False
+        for path in paths:
+            doc_name = os.path.basename(path)
+            if not os.path.exists(path):
+                removed.append(doc_name)
+                state_dirty |= prev_state.pop(doc_name, None) is not None
+                _fingerprints.pop(doc_name, None)
+                continue
             try:
-                from rag.llm_runner import run_llm
-
-                llm_result = run_llm(changed)
-                # print LLM output as JSON for downstream systems
-                print("LLM result:", json.dumps(llm_result, ensure_ascii=False))
+                with metrics.timing() as timing:
+                    changed = detect_changes(path, prev_state)
             except Exception:
                 import traceback
 
                 traceback.print_exc()
+                metrics.inc("errors", stage="detect_changes")
+                continue
+            if changed:
+                events.append(changed)
+                timings.append(timing)
+                updated.append(doc_name)
+            elif doc_name not in graph:
+                # e.g. an empty new file: no event, but its name can still be referenced
+                updated.append(doc_name)
+        with metrics.timing() as shared:
+            if updated or removed:
+                with metrics.span("build_dependencies"):
+                    graph.apply_batch(updated=updated, removed=removed)
+        for changed, timing in zip(events, timings):
+            with metrics.timing() as resolve_timing, metrics.span("resolve_impacts"):
+                resolve_impacts(changed, graph, DOCS_DIR)
+            if EVENT_TIMINGS:
+                total_ms = round((time.perf_counter() - started) * 1000, 3)
+                changed["timings"] = {**timing, **shared, **resolve_timing, "total_ms": total_ms}
+            emit_event(changed, on_event)
+            metrics.inc("events")
+        if events or state_dirty:
+            with metrics.span("save_state"):
+                save_prev_state(prev_state)
+        for changed in events:
+            _enqueue_llm(changed, on_event)
     except Exception:
         import traceback
 
         traceback.print_exc()
+        metrics.inc("errors", stage="batch")
+    return events
+
+
+def handle_change_event(path: str, prev_state: Dict[str, List[Tuple[str, str]]], on_event=None) -> None:
+    # Detect changes for the single file, assemble impacts, and emit JSON
+    handle_change_batch([path], prev_state, on_event)
 
 
 # --- Watcher fallback (watchdog) -------------------------------------------------
@@ -360,8 +1338,25 @@ def start_watchdog(prev_state: Dict[str, List[Tuple[str, str]]], on_event=None)
         print("watchdog is required for fallback mode. Install with: pip install watchdog")
         sys.exit(1)
 
+    def _process(batch: Dict[str, str]) -> None:
+        started = time.perf_counter()
+        handle_change_batch(sorted(batch), prev_state, on_event)
+        st = scheduler.stats()
+        print(
+            f"Processed batch of {len(batch)} file(s) in {(time.perf_counter() - started) * 1000:.0f} ms "
+            f"(events={st['events_received']} coalesced={st['events_coalesced']} queued={st['queue_depth']})"
+        )
+
+    global _scheduler
+    scheduler = _scheduler = EventScheduler(_process).start()
+    metrics.register(
+        "scheduler",
+        scheduler.stats,
+        counters=("events_received", "events_coalesced", "batches_run", "paths_processed"),
+    )
+
     class Handler(FileSystemEventHandler):
-        def on_modified(self, event):
+        def _submit(self, event, kind: str) -> None:
             if event.is_directory:
                 return
             if not event.src_path.endswith('.md'):
@@ -369,21 +1364,24 @@ def start_watchdog(prev_state: Dict[str, List[Tuple[str, str]]], on_event=None)
             # If a single file is being watched, only respond for that file
             if WATCHED_FILE and os.path.abspath(event.src_path) != os.path.abspath(WATCHED_FILE):
                 return
-            # small delay to allow write completion
-            time.sleep(0.1)
-            print(f"Detected file system event: modified {event.src_path}")
-            handle_change_event(event.src_path, prev_state, on_event)
+            print(f"Detected file system event: {kind} {event.src_path}")
+            # debounced on the scheduler thread; the observer never blocks on the pipeline
+            scheduler.submit(event.src_path, kind)
+
+        def on_modified(self, event):
+            self._submit(event, "modified")
 
         def on_created(self, event):
-            if event.is_directory:
-                return
-            if not event.src_path.endswith('.md'):
-                return
-            if WATCHED_FILE and os.path.abspath(event.src_path) != os.path.abspath(WATCHED_FILE):
-                return
-            time.sleep(0.1)
-            print(f"Detected file system event: created {event.src_path}")
-            handle_change_event(event.src_path, prev_state, on_event)
+            self._submit(event, "created")
+
+        def on_deleted(self, event):
+            self._submit(event, "deleted")
+
+        def on_moved(self, event):
+            self._submit(event, "deleted")
+            if not event.is_directory and event.dest_path.endswith('.md'):
+                if not WATCHED_FILE or os.path.abspath(event.dest_path) == os.path.abspath(WATCHED_FILE):
+                    scheduler.submit(event.dest_path, "created")
 
     # choose polling observer when on /mnt/ (WSL mounted drives) or when env forces polling
     use_polling = os.environ.get("USE_POLLING", "").lower() in ("1", "true", "yes") or DOCS_DIR.startswith("/mnt/")
@@ -400,16 +1398,32 @@ def start_watchdog(prev_state: Dict[str, List[Tuple[str, str]]], on_event=None)
         observer = ObserverCandidate()
         observer_type = ObserverCandidate.__name__
 
+    # build the dependency graph once; events then update it incrementally
+    progress.start("graph", 0)
+    get_dependency_graph()
+    progress.finish()
+
     observer.schedule(Handler(), DOCS_DIR, recursive=False)
     observer.start()
     watched_desc = WATCHED_FILE if WATCHED_FILE else DOCS_DIR
     print(f"Watching {watched_desc} for changes (fallback mode, observer={observer_type})")
+    # heavy imports and model weights load now, off the event path
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    # a fresh build (or a restore that had to catch up) is saved for the next start
+    save_graph_snapshot()
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
+    scheduler.stop()
+    save_graph_snapshot()
+    if _llm_pool is not None:
+        _llm_pool.stop(timeout=1)
+    if _fast_path is not None:
+        st = _fast_path.stats()
+        print(f"Fast path: {st['handled']} answered locally, {st['escalated']} escalated (rate {st['escalation_rate']:.0%})")
 
 
 if __name__ == "__main__":
@@ -420,9 +1434,8 @@ if __name__ == "__main__":
 
     # Load previous snapshot (if any)
     prev = load_prev_state()
-    # if no state, build initial snapshot
-    if not prev:
-        scan_all_docs_and_update(prev)
+    # build the initial snapshot, or refresh only the docs edited since the last run
+    if scan_all_docs_and_update(prev) or not prev:
         save_prev_state(prev)
 
     # Try to use Pathway if available (best-effort placeholder pipeline)
@@ -0,0 +1,133 @@
+"""Bounded, sequence-numbered log of broadcast events.
+
+Websocket clients that reconnect, or open after a burst, ask for every
+event after their last `seq` instead of refreshing. `EventLog` keeps the
+newest `capacity` serialized events in a ring buffer. With a `path` it
+also appends them to a JSONL segment file. When the segment holds
+`capacity` events it is rotated to `<path>.1`, replacing the older
+segment, so the disk use stays bounded. After a restart the log reloads
+from both segments and the sequence continues where it stopped.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache")
+EVENT_LOG_FILE = os.path.join(CACHE_DIR, "events.jsonl")
+EVENT_LOG_SIZE = int(os.environ.get("EVENT_LOG_SIZE", "1000"))
+EVENT_LOG_PERSIST = os.environ.get("EVENT_LOG_PERSIST", "true").lower() in ("1", "true", "yes")
+
+
+def encode_event(message: dict) -> str:
+    # same encoding as WebSocket.send_json
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class EventLog:
+    """Ring buffer of (seq, serialized event), optionally backed by segment files."""
+
+    def __init__(self, capacity: int = EVENT_LOG_SIZE, path: Optional[str] = None):
+        self.capacity = max(1, capacity)
+        self.path = path
+        self._lock = threading.Lock()
+        self._events: Deque[Tuple[int, str]] = deque(maxlen=self.capacity)
+        self._seq = 0
+        self._segment = None
+        self._segment_count = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._load()
+            self._segment = open(path, "a", encoding="utf-8")
+            if self._segment.tell() and not self._ends_with_newline(path):
+                # terminate a torn last line so the next event starts a new one
+                self._segment.write("\n")
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def first_seq(self) -> int:
+        """Oldest retained seq (`last_seq + 1` when empty)."""
+        with self._lock:
+            return self._events[0][0] if self._events else self._seq + 1
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def append(self, event: dict, publish: Optional[Callable[[int, str], None]] = None) -> Tuple[int, str]:
+        """Number `event` (sets its "seq"), store it and return (seq, text).
+
+        `publish(seq, text)` runs before the lock is released, so events
+        appended from several threads are published in seq order. It must
+        not block (e.g. `loop.call_soon_threadsafe`).
+        """
+        with self._lock:
+            self._seq += 1
+            event["seq"] = self._seq
+            text = encode_event(event)
+            self._events.append((self._seq, text))
+            if self._segment is not None:
+                self._write(text)
+            if publish is not None:
+                publish(self._seq, text)
+            return self._seq, text
+
+    def since(self, cursor: int) -> Tuple[List[Tuple[int, str]], bool]:
+        """Events with seq > `cursor`, and whether that is all of them.
+
+        `complete` is False when events after `cursor` were already evicted,
+        or when `cursor` is ahead of this log (a cursor from another log);
+        the client then holds stale state and should refresh.
+        """
+        with self._lock:
+            first = self._events[0][0] if self._events else self._seq + 1
+            complete = first <= cursor + 1 and cursor <= self._seq
+            if cursor > self._seq:
+                cursor = 0
+            return [(seq, text) for seq, text in self._events if seq > cursor], complete
+
+    def close(self) -> None:
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def _write(self, text: str) -> None:
+        if self._segment_count >= self.capacity:
+            self._segment.close()
+            os.replace(self.path, self.path + ".1")
+            self._segment = open(self.path, "a", encoding="utf-8")
+            self._segment_count = 0
+        self._segment.write(text + "\n")
+        self._segment.flush()
+        self._segment_count += 1
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _load(self) -> None:
+        for name in (self.path + ".1", self.path):
+            count = 0
+            try:
+                with open(name, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            seq = int(json.loads(line)["seq"])
+                        except Exception:
+                            # a torn last line from a crash
+                            continue
+                        if seq > self._seq:
+                            self._events.append((seq, line.rstrip("\n")))
+                            self._seq = seq
+                        count += 1
+            except OSError:
+                continue
+            if name == self.path:
+                self._segment_count = count
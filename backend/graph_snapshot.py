@@ -0,0 +1,259 @@
+"""Warm-start snapshot of the dependency graph, memory-mapped on restart.
+
+Building the graph reads every doc, matches references and keywords
+across the whole corpus and queries the embedding index. For tens of
+thousands of docs that takes tens of seconds. `GraphSnapshot.write` saves
+the built state under `SNAPSHOT_DIR`. On the next start `DependencyGraph`
+restores it from the mapped files instead, then re-applies only the docs
+whose MD5 no longer matches (see `DependencyGraph.revalidate`).
+
+Layout of the snapshot directory (one generation of files per `write`,
+like `rag.vector_store.MmapVectorStore`):
+- ``texts.<gen>.blob``: UTF-8 doc texts back to back
+- ``offsets.<gen>.bin``: docs + 1 uint64 byte offsets into the blob
+- ``edges.<gen>.bin``: one `EDGE_DTYPE` record per lexical or semantic edge
+- ``keywords.<gen>.bin``: int32 (doc, keyword) pairs of the keyword postings
+- ``hits.<gen>.bin``: one `HIT_DTYPE` record per kept semantic-layer hit,
+  best first per doc
+- ``queries.<gen>.bin``: docs x dim float32 query vectors of the semantic layer
+- ``snapshot.json``: header (doc names and MD5s, keyword and ref type
+  tables, graph version and options, semantic-layer options, generation)
+
+The semantic layer's hits and query vectors are saved so a restored graph
+only rebuilds its paragraph index, from the saved texts, instead of
+querying every doc again (see `DependencyGraph.prepare_semantic`).
+
+The header is swapped in last with an atomic rename, so a reader sees
+either the old or the new generation.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from semantic_layer import Hit
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), ".cache", "graph_snapshot")
+GRAPH_SNAPSHOT = os.environ.get("GRAPH_SNAPSHOT", "true").lower() in ("1", "true", "yes")
+HEADER_FILE = "snapshot.json"
+# bumped when the layout changes; older snapshots are ignored and rebuilt
+FORMAT = 3
+LAYERS = ("lexical", "semantic")
+EDGE_DTYPE = np.dtype(
+    [("src", "<i4"), ("dst", "<i4"), ("layer", "u1"), ("ref_type", "u1"), ("confidence", "<f8")]
+)
+# a semantic-layer hit of doc `src`: paragraph `hash` of doc `doc`, and its score
+HIT_DTYPE = np.dtype([("src", "<i4"), ("doc", "<i4"), ("score", "<f8"), ("hash", "S32")])
+
+
+def _group(keys, values, key_names: List[str], value_names: List[str]) -> Dict[str, Set[str]]:
+    # {key_names[k]: {value_names[v], ...}} for every key, grouped with one sort instead of a loop per pair
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    bounds = np.searchsorted(keys, np.arange(len(key_names) + 1)).tolist()
+    named = [value_names[v] for v in values.tolist()]
+    return {name: set(named[bounds[i] : bounds[i + 1]]) for i, name in enumerate(key_names)}
+
+
+class GraphSnapshot:
+    """One saved generation of the graph state, opened read-only with `np.memmap`."""
+
+    def __init__(self, path: str, header: Dict):
+        self.path = path
+        self.header = header
+        self.docs: List[str] = header["docs"]
+        self.md5: Dict[str, str] = dict(zip(self.docs, header["md5"]))
+        self.version: int = header["version"]
+        gen = header["generation"]
+        n = len(self.docs)
+        self.offsets = self._map(f"offsets.{gen}.bin", "uint64", (n + 1,))
+        self.blob = self._map(f"texts.{gen}.blob", "uint8", (int(self.offsets[-1]) if n else 0,))
+        self.edges = self._map(f"edges.{gen}.bin", EDGE_DTYPE, (header["edges"],))
+        self.keyword_pairs = self._map(f"keywords.{gen}.bin", "int32", (header["keyword_pairs"], 2))
+        semantic = header["semantic"]
+        self.hits = self._map(f"hits.{gen}.bin", HIT_DTYPE, (semantic["hits"] if semantic else 0,))
+        self.queries = self._map(f"queries.{gen}.bin", "float32", (n, semantic["dim"]) if semantic else (0, 0))
+
+    def _map(self, name: str, dtype, shape):
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+    @classmethod
+    def open(cls, path: str = SNAPSHOT_DIR) -> Optional["GraphSnapshot"]:
+        """The current generation under `path`, or None if missing or unreadable."""
+        try:
+            with open(os.path.join(path, HEADER_FILE), "r", encoding="utf-8") as f:
+                header = json.load(f)
+            if header.get("format") != FORMAT:
+                return None
+            return cls(path, header)
+        except Exception:
+            return None
+
+    def matches(self, docs_dir: str, strict_keywords: bool) -> bool:
+        """Whether the snapshot was taken of `docs_dir` with the same keyword mode."""
+        return (
+            os.path.abspath(self.header["docs_dir"]) == os.path.abspath(docs_dir)
+            and self.header["strict_keywords"] == strict_keywords
+        )
+
+    def texts(self) -> Dict[str, str]:
+        blob = self.blob.tobytes() if len(self.blob) else b""
+        offsets = self.offsets.tolist()
+        return {fn: blob[offsets[i] : offsets[i + 1]].decode("utf-8") for i, fn in enumerate(self.docs)}
+
+    def layers(self) -> Dict[str, Dict[str, Dict[str, Dict]]]:
+        """{"lexical": ..., "semantic": ...} as {from_doc: {to_doc: edge}}."""
+        out: Dict[str, Dict[str, Dict[str, Dict]]] = {layer: {} for layer in LAYERS}
+        docs, ref_types = self.docs, self.header["ref_types"]
+        edges = self.edges
+        for src, dst, layer, ref_type, confidence in zip(
+            edges["src"].tolist(),
+            edges["dst"].tolist(),
+            edges["layer"].tolist(),
+            edges["ref_type"].tolist(),
+            edges["confidence"].tolist(),
+        ):
+            fn, to_doc = docs[src], docs[dst]
+            out[LAYERS[layer]].setdefault(fn, {})[to_doc] = {
+                "from_doc": fn,
+                "to_doc": to_doc,
+                "ref_type": ref_types[ref_type],
+                "confidence": confidence,
+            }
+        return out
+
+    def keyword_postings(self) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
+        """(doc -> keywords in its text, keyword -> docs containing it)."""
+        docs, keywords = self.docs, self.header["keywords"]
+        pairs = np.asarray(self.keyword_pairs)
+        return _group(pairs[:, 0], pairs[:, 1], docs, keywords), _group(pairs[:, 1], pairs[:, 0], keywords, docs)
+
+    def semantic_state(self) -> Optional[Tuple[Dict, Dict[str, List[Hit]], Dict[str, np.ndarray]]]:
+        """(options, hits, query vectors) of the saved semantic layer, or None if none was saved."""
+        semantic = self.header["semantic"]
+        if semantic is None:
+            return None
+        docs = self.docs
+        hits: Dict[str, List[Hit]] = {fn: [] for fn in docs}
+        for src, doc, score, h in zip(
+            self.hits["src"].tolist(), self.hits["doc"].tolist(), self.hits["score"].tolist(), self.hits["hash"].tolist()
+        ):
+            hits[docs[src]].append((score, docs[doc], h.decode("ascii")))
+        queries = np.array(self.queries)
+        return semantic["options"], hits, dict(zip(docs, queries))
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        docs_dir: str,
+        strict_keywords: bool,
+        version: int,
+        texts: Dict[str, str],
+        md5: Dict[str, str],
+        layers: Dict[str, Dict[str, Dict[str, Dict]]],
+        doc_keywords: Dict[str, Set[str]],
+        semantic: Optional[Tuple[Dict, Dict[str, List[Hit]], Dict[str, np.ndarray]]] = None,
+    ) -> "GraphSnapshot":
+        """Write a new generation, then atomically publish it.
+
+        `semantic` is the layer's (options, hits, query vectors), as
+        `semantic_state` returns it; it is left out unless every doc has a
+        query vector.
+        """
+        os.makedirs(path, exist_ok=True)
+        gen = uuid.uuid4().hex[:12]
+        docs = sorted(texts)
+        ids = {fn: i for i, fn in enumerate(docs)}
+
+        encoded = [texts[fn].encode("utf-8") for fn in docs]
+        offsets = np.zeros(len(docs) + 1, dtype=np.uint64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+
+        ref_types: List[str] = []
+        ref_codes: Dict[str, int] = {}
+        rows = []
+        for layer_code, layer in enumerate(LAYERS):
+            for fn, targets in layers[layer].items():
+                for to_doc, edge in targets.items():
+                    code = ref_codes.get(edge["ref_type"])
+                    if code is None:
+                        code = ref_codes[edge["ref_type"]] = len(ref_types)
+                        ref_types.append(edge["ref_type"])
+                    rows.append((ids[fn], ids[to_doc], layer_code, code, edge["confidence"]))
+        edges = np.array(rows, dtype=EDGE_DTYPE)
+
+        keywords = sorted({k for keys in doc_keywords.values() for k in keys})
+        keyword_ids = {k: i for i, k in enumerate(keywords)}
+        pairs = np.array(
+            [(ids[fn], keyword_ids[k]) for fn, keys in doc_keywords.items() for k in keys], dtype=np.int32
+        ).reshape(-1, 2)
+
+        if semantic is not None and semantic[2].keys() >= ids.keys():
+            options, hits, queries = semantic
+            hit_rows = [
+                (ids[fn], ids[doc], score, h.encode("ascii"))
+                for fn, doc_hits in hits.items()
+                if fn in ids
+                for score, doc, h in doc_hits
+            ]
+            hit_records = np.array(hit_rows, dtype=HIT_DTYPE)
+            query_rows = np.zeros((0, 0), dtype=np.float32)
+            if docs:
+                query_rows = np.stack([queries[fn] for fn in docs]).astype(np.float32)
+            semantic_header = {"options": options, "hits": len(hit_records), "dim": int(query_rows.shape[1])}
+        else:
+            hit_records = np.zeros(0, dtype=HIT_DTYPE)
+            query_rows = np.zeros((0, 0), dtype=np.float32)
+            semantic_header = None
+
+        offsets.tofile(os.path.join(path, f"offsets.{gen}.bin"))
+        with open(os.path.join(path, f"texts.{gen}.blob"), "wb") as f:
+            for b in encoded:
+                f.write(b)
+        edges.tofile(os.path.join(path, f"edges.{gen}.bin"))
+        pairs.tofile(os.path.join(path, f"keywords.{gen}.bin"))
+        hit_records.tofile(os.path.join(path, f"hits.{gen}.bin"))
+        query_rows.tofile(os.path.join(path, f"queries.{gen}.bin"))
+
+        header = {
+            "format": FORMAT,
+            "generation": gen,
+            "created_ns": time.time_ns(),
+            "docs_dir": os.path.abspath(docs_dir),
+            "strict_keywords": strict_keywords,
+            "version": version,
+            "docs": docs,
+            "md5": [md5[fn] for fn in docs],
+            "ref_types": ref_types,
+            "keywords": keywords,
+            "edges": len(edges),
+            "keyword_pairs": len(pairs),
+            "semantic": semantic_header,
+        }
+        tmp = os.path.join(path, HEADER_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp, os.path.join(path, HEADER_FILE))
+        cls._remove_old_generations(path, gen)
+        return cls(path, header)
+
+    @staticmethod
+    def _remove_old_generations(path: str, keep: str) -> None:
+        # unlinking is safe even if another process still has the old files mapped
+        for name in os.listdir(path):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[1] != keep and parts[2] in ("bin", "blob"):
+                try:
+                    os.remove(os.path.join(path, name))
+                except OSError:
+                    pass
@@ -0,0 +1,115 @@
+"""Read-only snapshot of the dependency graph for query endpoints.
+
+`DependencyGraph.view()` returns a `GraphView` built once per graph
+version. It holds sorted adjacency lists in both directions, so queries
+run without the graph lock and never touch the docs folder. All pages of
+a paginated answer come from the same version, which the server also
+uses as the ETag.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from propagation import ReverseCSR, propagate
+
+
+class GraphView:
+    """Immutable docs + best edges of one graph version."""
+
+    def __init__(self, version: int, docs: List[str], edges: List[Dict]):
+        self.version = version
+        self.docs: List[str] = sorted(docs)
+        self._index = {doc: i for i, doc in enumerate(self.docs)}
+        self.outgoing: Dict[str, List[Dict]] = {}
+        self.incoming: Dict[str, List[Dict]] = {}
+        for e in sorted(edges, key=lambda e: (e["from_doc"], e["to_doc"])):
+            self.outgoing.setdefault(e["from_doc"], []).append(e)
+            self.incoming.setdefault(e["to_doc"], []).append(e)
+        for deps in self.incoming.values():
+            deps.sort(key=lambda e: e["from_doc"])
+        self.n_edges = len(edges)
+        self._csr: Optional[ReverseCSR] = None
+
+    def __contains__(self, doc: str) -> bool:
+        return doc in self._index
+
+    def page(self, offset: int, limit: int) -> Dict:
+        """Docs `offset:offset+limit` (sorted by name) with their outgoing edges.
+
+        Walking every page yields each doc and each edge exactly once.
+        """
+        docs = self.docs[offset : offset + limit]
+        end = offset + len(docs)
+        return {
+            "version": self.version,
+            "total_docs": len(self.docs),
+            "total_edges": self.n_edges,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": end if end < len(self.docs) else None,
+            "docs": [
+                {"doc": doc, "out_degree": len(self.outgoing.get(doc, ())), "in_degree": len(self.incoming.get(doc, ()))}
+                for doc in docs
+            ],
+            "edges": [dict(e) for doc in docs for e in self.outgoing.get(doc, ())],
+        }
+
+    def neighbourhood(self, doc: str, depth: int, direction: str = "both") -> Dict:
+        """Docs within `depth` hops of `doc`, breadth-first.
+
+        `direction` "out" follows references (what `doc` depends on), "in"
+        follows dependents, and "both" ignores edge direction. Returns the
+        docs with their hop counts and every traversed edge.
+        """
+        hops = {doc: 0}
+        edges: Dict[tuple, Dict] = {}
+        frontier = [doc]
+        for level in range(1, depth + 1):
+            nxt = []
+            for node in frontier:
+                adjacent = []
+                if direction in ("out", "both"):
+                    adjacent += [(e, e["to_doc"]) for e in self.outgoing.get(node, ())]
+                if direction in ("in", "both"):
+                    adjacent += [(e, e["from_doc"]) for e in self.incoming.get(node, ())]
+                for e, other in adjacent:
+                    edges[(e["from_doc"], e["to_doc"])] = e
+                    if other not in hops:
+                        hops[other] = level
+                        nxt.append(other)
+            if not nxt:
+                break
+            frontier = nxt
+        nodes = sorted(hops.items(), key=lambda kv: (kv[1], kv[0]))
+        return {
+            "nodes": [{"doc": d, "hops": h} for d, h in nodes],
+            "edges": [dict(edges[k]) for k in sorted(edges)],
+        }
+
+    def dependents(self, doc: str, depth: int = 1, min_confidence: float = 0.0) -> List[Dict]:
+        """Docs that depend on `doc` with at least `min_confidence`, strongest first.
+
+        Depth 1 lists the direct edges. Deeper queries use the same
+        propagation as `resolve_impacts`: confidences multiply along the
+        path, and longer chains below `min_confidence` are pruned. Unlike
+        in `resolve_impacts`, direct dependents are filtered by the same
+        threshold, so every depth applies it alike.
+        """
+        if depth <= 1:
+            rows = [
+                {"doc": e["from_doc"], "hops": 1, "confidence": e["confidence"], "via": doc, "ref_type": e["ref_type"]}
+                for e in self.incoming.get(doc, ())
+                if e["confidence"] >= min_confidence
+            ]
+        else:
+            if self._csr is None:
+                self._csr = ReverseCSR(e for deps in self.outgoing.values() for e in deps)
+            direct = {e["from_doc"]: e["ref_type"] for e in self.incoming.get(doc, ())}
+            rows = [
+                {"doc": d, **info, "ref_type": direct.get(d) if info["hops"] == 1 else None}
+                for d, info in propagate(self._csr, doc, depth, min_confidence).items()
+                if info["confidence"] >= min_confidence
+            ]
+        rows.sort(key=lambda r: (-r["confidence"], r["hops"], r["doc"]))
+        return rows
@@ -0,0 +1,174 @@
+"""Per-stage latency histograms and counters, rendered as Prometheus text.
+
+The pipeline wraps each stage in `metrics.span("stage")` (read, hash,
+build_dependencies, embedding, resolve_impacts, save_state, fast_path,
+llm, and around a restart snapshot_load, snapshot_revalidate, warm_up
+and snapshot_save) and bumps counters with `metrics.inc`. Components that already keep
+their own counters (scheduler, LLM pool and cache, websocket manager) are
+registered with `metrics.register`, and their `stats()` are read at scrape
+time. `server.py` serves `metrics.render()` at `/metrics`.
+
+Spans can also be collected per event. Inside `with metrics.timing() as t`,
+every span on that thread also adds its milliseconds to `t`. With
+EVENT_TIMINGS=true, `handle_change_batch` attaches this block to each
+emitted event.
+"""
+
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+# seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+EVENT_TIMINGS = os.environ.get("EVENT_TIMINGS", "false").lower() in ("1", "true", "yes")
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (not thread-safe; `Metrics` locks)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        out, total = [], 0
+        for c in self.counts:
+            total += c
+            out.append(total)
+        return out
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(int(value))
+
+
+class Metrics:
+    """Process-wide registry of stage histograms, counters and stats sources."""
+
+    def __init__(self, prefix: str = "docgraph"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._sources: Dict[str, Tuple[Callable[[], Dict], Tuple[str, ...]]] = {}
+        self._local = threading.local()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram()
+            hist.observe(seconds)
+        timings = getattr(self._local, "timings", None)
+        if timings is not None:
+            key = f"{stage}_ms"
+            timings[key] = round(timings.get(key, 0.0) + seconds * 1000, 3)
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the block as one observation of `stage`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    @contextmanager
+    def timing(self) -> Iterator[Dict[str, float]]:
+        """Collect `<stage>_ms` of the spans run on this thread inside the block."""
+        outer = getattr(self._local, "timings", None)
+        self._local.timings = timings = {}
+        try:
+            yield timings
+        finally:
+            self._local.timings = outer
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def register(self, source: str, stats: Callable[[], Dict], counters: Iterable[str] = ()) -> None:
+        """Report `stats()` at scrape time as `<prefix>_<source>_<key>`.
+
+        Keys in `counters` are monotonic and exported as counters; other
+        numeric keys are gauges. Re-registering a source replaces it.
+        """
+        with self._lock:
+            self._sources[source] = (stats, tuple(counters))
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {k: (h.buckets, h.cumulative(), h.sum, h.count) for k, h in self._stages.items()}
+            counters = dict(self._counters)
+            sources = dict(self._sources)
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {p}_stage_seconds histogram",
+        ]
+        for stage in sorted(stages):
+            buckets, cumulative, total, count = stages[stage]
+            for le, n in zip([*map(str, buckets), "+Inf"], cumulative):
+                lines.append(f"{p}_stage_seconds_bucket{_labels({'stage': stage, 'le': le})} {n}")
+            lines.append(f"{p}_stage_seconds_sum{_labels({'stage': stage})} {_number(total)}")
+            lines.append(f"{p}_stage_seconds_count{_labels({'stage': stage})} {count}")
+
+        by_name: Dict[str, List[Tuple[Tuple, float]]] = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name in sorted(by_name):
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            for labels, value in sorted(by_name[name]):
+                lines.append(f"{p}_{name}_total{_labels(dict(labels))} {_number(value)}")
+
+        for source in sorted(sources):
+            stats, counter_keys = sources[source]
+            try:
+                values = stats() or {}
+            except Exception:
+                # a source that fails must not break the whole scrape
+                continue
+            for key in sorted(values):
+                value = values[key]
+                if isinstance(value, bool):
+                    value = int(value)
+                if not isinstance(value, (int, float)):
+                    continue
+                metric = re.sub(r"\W", "_", f"{p}_{source}_{key}")
+                if key in counter_keys:
+                    lines.append(f"# TYPE {metric}_total counter")
+                    lines.append(f"{metric}_total {_number(value)}")
+                else:
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,230 @@
+"""Paragraph-level dependency graph.
+
+Doc -> doc edges say that FAQ.md depends on Policy.md, but not which of
+FAQ.md's paragraphs depend on which of Policy.md's. `ParagraphGraph` keeps
+that finer layer. Nodes are (doc, paragraph MD5) pairs, the same IDs that
+`detect_changes` computes. Edges are only considered between docs that
+already share a doc-level edge. They come from:
+
+- explicit: the dependent paragraph contains the source doc's base name (as
+  in the doc-level `base` test) and shares at least two informative tokens
+  with the source paragraph,
+- keyword: at least two shared informative tokens covering `keyword_min` of
+  the smaller paragraph,
+- semantic: cosine similarity >= `semantic_min`, when an embedder is given.
+
+Updates are incremental: only added paragraphs are scored, against the
+paragraphs of the neighbouring docs. When a paragraph is removed, its
+incoming edges are kept as a tombstone until that doc's next update, so an
+event can still look up what depended on the old text.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from ref_index import informative_tokens, tokenize
+
+Key = Tuple[str, str]  # (doc, paragraph md5)
+
+KEYWORD_MIN_OVERLAP = 0.3
+SEMANTIC_MIN_SCORE = 0.70
+
+
+def _link(explicit: bool, shared: int, smaller: int, keyword_min: float) -> Optional[Tuple[str, float]]:
+    if explicit and shared >= 2:
+        return "explicit", 0.95
+    if shared >= 2 and smaller and shared / smaller >= keyword_min:
+        return "keyword", round(0.5 + 0.4 * shared / smaller, 4)
+    return None
+
+
+class ParagraphGraph:
+    """Dependent paragraph -> source paragraph edges between linked docs."""
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[List[str]], "np.ndarray"]] = None,
+        keyword_min: float = KEYWORD_MIN_OVERLAP,
+        semantic_min: float = SEMANTIC_MIN_SCORE,
+    ):
+        self.embed = embed
+        self.keyword_min = keyword_min
+        self.semantic_min = semantic_min
+        # doc -> md5 -> (paragraph, informative tokens)
+        self._docs: Dict[str, Dict[str, Tuple[str, FrozenSet[str]]]] = {}
+        # doc -> lowercased base name; a paragraph containing it names the doc
+        self._names: Dict[str, str] = {}
+        self._vectors: Dict[Key, "np.ndarray"] = {}
+        # source paragraph -> dependent paragraph -> edge, and the reverse key sets
+        self._in: Dict[Key, Dict[Key, Dict]] = {}
+        self._out: Dict[Key, Set[Key]] = {}
+        # doc-level (from_doc, to_doc) pairs mirrored from the dependency graph
+        self._pairs: Set[Tuple[str, str]] = set()
+        # doc -> the pairs in `_pairs` it is on either end of
+        self._doc_pairs: Dict[str, Set[Tuple[str, str]]] = {}
+        # doc -> md5 -> incoming edges of paragraphs removed by that doc's last update
+        self._retired: Dict[str, Dict[str, Dict[Key, Dict]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(pars) for pars in self._docs.values())
+
+    @property
+    def n_edges(self) -> int:
+        return sum(len(deps) for deps in self._in.values())
+
+    def update(
+        self,
+        docs: Dict[str, List[Tuple[str, str]]],
+        removed: Iterable[str],
+        pairs: Set[Tuple[str, str]],
+        sources: Optional[Set[str]] = None,
+    ) -> None:
+        """Apply changed docs (`doc -> [(paragraph, md5)]`), removed docs and the
+        current doc-level edge set; only new paragraphs and new pairs are scored.
+
+        With `sources`, `pairs` only holds the current edges from `sources`
+        and the ones touching `docs`; other known pairs are kept as they are.
+        """
+        for doc in removed:
+            self._drop_doc(doc)
+        fresh = {doc: self._set_paragraphs(doc, pars) for doc, pars in docs.items()}
+        self._embed([(doc, h) for doc, hashes in fresh.items() for h in hashes])
+
+        if sources is None:
+            old = set(self._pairs)
+        else:
+            old = {pair for doc in docs for pair in self._doc_pairs.get(doc, ())}
+            old.update(pair for doc in sources for pair in self._doc_pairs.get(doc, ()) if pair[0] == doc)
+        for from_doc, to_doc in old - pairs:
+            self._unlink_pair(from_doc, to_doc)
+            self._discard_pair((from_doc, to_doc))
+        for from_doc, to_doc in pairs:
+            if from_doc not in self._docs or to_doc not in self._docs:
+                continue
+            if (from_doc, to_doc) not in self._pairs:
+                self._link_pair(from_doc, to_doc, None, None)
+            elif from_doc in fresh or to_doc in fresh:
+                self._link_pair(from_doc, to_doc, fresh.get(from_doc, set()), fresh.get(to_doc, set()))
+        for pair in pairs:
+            if pair not in self._pairs:
+                self._pairs.add(pair)
+                for doc in pair:
+                    self._doc_pairs.setdefault(doc, set()).add(pair)
+
+    def dependents(self, doc: str, hashes: Iterable[str]) -> Dict[str, List[Tuple[str, Dict]]]:
+        """Paragraphs in other docs linked to `doc`'s paragraphs `hashes`.
+
+        Looks at live edges for current paragraphs and at tombstones for
+        paragraphs removed by the last update. Returns dependent doc ->
+        [(paragraph, best edge)], strongest first.
+        """
+        retired = self._retired.get(doc, {})
+        best: Dict[Key, Dict] = {}
+        for h in hashes:
+            edges = self._in.get((doc, h)) or retired.get(h, {})
+            for dep, edge in edges.items():
+                if dep not in best or edge["confidence"] > best[dep]["confidence"]:
+                    best[dep] = edge
+        out: Dict[str, List[Tuple[str, Dict]]] = {}
+        for (dep_doc, dep_hash), edge in sorted(best.items(), key=lambda kv: (-kv[1]["confidence"], kv[0])):
+            par = self._docs.get(dep_doc, {}).get(dep_hash)
+            if par is not None:
+                out.setdefault(dep_doc, []).append((par[0], dict(edge)))
+        return out
+
+    def _set_paragraphs(self, doc: str, pars: List[Tuple[str, str]]) -> Set[str]:
+        old = self._docs.get(doc, {})
+        new = {h: old.get(h) or (p, frozenset(informative_tokens(tokenize(p)))) for p, h in pars}
+        retired = {}
+        for h in old.keys() - new.keys():
+            retired[h] = dict(self._in.get((doc, h), {}))
+            self._drop_node((doc, h))
+        self._retired[doc] = retired
+        self._docs[doc] = new
+        self._names[doc] = os.path.splitext(doc)[0].lower()
+        return set(new.keys() - old.keys())
+
+    def _drop_doc(self, doc: str) -> None:
+        for h in self._docs.pop(doc, {}):
+            self._drop_node((doc, h))
+        self._names.pop(doc, None)
+        self._retired.pop(doc, None)
+        for pair in list(self._doc_pairs.get(doc, ())):
+            self._discard_pair(pair)
+        self._doc_pairs.pop(doc, None)
+
+    def _discard_pair(self, pair: Tuple[str, str]) -> None:
+        self._pairs.discard(pair)
+        for doc in pair:
+            self._doc_pairs.get(doc, set()).discard(pair)
+
+    def _drop_node(self, key: Key) -> None:
+        for dep in self._in.pop(key, {}):
+            self._out.get(dep, set()).discard(key)
+        for src in self._out.pop(key, ()):
+            self._in.get(src, {}).pop(key, None)
+        self._vectors.pop(key, None)
+
+    def _embed(self, keys: List[Key]) -> None:
+        if self.embed is None or not keys:
+            return
+        try:
+            vectors = self.embed([self._docs[doc][h][0] for doc, h in keys])
+        except Exception:
+            # semantic links are optional, like the doc-level semantic layer
+            self.embed = None
+            return
+        for key, vec in zip(keys, vectors):
+            self._vectors[key] = vec
+
+    def _unlink_pair(self, from_doc: str, to_doc: str) -> None:
+        for h in self._docs.get(from_doc, {}):
+            dep = (from_doc, h)
+            for src in [s for s in self._out.get(dep, ()) if s[0] == to_doc]:
+                self._out[dep].discard(src)
+                self._in[src].pop(dep, None)
+
+    def _link_pair(self, from_doc: str, to_doc: str, fresh_from: Optional[Set[str]], fresh_to: Optional[Set[str]]) -> None:
+        """Score paragraph pairs between two linked docs.
+
+        With `fresh_*` None every pair is scored. Otherwise only pairs that
+        involve a fresh paragraph on either side are scored.
+        """
+        deps, srcs = self._docs[from_doc], self._docs[to_doc]
+        if fresh_from is None:
+            todo = [(d, list(srcs)) for d in deps]
+        else:
+            todo = [(d, list(srcs)) for d in fresh_from]
+            if fresh_to:
+                todo += [(d, list(fresh_to)) for d in deps if d not in fresh_from]
+        name = self._names[to_doc]
+        for dep_hash, src_hashes in todo:
+            if not src_hashes:
+                continue
+            dep_text, dep_tokens = deps[dep_hash]
+            explicit = name in dep_text.lower()
+            sims = self._similarities((from_doc, dep_hash), [(to_doc, h) for h in src_hashes])
+            for i, src_hash in enumerate(src_hashes):
+                src_tokens = srcs[src_hash][1]
+                shared = len(dep_tokens & src_tokens)
+                link = _link(explicit, shared, min(len(dep_tokens), len(src_tokens)), self.keyword_min)
+                if sims is not None and sims[i] >= self.semantic_min and (link is None or sims[i] > link[1]):
+                    link = "semantic", round(float(sims[i]), 4)
+                if link:
+                    self._add_edge((from_doc, dep_hash), (to_doc, src_hash), *link)
+
+    def _similarities(self, dep: Key, srcs: List[Key]):
+        if not self._vectors or dep not in self._vectors or any(s not in self._vectors for s in srcs):
+            return None
+        return np.stack([self._vectors[s] for s in srcs]) @ self._vectors[dep]
+
+    def _add_edge(self, dep: Key, src: Key, ref_type: str, confidence: float) -> None:
+        self._in.setdefault(src, {})[dep] = {"ref_type": ref_type, "confidence": confidence}
+        self._out.setdefault(dep, set()).add(src)
@@ -0,0 +1,152 @@
+"""Transitive impact propagation over a compact reverse adjacency.
+
+`ReverseCSR` packs the dependency edges as to_doc -> from_docs in three
+NumPy arrays (CSR layout). `propagate` walks it outward from the changed
+doc, one hop per level. A doc's confidence is the product of the edge
+confidences along its best path. Paths that fall below `min_confidence`
+are pruned, and the walk stops after `max_depth` hops.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+class ReverseCSR:
+    """Reverse dependency graph: row `i` lists the docs that depend on doc `i`."""
+
+    def __init__(self, edges: Iterable[Dict]):
+        best: Dict[Tuple[str, str], float] = {}
+        for e in edges:
+            key = (e["to_doc"], e["from_doc"])
+            if e["confidence"] > best.get(key, -1.0):
+                best[key] = e["confidence"]
+        names = sorted({doc for pair in best for doc in pair})
+        index = {fn: i for i, fn in enumerate(names)}
+        rows = np.fromiter((index[t] for t, _ in best), dtype=np.int64, count=len(best))
+        cols = np.fromiter((index[f] for _, f in best), dtype=np.int64, count=len(best))
+        weights = np.fromiter(best.values(), dtype=np.float64, count=len(best))
+        self._pack(names, rows, cols, weights)
+
+    def _pack(self, names: List[str], rows: "np.ndarray", cols: "np.ndarray", weights: "np.ndarray") -> None:
+        # rows sorted by dependent within each row, so the layout does not depend on edge order
+        self.names: List[str] = names
+        self.index: Dict[str, int] = {fn: i for i, fn in enumerate(names)}
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order]
+        self.weights = weights[order]
+        self.indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(names)), out=self.indptr[1:])
+
+    def patched(self, rows: Dict[str, Dict[str, float]]) -> "ReverseCSR":
+        """Copy with the rows of `rows` ({to_doc: {from_doc: confidence}}) replaced.
+
+        Every other row is copied over unchanged, without re-sorting, so a
+        batch that touched a few docs costs a few array passes instead of a
+        rebuild from the edge list. Docs left without edges are dropped, and
+        the result is laid out exactly as a fresh build would be.
+        """
+        added = set(rows).union(*rows.values()) - self.index.keys()
+        names = sorted(self.names + list(added)) if added else self.names
+        index = {fn: i for i, fn in enumerate(names)} if added else self.index
+        # names stay sorted, so old -> new indices keep the row and column order
+        remap = np.fromiter((index[fn] for fn in self.names), dtype=np.int64, count=len(self.names))
+        old_lengths = np.diff(self.indptr)
+        replaced = np.zeros(len(self.names), dtype=bool)
+        replaced[[self.index[fn] for fn in rows if fn in self.index]] = True
+
+        lengths = np.zeros(len(names), dtype=np.int64)
+        lengths[remap] = old_lengths
+        for fn, deps in rows.items():
+            lengths[index[fn]] = len(deps)
+        indptr = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int64)
+        weights = np.empty(indptr[-1], dtype=np.float64)
+
+        old_rows = np.repeat(np.arange(len(self.names)), old_lengths)
+        kept = np.nonzero(~replaced[old_rows])[0]
+        kept_rows = old_rows[kept]
+        pos = indptr[remap[kept_rows]] + kept - self.indptr[kept_rows]
+        indices[pos] = remap[self.indices[kept]]
+        weights[pos] = self.weights[kept]
+        for fn, deps in rows.items():
+            start = indptr[index[fn]]
+            row = sorted((index[f], w) for f, w in deps.items())
+            indices[start : start + len(row)] = [c for c, _ in row]
+            weights[start : start + len(row)] = [w for _, w in row]
+
+        used = lengths > 0
+        used[indices] = True
+        out = ReverseCSR.__new__(ReverseCSR)
+        if used.all():
+            out.names, out.index, out.indptr = names, index, indptr
+        else:
+            out.names = [fn for fn, u in zip(names, used.tolist()) if u]
+            out.index = {fn: i for i, fn in enumerate(out.names)}
+            out.indptr = np.zeros(len(out.names) + 1, dtype=np.int64)
+            np.cumsum(lengths[used], out=out.indptr[1:])
+            indices = (np.cumsum(used) - 1)[indices]
+        out.indices, out.weights = indices, weights
+        return out
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.indices)
+
+
+def propagate(csr: ReverseCSR, source: str, max_depth: int, min_confidence: float) -> Dict[str, Dict]:
+    """Docs reachable from `source` within `max_depth` hops.
+
+    Returns doc -> {"hops", "confidence", "via"}, where `via` is the
+    previous doc on the best path (`source` for direct dependents). The
+    walk is level-synchronous, like bounded Bellman-Ford. After level k,
+    each doc holds the best product over paths of at most k hops. Only
+    docs that improved are expanded at the next level.
+    """
+    start = csr.index.get(source)
+    if start is None or max_depth < 1:
+        return {}
+    n = len(csr)
+    best = np.zeros(n, dtype=np.float64)
+    hops = np.zeros(n, dtype=np.int64)
+    via = np.full(n, -1, dtype=np.int64)
+    best[start] = np.inf  # never re-entered
+    frontier = np.array([start], dtype=np.int64)
+    for level in range(1, max_depth + 1):
+        starts, ends = csr.indptr[frontier], csr.indptr[frontier + 1]
+        counts = ends - starts
+        if not counts.sum():
+            break
+        # flat edge positions of every frontier row, and the row each came from
+        parent = np.repeat(frontier, counts)
+        pos = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        targets = csr.indices[pos]
+        conf = csr.weights[pos] * np.where(parent == start, 1.0, best[parent])
+        # direct dependents are always reported; the threshold prunes longer paths
+        keep = ((conf >= min_confidence) | (level == 1)) & (conf > best[targets])
+        if not keep.any():
+            break
+        targets, conf, parent = targets[keep], conf[keep], parent[keep]
+        # best candidate per target: sort by target, then confidence descending
+        order = np.lexsort((-conf, targets))
+        targets, conf, parent = targets[order], conf[order], parent[order]
+        first = np.ones(len(targets), dtype=bool)
+        first[1:] = targets[1:] != targets[:-1]
+        frontier = targets[first]
+        best[frontier] = conf[first]
+        hops[frontier] = level
+        via[frontier] = parent[first]
+    reached = np.nonzero((best > 0) & np.isfinite(best))[0]
+    return {
+        csr.names[i]: {"hops": int(hops[i]), "confidence": round(float(best[i]), 4), "via": csr.names[via[i]]}
+        for i in reached.tolist()
+    }
@@ -0,0 +1,241 @@
+import os
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+from .vector_store import quantize
+
+# below this many vectors a brute-force scan is both exact and fast enough
+ANN_MIN_ROWS = int(os.environ.get("ANN_MIN_ROWS", "20000"))
+ANN_NPROBE = int(os.environ.get("ANN_NPROBE", "8"))
+
+
+def kmeans(vectors, n_clusters: int, iters: int = 10, seed: int = 0, sample: int = 64):
+    """Spherical k-means on normalized vectors; returns normalized centroids.
+
+    Trains on at most `sample` points per cluster so cost stays bounded.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    if n > n_clusters * sample:
+        vectors = vectors[rng.choice(n, n_clusters * sample, replace=False)]
+        n = len(vectors)
+    centroids = vectors[rng.choice(n, n_clusters, replace=False)].astype(np.float32)
+    for _ in range(iters):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        counts = np.bincount(assign, minlength=n_clusters)
+        # per-cluster sums via one sort + reduceat (np.add.at is very slow)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        # re-seed empty clusters from random points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(n, int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index over normalized vectors, in plain NumPy.
+
+    Vectors are bucketed by their nearest k-means centroid; a query only
+    scans the `nprobe` closest buckets. `nprobe` is the recall/speed knob
+    (`nprobe == n_lists` is exhaustive). `add` / `remove` are incremental;
+    the centroids are retrained when the index has grown or shrunk 4x
+    since the last training. Below `min_rows` vectors, `search` is an
+    exact brute-force scan.
+
+    Keys are any hashable (DocIndex uses paragraph hashes); `search`
+    returns internal ids, mapped back with `key_of`.
+
+    With `dtype="float16"` or `"int8"` the vectors are kept quantized as in
+    `MmapVectorStore` (int8 with a per-row scale), and only the lists a
+    query probes are scored as float32.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nprobe: int = ANN_NPROBE,
+        min_rows: int = ANN_MIN_ROWS,
+        n_lists: Optional[int] = None,
+        dtype: str = "float32",
+    ):
+        self.dim = dim
+        self.dtype = dtype
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self.n_lists_hint = n_lists
+        self.centroids = None
+        self.trained_size = 0
+        self.key_of: List[Hashable] = []
+        self._id_of: Dict[Hashable, int] = {}
+        self._free: List[int] = []
+        self._vectors = np.zeros((0, dim), dtype=dtype)
+        self._scales = np.zeros(0, dtype=np.float32) if dtype == "int8" else None
+        # per-list member ids, and id -> (list, position)
+        self._lists: List[List[int]] = []
+        self._where: Dict[int, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._id_of)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._id_of
+
+    def keys(self):
+        return self._id_of.keys()
+
+    @property
+    def approximate(self) -> bool:
+        return self.centroids is not None and len(self) >= self.min_rows
+
+    def _alloc(self, key: Hashable) -> int:
+        if self._free:
+            i = self._free.pop()
+            self.key_of[i] = key
+        else:
+            i = len(self.key_of)
+            self.key_of.append(key)
+        self._id_of[key] = i
+        return i
+
+    def _grow(self, needed: int) -> None:
+        if needed <= len(self._vectors):
+            return
+        cap = max(needed, 2 * len(self._vectors), 1024)
+        grown = np.zeros((cap, self.dim), dtype=self._vectors.dtype)
+        grown[: len(self._vectors)] = self._vectors
+        if self._scales is not None:
+            scales = np.ones(cap, dtype=np.float32)
+            scales[: len(self._scales)] = self._scales
+            self._scales = scales
+        self._vectors = grown
+
+    def _rows(self, ids) -> "np.ndarray":
+        # float32 copies of the stored rows `ids`
+        out = self._vectors[ids].astype(np.float32)
+        if self._scales is not None:
+            out *= self._scales[ids][:, None]
+        return out
+
+    def _assign(self, ids: Sequence[int]) -> None:
+        if self.centroids is None or not len(ids):
+            return
+        ids = np.asarray(ids)
+        buckets = np.argmax(self._rows(ids) @ self.centroids.T, axis=1)
+        for i, b in zip(ids.tolist(), buckets.tolist()):
+            members = self._lists[b]
+            self._where[i] = (b, len(members))
+            members.append(i)
+
+    def _unassign(self, i: int) -> None:
+        where = self._where.pop(i, None)
+        if where is None:
+            return
+        b, pos = where
+        members = self._lists[b]
+        last = members.pop()
+        if last != i:
+            members[pos] = last
+            self._where[last] = (b, pos)
+
+    def add(self, keys: Sequence[Hashable], vectors) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        scales = None
+        if self.dtype != "float32":
+            vectors, scales = quantize(vectors, self.dtype)
+        fresh = []
+        for j, (key, vec) in enumerate(zip(keys, vectors)):
+            if key in self._id_of:
+                i = self._id_of[key]
+                self._unassign(i)
+            else:
+                i = self._alloc(key)
+            self._grow(i + 1)
+            self._vectors[i] = vec
+            if scales is not None:
+                self._scales[i] = scales[j]
+            fresh.append(i)
+        self._maybe_retrain()
+        # a retrain already bucketed everything; otherwise bucket the new rows
+        self._assign([i for i in fresh if i not in self._where])
+
+    def remove(self, keys: Sequence[Hashable]) -> None:
+        for key in keys:
+            i = self._id_of.pop(key, None)
+            if i is None:
+                continue
+            self._unassign(i)
+            self.key_of[i] = None
+            self._free.append(i)
+        self._maybe_retrain()
+
+    def _live_ids(self) -> np.ndarray:
+        return np.fromiter(self._id_of.values(), dtype=np.int64, count=len(self._id_of))
+
+    def _maybe_retrain(self) -> None:
+        n = len(self)
+        if n < self.min_rows:
+            return
+        if self.centroids is not None and self.trained_size // 4 <= n <= 4 * self.trained_size:
+            return
+        self.train()
+
+    def train(self) -> None:
+        """(Re)compute centroids from the current vectors and rebucket everything."""
+        ids = self._live_ids()
+        if not len(ids):
+            return
+        n_lists = self.n_lists_hint or max(1, int(np.sqrt(len(ids))))
+        n_lists = min(n_lists, len(ids))
+        self.centroids = kmeans(self._rows(ids), n_lists)
+        self._lists = [[] for _ in range(n_lists)]
+        self._where = {}
+        self.trained_size = len(ids)
+        self._assign(ids)
+
+    def search(self, q, k: int, nprobe: Optional[int] = None):
+        """Top-k (ids, scores) per query row, sorted descending.
+
+        Rows with fewer than k candidates are padded with id -1 / score -inf.
+        """
+        q = np.asarray(q, dtype=np.float32).reshape(-1, self.dim)
+        m = len(q)
+        best_ids = np.full((m, k), -1, dtype=np.int64)
+        best_scores = np.full((m, k), -np.inf, dtype=np.float32)
+        if not len(self) or k <= 0:
+            return best_ids, best_scores
+
+        if not self.approximate:
+            groups = [(np.arange(m), self._live_ids())]
+        else:
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            probes = np.argpartition(-(q @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+            groups = []
+            # visit each probed list once, with every query that probes it
+            for b in np.unique(probes):
+                members = self._lists[b]
+                if members:
+                    groups.append((np.nonzero((probes == b).any(axis=1))[0], np.asarray(members, dtype=np.int64)))
+
+        for rows, members in groups:
+            sims = q[rows] @ self._rows(members).T
+            kk = min(k, len(members))
+            part = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+            cand_ids = np.concatenate([best_ids[rows], members[part]], axis=1)
+            cand_scores = np.concatenate([best_scores[rows], np.take_along_axis(sims, part, axis=1)], axis=1)
+            top = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+            best_ids[rows] = np.take_along_axis(cand_ids, top, axis=1)
+            best_scores[rows] = np.take_along_axis(cand_scores, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
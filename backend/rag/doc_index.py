@@ -1,17 +1,51 @@
 import os
 import json
-from typing import List, Tuple, Dict
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
 
 try:
-    from sentence_transformers import SentenceTransformer
     import numpy as np
 except Exception:
-    SentenceTransformer = None
     np = None
 
-CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", ".cache")
-EMB_FILE = os.path.join(CACHE_DIR, "embeddings.npz")
-META_FILE = os.path.join(CACHE_DIR, "embeddings_meta.json")
+from .embedding_cache import CACHE_DIR, EMB_FILE, META_FILE, EmbeddingCache, get_embedding_cache, index_paragraphs, normalize_rows, paragraph_hash
+from .ann import IVFIndex
+from .model_service import DEFAULT_MODEL, EmbeddingService, get_embedding_service
+from .vector_store import DTYPES, MmapVectorStore
+
+STORE_DIR = os.path.join(CACHE_DIR, "vector_store")
+# "memory" keeps float32 vectors in process; "float16" / "int8" use the mmap store
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "memory")
+# "exact" scans every paragraph; "ivf" uses the long-lived IVFIndex once the corpus is large
+ANN_SEARCH = os.environ.get("ANN_SEARCH", "exact")
+# with a quantized store, `update_docs` patches rows in memory and rewrites the
+# store once patched plus dropped rows pass this share of the index
+STORE_PATCH_FRACTION = 0.25
+
+# IVF indexes outlive DocIndex instances so inserts/deletes stay incremental
+_ann_indexes: Dict[tuple, IVFIndex] = {}
+_ann_lock = threading.Lock()
+
+
+class RowMeta(Sequence):
+    """`meta` list view: the store's rows, then the rows held in process memory."""
+
+    def __init__(self, base: Sequence, extra: List[Dict]):
+        self._base = base
+        self._extra = extra
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self._extra)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < len(self._base):
+            return self._base[i]
+        return self._extra[i - len(self._base)]
 
 
 class DocIndex:
@@ -19,60 +53,430 @@ class DocIndex:
 
     It stores normalized vectors and metadata and supports similarity search.
     This is a minimal local index intended for demos and small document sets.
+
+    With `storage="float16"` or `"int8"` the vectors and paragraph texts are
+    kept in a quantized `MmapVectorStore` under `store_dir` instead of
+    process memory; other processes can open it with `DocIndex.from_store`.
+
+    With `search="ivf"` queries go through a process-wide `IVFIndex` that is
+    kept in sync paragraph by paragraph; it falls back to exact search
+    below `ANN_MIN_ROWS` paragraphs.
+
+    A long-lived index can follow edits with `update_docs` instead of being
+    rebuilt from the folder. A caller that already holds the doc texts
+    (name -> text) passes them as `texts`, and the folder is not read.
     """
 
-    def __init__(self, docs_dir: str, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        docs_dir: str,
+        model_name: str = DEFAULT_MODEL,
+        service: EmbeddingService = None,
+        storage: str = VECTOR_STORE,
+        store_dir: str = STORE_DIR,
+        search: str = ANN_SEARCH,
+        cache: EmbeddingCache = None,
+        texts: Dict[str, str] = None,
+    ):
+        if storage != "memory" and storage not in DTYPES:
+            raise ValueError(f"unknown vector storage {storage!r}")
+        if search not in ("exact", "ivf"):
+            raise ValueError(f"unknown search mode {search!r}")
         self.docs_dir = docs_dir
         self.model_name = model_name
-        self.model = None
-        self.vectors = None
-        self.meta = []
-        if SentenceTransformer is None:
-            raise RuntimeError("sentence-transformers is not installed")
+        self.storage = storage
+        self.store_dir = store_dir
+        self.search = search
+        self.ann = None
+        self._reset_rows(None, [])
+        # the model is shared process-wide; raises if sentence-transformers is missing
+        self.service = service or get_embedding_service(model_name)
         self._ensure_cache_dir()
-        self._load_or_build()
+        # an empty cache is falsy, so test for None
+        self.cache = cache if cache is not None else get_embedding_cache(model_name)
+        self._load_or_build(texts)
+
+    @classmethod
+    def from_store(
+        cls,
+        store_dir: str = STORE_DIR,
+        model_name: str = DEFAULT_MODEL,
+        service: EmbeddingService = None,
+        search: str = ANN_SEARCH,
+    ) -> "DocIndex":
+        """Read-only index over a store another process built (no re-encoding)."""
+        store = MmapVectorStore.open(store_dir)
+        if store is None:
+            raise RuntimeError(f"no vector store at {store_dir}")
+        self = cls.__new__(cls)
+        self.docs_dir = None
+        self.model_name = model_name
+        self.storage = store.dtype
+        self.store_dir = store_dir
+        self.search = search
+        self.ann = None
+        self.service = service or get_embedding_service(model_name)
+        self.cache = None
+        # the store has no paragraph hashes; (generation, row) are the keys, so
+        # rows of a rewritten store replace the old ones in the shared index
+        self._reset_rows(store, [(store.generation, row) for row in range(store.rows)])
+        if search == "ivf":
+            self._sync_ann(lambda fresh: store.vectors([row for _, row in fresh]))
+        return self
+
+    def __len__(self) -> int:
+        return self._n - len(self._dead)
 
     def _ensure_cache_dir(self):
         os.makedirs(CACHE_DIR, exist_ok=True)
 
-    def _load_or_build(self):
-        # naive rebuild every time for correctness; caching can be added
-        self.model = SentenceTransformer(self.model_name)
+    def _reset_rows(self, store: MmapVectorStore, keys: List, meta: List[Dict] = (), vectors=None) -> None:
+        """Lay the rows out afresh: the store's rows, or `meta` / `vectors` in memory.
+
+        `keys` holds each row's paragraph hash, which is also its ANN key.
+        """
+        self.store = store
+        self.hashes = list(keys)
+        self._n = len(self.hashes)
+        # rows below `_base` are the store's; rows from `_base` on live in `_vectors`
+        self._base = store.rows if store is not None else 0
+        self._dead: Set[int] = set()
+        self._extra_meta = [] if store is not None else list(meta)
+        self.meta = RowMeta(store.meta() if store is not None else [], self._extra_meta)
+        if store is not None:
+            self.doc_names = list(store.doc_names)
+            self._ids = np.array(store.doc_ids, dtype=np.int32)
+            self._vectors = np.zeros((0, store.dim), dtype=np.float32)
+        else:
+            self.doc_names = sorted({m["doc"] for m in meta})
+            codes = {fn: i for i, fn in enumerate(self.doc_names)}
+            self._ids = np.array([codes[m["doc"]] for m in meta], dtype=np.int32)
+            self._vectors = np.asarray(vectors, dtype=np.float32) if self._n else np.zeros((0, 0), dtype=np.float32)
+        self._doc_codes = {fn: i for i, fn in enumerate(self.doc_names)}
+        self._free_codes: List[int] = []
+        # doc -> its rows, and key -> rows (a duplicated paragraph has several)
+        self._doc_rows: Dict[str, Set[int]] = {}
+        self._rows_by_key: Dict[object, List[int]] = {}
+        for row, (code, key) in enumerate(zip(self._ids.tolist(), self.hashes)):
+            self._doc_rows.setdefault(self.doc_names[code], set()).add(row)
+            self._rows_by_key.setdefault(key, []).append(row)
+
+    @property
+    def doc_ids(self):
+        """Paragraph row -> doc code, so per-doc filtering stays in NumPy (-1: dropped store row)."""
+        return self._ids[: self._n]
+
+    def rows_of(self, docs: Iterable[str]) -> List[int]:
+        """Rows of the paragraphs of `docs`, ascending."""
+        return sorted(row for fn in docs for row in self._doc_rows.get(fn, ()))
+
+    def _scores(self, q):
+        n_mem = self._n - self._base
+        mem = q @ self._vectors[:n_mem].T if n_mem else None
+        if self.store is None:
+            return mem
+        base = self.store.scores(q)
+        if self._dead:
+            # `query_vectors` asks for at most len(self) rows, so these never rank
+            base[:, np.fromiter(self._dead, dtype=np.int64, count=len(self._dead))] = -np.inf
+        return base if mem is None else np.concatenate([base, mem], axis=1)
+
+    def _encode(self, texts: List[str]):
+        return normalize_rows(self.service.encode(texts))
+
+    def _load_or_build(self, texts: Dict[str, str] = None):
+        if texts is None:
+            texts = {}
+            for fn in os.listdir(self.docs_dir):
+                if fn.endswith(".md"):
+                    with open(os.path.join(self.docs_dir, fn), "r", encoding="utf-8") as f:
+                        texts[fn] = f.read()
         paras = []
         meta = []
-        for fn in sorted(os.listdir(self.docs_dir)):
-            if not fn.endswith(".md"):
-                continue
-            path = os.path.join(self.docs_dir, fn)
-            with open(path, "r", encoding="utf-8") as f:
-                text = f.read()
-            parts = [p.strip() for p in text.replace("\r\n", "\n").split("\n\n") if p.strip()]
-            for p in parts:
+        for fn in sorted(texts):
+            for p in index_paragraphs(texts[fn]):
                 paras.append(p)
                 meta.append({"doc": fn, "text": p})
+        self._index(paras, meta, [paragraph_hash(p) for p in paras])
+
+    def update_docs(self, docs: Dict[str, str], removed: Iterable[str] = ()) -> Set[Tuple[str, str]]:
+        """Re-index the paragraphs of `docs` (name -> text) and drop the `removed` docs.
+
+        Nothing is read from disk and only the rows of these docs change: a
+        paragraph that is still there keeps its row, new ones take the freed
+        rows or are appended, and leftover holes are filled from the end.
+        Only new paragraphs are encoded, and only vectors no row uses any
+        more leave the cache. With a quantized store, patched rows are held
+        in memory and dropped store rows are masked until they pass
+        `STORE_PATCH_FRACTION` of the index; the store is then rewritten,
+        and other processes see the edits. Returns the (doc, paragraph hash)
+        keys whose number of rows changed.
+        """
+        changed: Set[Tuple[str, str]] = set()
+        free: List[int] = []
+        new: List[Tuple[str, str, str]] = []  # (doc, text, hash) per row to add
+        for fn in set(docs) | set(removed):
+            texts: Dict[str, str] = {}
+            wanted, held = Counter(), Counter()
+            for p in index_paragraphs(docs[fn]) if fn in docs else ():
+                h = paragraph_hash(p)
+                texts[h] = p
+                wanted[h] += 1
+            for row in sorted(self._doc_rows.get(fn, ())):
+                h = self.hashes[row]
+                held[h] += 1
+                if held[h] > wanted[h]:
+                    free.append(row)
+            for h in wanted.keys() | held.keys():
+                if wanted[h] != held[h]:
+                    changed.add((fn, h))
+                new.extend((fn, texts[h], h) for _ in range(wanted[h] - held[h]))
+        if not free and not new:
+            return changed
 
-        if paras:
-            vecs = self.model.encode(paras, convert_to_numpy=True)
-            # normalize
-            norms = (vecs ** 2).sum(axis=1, keepdims=True) ** 0.5
-            norms[norms == 0] = 1.0
-            vecs = vecs / norms
-            self.vectors = vecs
-            self.meta = meta
+        new_hashes = [h for _, _, h in new]
+        touched_keys = set(new_hashes) | {self.hashes[row] for row in free}
+        before = {h for h in touched_keys if h in self._rows_by_key}
+        missing = self.cache.missing(new_hashes)
+        if missing:
+            by_hash = {h: p for _, p, h in new}
+            self.cache.put_many(missing, self._encode([by_hash[h] for h in missing]))
+        vectors = self.cache.get_many(new_hashes) if new else None
+
+        for row in free:
+            self._drop_row(row)
+        holes = sorted((row for row in free if row >= self._base), reverse=True)
+        for (fn, text, h), vector in zip(new, vectors if new else ()):
+            row = holes.pop() if holes else self._append_row(len(vector))
+            self._set_row(row, fn, text, h, vector)
+        holes = set(holes)
+        while holes:
+            last = self._n - 1
+            if last in holes:
+                holes.discard(last)
+            else:
+                self._move_row(last, holes.pop())
+            self._n -= 1
+            self.hashes.pop()
+            self._extra_meta.pop()
+
+        # drop vectors of paragraphs that were edited away or deleted
+        gone = [h for h in before if h not in self._rows_by_key]
+        fresh = [h for h in touched_keys - before if h in self._rows_by_key]
+        self.cache.discard(gone)
+        self.cache.save()
+        if self.search == "ivf":
+            if self.ann is None or not self._rows_by_key:
+                self._sync_ann(self.cache.get_many)
+            elif gone or fresh:
+                with _ann_lock:
+                    self.ann.remove(gone)
+                    if fresh:
+                        self.ann.add(fresh, self.cache.get_many(fresh))
+        if self.store is not None and self._n - self._base + len(self._dead) > STORE_PATCH_FRACTION * len(self):
+            live = [row for row in range(self._n) if row not in self._dead]
+            self._publish([self.meta[row] for row in live], [self.hashes[row] for row in live])
+        return changed
+
+    def _drop_row(self, row: int) -> None:
+        # a store row is only masked; a memory row is left as a hole to refill
+        fn = self.doc_names[self._ids[row]]
+        rows = self._doc_rows[fn]
+        rows.discard(row)
+        if not rows:
+            del self._doc_rows[fn]
+            code = self._doc_codes.pop(fn)
+            self.doc_names[code] = None
+            self._free_codes.append(code)
+        keyed = self._rows_by_key[self.hashes[row]]
+        keyed.remove(row)
+        if not keyed:
+            del self._rows_by_key[self.hashes[row]]
+        if row < self._base:
+            self._ids[row] = -1
+            self._dead.add(row)
+
+    def _append_row(self, dim: int) -> int:
+        row = self._n
+        n_mem = row - self._base
+        if n_mem == len(self._vectors) or self._vectors.shape[1] != dim:
+            # capacity doubles, so appends stay amortized O(1)
+            grown = np.zeros((max(2 * len(self._vectors), 1024), dim), dtype=np.float32)
+            if n_mem:
+                grown[:n_mem] = self._vectors[:n_mem]
+            self._vectors = grown
+        if row == len(self._ids):
+            ids = np.zeros(max(2 * len(self._ids), 1024), dtype=np.int32)
+            ids[:row] = self._ids[:row]
+            self._ids = ids
+        self._n += 1
+        self.hashes.append(None)
+        self._extra_meta.append(None)
+        return row
+
+    def _set_row(self, row: int, fn: str, text: str, h: str, vector) -> None:
+        code = self._doc_codes.get(fn)
+        if code is None:
+            code = self._free_codes.pop() if self._free_codes else len(self.doc_names)
+            if code == len(self.doc_names):
+                self.doc_names.append(fn)
+            else:
+                self.doc_names[code] = fn
+            self._doc_codes[fn] = code
+        self._ids[row] = code
+        self._vectors[row - self._base] = vector
+        self._extra_meta[row - self._base] = {"doc": fn, "text": text}
+        self.hashes[row] = h
+        self._doc_rows.setdefault(fn, set()).add(row)
+        self._rows_by_key.setdefault(h, []).append(row)
+
+    def _move_row(self, src: int, dst: int) -> None:
+        h = self.hashes[src]
+        rows = self._doc_rows[self.doc_names[self._ids[src]]]
+        rows.discard(src)
+        rows.add(dst)
+        keyed = self._rows_by_key[h]
+        keyed[keyed.index(src)] = dst
+        self._ids[dst] = self._ids[src]
+        self._vectors[dst - self._base] = self._vectors[src - self._base]
+        self._extra_meta[dst - self._base] = self._extra_meta[src - self._base]
+        self.hashes[dst] = h
+
+    def _index(self, paras: List[str], meta: List[Dict], hashes: List[str]) -> None:
+        # paragraph vectors come from the content-addressed cache; only new or
+        # edited paragraphs are encoded
+        missing = self.cache.missing(hashes)
+        if missing:
+            by_hash = dict(zip(hashes, paras))
+            self.cache.put_many(missing, self._encode([by_hash[h] for h in missing]))
+        # drop vectors of paragraphs that were edited away or deleted
+        self.cache.retain(hashes)
+        self.cache.save()
+
+        if self.storage != "memory":
+            self._publish(meta, hashes)
         else:
-            self.vectors = None
-            self.meta = []
+            self._reset_rows(None, hashes, meta, self.cache.get_many(hashes) if paras else None)
+
+        if self.search == "ivf":
+            self._sync_ann(self.cache.get_many)
+
+    def _publish(self, meta: List[Dict], hashes: List[str]) -> None:
+        # reuse the published store when it already holds exactly these rows
+        fingerprint = paragraph_hash("\n".join(f"{m['doc']}\t{h}" for m, h in zip(meta, hashes)) + self.model_name)
+        store = MmapVectorStore.open(self.store_dir)
+        if store is None or store.dtype != self.storage or store.fingerprint != fingerprint:
+            vectors = self.cache.get_many(hashes) if hashes else []
+            store = MmapVectorStore.write(
+                self.store_dir,
+                vectors,
+                [m["text"] for m in meta],
+                [m["doc"] for m in meta],
+                dtype=self.storage,
+                fingerprint=fingerprint,
+            )
+        self._reset_rows(store, hashes)
+
+    def _sync_ann(self, vectors_for) -> None:
+        """Bring the shared IVF index in line with the rows' keys.
+
+        Only keys that appeared since the last sync are inserted and only
+        vanished ones are deleted; `vectors_for(keys)` supplies new vectors.
+        """
+        if not self._rows_by_key:
+            self.ann = None
+            return
+        with _ann_lock:
+            ann_key = (self.model_name, self.storage, os.path.abspath(self.docs_dir) if self.docs_dir else self.store_dir)
+            ann = _ann_indexes.get(ann_key)
+            fresh = [k for k in self._rows_by_key if ann is None or k not in ann]
+            vectors = vectors_for(fresh) if fresh else None
+            if ann is None:
+                # quantized like the store, so the index does not undo its savings
+                dtype = "float32" if self.storage == "memory" else self.storage
+                ann = _ann_indexes[ann_key] = IVFIndex(vectors.shape[1], dtype=dtype)
+            gone = [k for k in ann.keys() if k not in self._rows_by_key]
+            if gone:
+                ann.remove(gone)
+            if fresh:
+                ann.add(fresh, vectors)
+            self.ann = ann
+
+
+    def _top_k(self, sims, top_k: int):
+        """Row-wise indices of the `top_k` largest sims, sorted descending."""
+        n = sims.shape[1]
+        k = min(top_k, n)
+        if k < n:
+            part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(n), (sims.shape[0], n))
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        # stable on ties: higher score first, then lower paragraph index
+        order = np.lexsort((part, -part_sims), axis=1)
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_sims, order, axis=1)
 
     def query(self, text: str, top_k: int = 5) -> List[Tuple[float, Dict]]:
-        if self.vectors is None:
+        if not len(self):
             return []
-        q = self.model.encode([text], convert_to_numpy=True)
-        q = q / ((q ** 2).sum() ** 0.5)
-        sims = (self.vectors @ q[0]).tolist()
-        # pair sims with meta
-        pairs = list(enumerate(sims))
-        pairs.sort(key=lambda x: -x[1])
-        results = []
-        for idx, score in pairs[:top_k]:
-            results.append((float(score), self.meta[idx]))
-        return results
+        idx, scores = self.query_many([text], top_k=top_k)
+        return [(float(score), self.meta[i]) for i, score in zip(idx[0].tolist(), scores[0].tolist()) if i >= 0]
+
+    def query_many(self, texts: List[str], top_k: int = 5, chunk_size: int = 256):
+        """Batched `query`: one encode for all texts, one matmul per chunk.
+
+        Returns (indices, scores), both of shape (len(texts), k) and sorted
+        descending per row; indices point into `meta` / `doc_ids`. Queries are
+        processed `chunk_size` rows at a time so the similarity block stays
+        bounded for large corpora.
+        """
+        if not len(self) or not texts:
+            return np.zeros((len(texts), 0), dtype=np.int64), np.zeros((len(texts), 0), dtype=np.float32)
+        return self.query_vectors(self.encode_queries(texts), top_k=top_k, chunk_size=chunk_size)
+
+    def encode_queries(self, texts: List[str]):
+        """Normalized float32 query vectors, as `query_many` encodes them."""
+        return self._encode(list(texts)).astype(np.float32, copy=False)
+
+    def query_vectors(self, q, top_k: int = 5, chunk_size: int = 256):
+        """`query_many` for already encoded queries `q`."""
+        if not len(self) or not len(q):
+            return np.zeros((len(q), 0), dtype=np.int64), np.zeros((len(q), 0), dtype=np.float32)
+        if self.ann is not None and self.ann.approximate:
+            ids, scores = self.ann.search(q, top_k)
+            return self._ann_rows(ids, scores, top_k)
+        all_idx, all_scores = [], []
+        for start in range(0, len(q), chunk_size):
+            idx, scores = self._top_k(self._scores(q[start : start + chunk_size]), min(top_k, len(self)))
+            all_idx.append(idx)
+            all_scores.append(scores)
+        return np.concatenate(all_idx), np.concatenate(all_scores)
+
+    def row_scores(self, q, rows):
+        """Scores of encoded queries `q` against the given rows only."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.store is None:
+            return q @ self._vectors[rows].T
+        out = np.empty((len(q), len(rows)), dtype=np.float32)
+        stored = rows < self._base
+        if stored.any():
+            out[:, stored] = q @ self.store.vectors(rows[stored]).T
+        if not stored.all():
+            out[:, ~stored] = q @ self._vectors[rows[~stored] - self._base].T
+        return out
+
+    def _ann_rows(self, ids, scores, top_k: int):
+        # map IVF keys back to rows (a duplicated paragraph maps to several rows)
+        idx = np.full((len(ids), top_k), -1, dtype=np.int64)
+        out = np.full((len(ids), top_k), -np.inf, dtype=np.float32)
+        for r, (row_ids, row_scores) in enumerate(zip(ids.tolist(), scores.tolist())):
+            col = 0
+            for i, score in zip(row_ids, row_scores):
+                if i < 0:
+                    break
+                for row in self._rows_by_key[self.ann.key_of[i]]:
+                    if col == top_k:
+                        break
+                    idx[r, col], out[r, col] = row, score
+                    col += 1
+        return idx, out
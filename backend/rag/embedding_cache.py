@@ -0,0 +1,280 @@
+"""Persistent, content-addressed cache of paragraph embeddings.
+
+Vectors are keyed by (model name, paragraph MD5), so an unchanged
+paragraph is never encoded twice, across events and across restarts.
+
+`EMB_FILE` holds one pair of arrays (vectors and their hashes) per model.
+`save()` does not rewrite it on every change: the rows added and the
+hashes dropped since the last save go to a small segment file next to it
+(``embeddings.<array>.<ns>.npz``), which loading applies in order on top
+of the base arrays. Once a model has `MAX_SEGMENTS` segments, or a save
+would carry more than half its rows, the save compacts everything back
+into `EMB_FILE`. `META_FILE` is a readable summary.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", ".cache")
+EMB_FILE = os.path.join(CACHE_DIR, "embeddings.npz")
+META_FILE = os.path.join(CACHE_DIR, "embeddings_meta.json")
+MAX_SEGMENTS = 32
+
+
+def paragraph_hash(text: str) -> str:
+    """MD5 hex digest of `text`, the paragraph and doc ID used across the backend."""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def normalize_rows(vectors):
+    """Float32 copy of `vectors` with unit-length rows (zero rows stay zero).
+
+    Cache rows are unit vectors, so DocIndex scores are cosine
+    similarities; every writer normalizes with this before `put_many`.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def index_paragraphs(text: str) -> List[str]:
+    """Paragraphs as `DocIndex` embeds them (blank-line separated, stripped)."""
+    return [p.strip() for p in text.replace("\r\n", "\n").split("\n\n") if p.strip()]
+
+
+def _array_name(model_name: str) -> str:
+    # model names may contain "/" which npz member names should not
+    return "m_" + hashlib.md5(model_name.encode("utf-8")).hexdigest()[:16]
+
+
+class EmbeddingCache:
+    """Paragraph embeddings of one model, loaded from and saved to `emb_file`."""
+
+    def __init__(self, model_name: str, emb_file: str = EMB_FILE, meta_file: str = META_FILE):
+        if np is None:
+            raise RuntimeError("numpy is not installed")
+        self.model_name = model_name
+        self.emb_file = emb_file
+        self.meta_file = meta_file
+        self._lock = threading.Lock()
+        self._rows: Dict[str, np.ndarray] = {}
+        # changes since the last save, written out as the next segment
+        self._added: Set[str] = set()
+        self._dropped: Set[str] = set()
+        # lookups served from the cache, and paragraphs that had to be encoded
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, h: str) -> bool:
+        return h in self._rows
+
+    def _segment_prefix(self) -> str:
+        return f"{os.path.splitext(self.emb_file)[0]}.{_array_name(self.model_name)}."
+
+    def _segments(self) -> List[str]:
+        """This model's segment files, oldest first."""
+        prefix = self._segment_prefix()
+        folder, base = os.path.split(prefix)
+        try:
+            names = os.listdir(folder or ".")
+        except OSError:
+            return []
+        # ns timestamps are zero-padded, so name order is write order
+        return [
+            os.path.join(folder, n)
+            for n in sorted(names)
+            if n.startswith(base) and n.endswith(".npz") and ".tmp" not in n
+        ]
+
+    def _load(self) -> None:
+        name = _array_name(self.model_name)
+        if os.path.exists(self.emb_file):
+            try:
+                with np.load(self.emb_file) as data:
+                    if name in data.files:
+                        vectors = data[name]
+                        hashes = data[name + "_keys"].tolist()
+                        self._rows = {h: vectors[i] for i, h in enumerate(hashes)}
+            except Exception:
+                # unreadable or partial cache: start empty, it is rebuilt on demand
+                self._rows = {}
+        for path in self._segments():
+            try:
+                with np.load(path) as data:
+                    vectors = data["vectors"]
+                    hashes = data["keys"].tolist()
+                    dropped = data["dropped"].tolist()
+            except Exception:
+                # a torn segment from a crash; its rows are encoded again when needed
+                continue
+            for h in dropped:
+                self._rows.pop(h, None)
+            for i, h in enumerate(hashes):
+                self._rows[h] = vectors[i]
+
+    def missing(self, hashes: Iterable[str]) -> List[str]:
+        """Unique hashes (in first-seen order) that still need encoding."""
+        out, seen, hits = [], set(), 0
+        for h in hashes:
+            if h in self._rows:
+                hits += 1
+            elif h not in seen:
+                seen.add(h)
+                out.append(h)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(out)
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"rows": len(self._rows), "hits": self.hits, "misses": self.misses}
+
+    def put_many(self, hashes: List[str], vectors) -> None:
+        with self._lock:
+            for h, v in zip(hashes, vectors):
+                self._rows[h] = np.asarray(v, dtype=np.float32)
+                self._added.add(h)
+                self._dropped.discard(h)
+
+    def get_many(self, hashes: List[str]):
+        return np.stack([self._rows[h] for h in hashes]).astype(np.float32, copy=False)
+
+    def retain(self, live: Iterable[str]) -> int:
+        """Garbage-collect rows whose paragraph no longer exists; returns count."""
+        live = set(live)
+        with self._lock:
+            dead = [h for h in self._rows if h not in live]
+            for h in dead:
+                del self._rows[h]
+                self._added.discard(h)
+                self._dropped.add(h)
+        return len(dead)
+
+    def discard(self, hashes: Iterable[str]) -> int:
+        """Drop the rows of `hashes` only, without scanning the cache; returns count."""
+        dropped = 0
+        with self._lock:
+            for h in hashes:
+                if self._rows.pop(h, None) is not None:
+                    self._added.discard(h)
+                    self._dropped.add(h)
+                    dropped += 1
+        return dropped
+
+    def save(self) -> None:
+        """Persist the changes since the last save, as a segment or by compacting."""
+        with self._lock:
+            if not self._added and not self._dropped:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.emb_file)), exist_ok=True)
+            segments = self._segments()
+            if (
+                not os.path.exists(self.emb_file)
+                or len(segments) >= MAX_SEGMENTS
+                or len(self._added) + len(self._dropped) > len(self._rows) // 2
+            ):
+                self._compact(segments)
+                segment_count = 0
+            else:
+                self._write_segment()
+                segment_count = len(segments) + 1
+            self._added, self._dropped = set(), set()
+            self._write_meta(segment_count)
+
+    def _write_segment(self) -> None:
+        added = sorted(self._added)
+        vectors = np.stack([self._rows[h] for h in added]) if added else np.zeros((0, 0), dtype=np.float32)
+        path = f"{self._segment_prefix()}{time.time_ns():020d}.npz"
+        tmp = path[: -len(".npz")] + ".tmp.npz"
+        np.savez(tmp, vectors=vectors.astype(np.float32), keys=np.array(added), dropped=np.array(sorted(self._dropped)))
+        os.replace(tmp, path)
+
+    def _compact(self, segments: List[str]) -> None:
+        # this model's rows into the base file, keeping other models' arrays intact
+        arrays = {}
+        if os.path.exists(self.emb_file):
+            try:
+                with np.load(self.emb_file) as data:
+                    arrays = {k: data[k] for k in data.files}
+            except Exception:
+                arrays = {}
+        name = _array_name(self.model_name)
+        hashes = list(self._rows)
+        arrays.pop(name, None)
+        arrays.pop(name + "_keys", None)
+        if hashes:
+            arrays[name] = np.stack([self._rows[h] for h in hashes]).astype(np.float32)
+            arrays[name + "_keys"] = np.array(hashes)
+
+        # vectors and their hashes live in one file, swapped in atomically
+        tmp_emb = self.emb_file + ".tmp.npz"
+        np.savez(tmp_emb, **arrays)
+        os.replace(tmp_emb, self.emb_file)
+        # only the segments read before the write are folded in
+        for path in segments:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_meta(self, segments: int) -> None:
+        # human-readable summary of what the cache holds (not needed to load it)
+        meta = {"models": {}}
+        try:
+            with open(self.meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            pass
+        models = meta.setdefault("models", {})
+        if self._rows:
+            dim = len(next(iter(self._rows.values())))
+            models[self.model_name] = {
+                "array": _array_name(self.model_name),
+                "rows": len(self._rows),
+                "dim": int(dim),
+                "segments": segments,
+            }
+        else:
+            models.pop(self.model_name, None)
+        tmp_meta = self.meta_file + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_meta, self.meta_file)
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def current_embedding_cache(model_name: str) -> Optional[EmbeddingCache]:
+    """The shared cache of `model_name` if it has been loaded, without loading it."""
+    return _caches.get(model_name)
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    """Shared `EmbeddingCache` of `model_name` in the default files, loaded on first use.
+
+    Every writer in the process goes through this one instance, so a save
+    never compacts away rows another instance added.
+    """
+    with _caches_lock:
+        cache = _caches.get(model_name)
+        if cache is None:
+            cache = EmbeddingCache(model_name)
+            _caches[model_name] = cache
+        return cache
@@ -0,0 +1,45 @@
+"""Offline stand-in for the Gemini backend (LLM_BACKEND=fake).
+
+Returns a result in the same `{summary, severity, impacted_docs}` shape as
+`run_llm`, derived from the event only, after an optional simulated
+latency. `fail_rate` makes a share of calls raise, which exercises the
+worker pool's retry path.
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class FakeLLM:
+    def __init__(self, latency: float = 0.05, fail_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, changed_event: Dict[str, Any]) -> Dict[str, Any]:
+        return self.batch([changed_event])[0]
+
+    def batch(self, changed_events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One simulated call answering several events, like `run_llm_batch`."""
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.fail_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise RuntimeError("fake LLM backend failure")
+        return [self._result(event) for event in changed_events]
+
+    @staticmethod
+    def _result(changed_event: Dict[str, Any]) -> Dict[str, Any]:
+        impacted = sorted(changed_event.get("impacted_docs", {}))
+        severity = "high" if len(impacted) > 2 else "medium" if impacted else "low"
+        return {
+            "summary": f"{changed_event.get('summary', '')} ({len(impacted)} dependent doc(s))".strip(),
+            "severity": severity,
+            "impacted_docs": impacted,
+        }
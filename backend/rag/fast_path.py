@@ -0,0 +1,206 @@
+"""Local impact classification for changes that do not need the LLM.
+
+Most events are small edits that `heuristic_summary` already recognises,
+such as "Changed numeric value from 14 to 7". A Gemini round-trip adds
+seconds and says little more. `FastPathClassifier` answers these locally,
+in the `{summary, severity, impacted_docs}` shape `run_llm` returns.
+Recognised change classes:
+
+- whitespace: every edited paragraph is the same apart from spacing,
+- numeric / date: every edited paragraph is the same apart from numbers or
+  dates. Dependent snippets that still state an old value are flagged,
+- added / removed: paragraphs only added or only removed. These are
+  confident when no dependent snippet is similar to them (embedding cosine,
+  or token overlap without a model).
+
+Anything else, or a class whose confidence is below `min_confidence`,
+returns None and goes to the LLM. Those escalations are counted.
+"""
+
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+FAST_PATH_MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+_MONTHS = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_DATE_RE = re.compile(
+    r"\b(?:\d{4}-\d{1,2}-\d{1,2}"
+    r"|\d{1,2}[/.]\d{1,2}[/.]\d{2,4}"
+    rf"|{_MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}"
+    rf"|\d{{1,2}}(?:st|nd|rd|th)?\s+{_MONTHS}\.?,?\s+\d{{4}})\b",
+    re.IGNORECASE,
+)
+_NUM_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# below this similarity an added/removed paragraph is unrelated to a dependent snippet
+RELATED_MIN_COSINE = 0.5
+RELATED_MIN_OVERLAP = 0.35
+
+
+def _collapse(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _words(text: str):
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _skeleton(text: str) -> str:
+    return _NUM_RE.sub("<num>", _DATE_RE.sub("<date>", _collapse(text)))
+
+
+def _values(pattern: "re.Pattern", text: str) -> List[str]:
+    return [m.group(0) for m in pattern.finditer(text)]
+
+
+def _mentions(value: str, snippets: List[str]) -> bool:
+    pattern = re.compile(rf"(?<![\w.,]){re.escape(value)}(?![\w]|[.,]\d)", re.IGNORECASE)
+    return any(pattern.search(s) for s in snippets)
+
+
+class FastPathClassifier:
+    """Rule-based classifier with embedding similarity for added/removed text."""
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[List[str]], Any]] = None,
+        tokens: Callable[[str], Any] = _words,
+        min_confidence: float = FAST_PATH_MIN_CONFIDENCE,
+    ):
+        # `embed` returns L2-normalised vectors (as `_paragraph_embedder` does);
+        # `tokens` is the fallback similarity's tokenizer
+        self.embed = embed
+        self.tokens = tokens
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        # counters
+        self.handled = 0
+        self.escalated = 0
+        self.by_class: Dict[str, int] = {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.handled + self.escalated
+            return {
+                "handled": self.handled,
+                "escalated": self.escalated,
+                "escalation_rate": round(self.escalated / total, 4) if total else 0.0,
+                "by_class": dict(self.by_class),
+            }
+
+    def classify(self, changed_event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Local result for `changed_event`, or None to escalate to the LLM."""
+        change_class, confidence, result = self._classify(changed_event)
+        with self._lock:
+            if result is None or confidence < self.min_confidence:
+                self.escalated += 1
+                return None
+            self.handled += 1
+            self.by_class[change_class] = self.by_class.get(change_class, 0) + 1
+        return result
+
+    def _classify(self, event: Dict[str, Any]) -> Tuple[str, float, Optional[Dict[str, Any]]]:
+        old: List[str] = event.get("old_snippets", [])
+        new: List[str] = event.get("new_snippets", [])
+        impacted: Dict[str, List[str]] = event.get("impacted_docs", {})
+        if old and new:
+            pairs = self._pair(old, new)
+            if pairs is None:
+                return "rewrite", 0.0, None
+            return self._edited(pairs, impacted)
+        if new or old:
+            return self._added_or_removed(new or old, added=bool(new), impacted=impacted)
+        return "empty", 0.0, None
+
+    @staticmethod
+    def _pair(old: List[str], new: List[str]) -> Optional[List[Tuple[str, str]]]:
+        """Match old to new paragraphs with the same skeleton, or None if any is left over."""
+        if len(old) != len(new):
+            return None
+        pending: Dict[str, List[str]] = {}
+        for o in old:
+            pending.setdefault(_skeleton(o), []).append(o)
+        pairs = []
+        for n in new:
+            bucket = pending.get(_skeleton(n))
+            if not bucket:
+                return None
+            pairs.append((bucket.pop(0), n))
+        return pairs
+
+    def _edited(self, pairs: List[Tuple[str, str]], impacted: Dict[str, List[str]]):
+        changes: List[Tuple[str, str, str]] = []  # (kind, old value, new value)
+        for o, n in pairs:
+            if _collapse(o) == _collapse(n):
+                continue
+            odates, ndates = _values(_DATE_RE, o), _values(_DATE_RE, n)
+            changes += [("date", a, b) for a, b in zip(odates, ndates) if a != b]
+            onums = _values(_NUM_RE, _DATE_RE.sub(" ", o))
+            nnums = _values(_NUM_RE, _DATE_RE.sub(" ", n))
+            changes += [("numeric", a, b) for a, b in zip(onums, nnums) if a != b]
+        if not changes:
+            return "whitespace", 1.0, {
+                "summary": "Whitespace or formatting-only change; no content changed",
+                "severity": "low",
+                "impacted_docs": [],
+            }
+
+        kinds = {kind for kind, _, _ in changes}
+        if kinds == {"date"}:
+            change_class, label = "date", "date"
+        elif kinds == {"numeric"}:
+            change_class, label = "numeric", "numeric value"
+        else:
+            change_class, label = "numeric", "value"
+        shown = list(dict.fromkeys(f"{a} to {b}" for _, a, b in changes))
+        summary = f"Changed {label}{'s' if len(shown) > 1 else ''} from " + ", ".join(shown[:3])
+        stale = sorted(doc for doc, snips in impacted.items() if any(_mentions(a, snips) for _, a, _ in changes))
+        if stale:
+            summary += f"; still stated in {', '.join(stale)}"
+            severity, docs = "high", stale
+        else:
+            severity, docs = ("medium", sorted(impacted)) if impacted else ("low", [])
+        return change_class, 0.95, {"summary": summary, "severity": severity, "impacted_docs": docs}
+
+    def _added_or_removed(self, pars: List[str], added: bool, impacted: Dict[str, List[str]]):
+        change_class = "added" if added else "removed"
+        summary = f"{'Added' if added else 'Removed'} {len(pars)} paragraph(s)"
+        if not impacted:
+            return change_class, 0.9, {"summary": summary, "severity": "low", "impacted_docs": []}
+        snippets = [s for snips in impacted.values() for s in snips]
+        if not snippets:
+            return change_class, 0.0, None
+        score, related_min = self._similarity(pars, snippets)
+        if score >= related_min:
+            # dependents discuss this content; the LLM judges the impact
+            return change_class, 0.5, None
+        return change_class, 0.9, {
+            "summary": f"{summary}; not referenced by dependent documents",
+            "severity": "low",
+            "impacted_docs": [],
+        }
+
+    def _similarity(self, pars: List[str], snippets: List[str]) -> Tuple[float, float]:
+        """Highest paragraph/snippet similarity, and the threshold for `related`."""
+        if self.embed is not None:
+            try:
+                vecs = self.embed(pars + snippets)
+                sims = vecs[: len(pars)] @ vecs[len(pars):].T
+                return float(sims.max()), RELATED_MIN_COSINE
+            except Exception:
+                self.embed = None
+        best = 0.0
+        snippet_words = [self.tokens(s) for s in snippets]
+        for p in pars:
+            words = self.tokens(p)
+            for other in snippet_words:
+                smaller = min(len(words), len(other))
+                if smaller:
+                    best = max(best, len(words & other) / smaller)
+        return best, RELATED_MIN_OVERLAP
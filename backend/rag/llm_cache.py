@@ -0,0 +1,184 @@
+"""Persistent LLM response cache keyed by model name and prompt hash.
+
+Re-saving a change, or reverting it, produces the exact prompt
+`build_prompt` produced before. With temperature 0 the answer is the same,
+so it is served from here instead of another API call. Entries expire
+after `ttl` seconds. Once the stored results exceed `max_bytes`, the least
+recently used entries are evicted. Concurrent identical requests share
+one in-flight call.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", ".cache")
+LLM_CACHE_FILE = os.path.join(CACHE_DIR, "llm_cache.sqlite3")
+LLM_CACHE_TTL_S = float(os.environ.get("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.environ.get("LLM_CACHE_MAX_MB", "50"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def prompt_key(model_name: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed (model, prompt) -> result cache with in-flight dedup."""
+
+    def __init__(
+        self,
+        path: str = LLM_CACHE_FILE,
+        ttl: float = LLM_CACHE_TTL_S,
+        max_bytes: int = int(LLM_CACHE_MAX_MB * 1024 * 1024),
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._inflight: Dict[str, Future] = {}
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {
+                "entries": rows,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_inflight": self.shared,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+    def get(self, model_name: str, prompt: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cached = self._get(prompt_key(model_name, prompt))
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return cached
+
+    def put(self, model_name: str, prompt: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._put(prompt_key(model_name, prompt), model_name, result)
+
+    def get_or_compute(
+        self,
+        model_name: str,
+        prompt: str,
+        compute: Callable[[], Tuple[Dict[str, Any], bool]],
+    ) -> Dict[str, Any]:
+        """Cached result, or `compute()` -> (result, cacheable) run once per key.
+
+        Callers asking for a key that is already being computed wait for
+        that call instead of starting their own.
+        """
+        key = prompt_key(model_name, prompt)
+        with self._lock:
+            cached = self._get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                self.misses += 1
+                fut = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return fut.result()
+        try:
+            result, cacheable = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(e)
+            raise
+        with self._lock:
+            if cacheable:
+                self._put(key, model_name, result)
+            self._inflight.pop(key, None)
+        fut.set_result(result)
+        return result
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT created, size, value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        created, size, value = row
+        now = time.time()
+        if now - created > self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._bytes -= size
+            self.expired += 1
+            return None
+        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def _put(self, key: str, model_name: str, result: Dict[str, Any]) -> None:
+        value = json.dumps(result, ensure_ascii=False)
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, created, last_used, size, value) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model_name, now, now, size, value),
+        )
+        self._bytes += size - (old[0] if old else 0)
+        if self._bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        # expired rows first, then least recently used until under budget
+        cutoff = time.time() - self.ttl
+        freed, n = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses WHERE created < ?", (cutoff,)
+        ).fetchone()
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+        self._bytes -= freed
+        self.expired += n
+        while self._bytes > self.max_bytes:
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bytes -= size
+                self.evicted += 1
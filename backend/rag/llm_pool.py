@@ -0,0 +1,283 @@
+"""Background LLM enrichment for change events.
+
+`run_llm` is a blocking network round-trip, so calling it from the watcher
+held up every later file event. `LLMWorkerPool` runs it on its own threads:
+
+- a bounded queue with at most one pending job per doc; a newer change
+  replaces the queued one, and when full the oldest job is dropped,
+- `concurrency` workers, a per-attempt timeout, and retries with
+  exponential backoff and jitter,
+- cancellation: a newer change to the same doc supersedes the running job.
+  A call already in flight cannot be interrupted, but its result is
+  discarded and it is not retried,
+- batching: with a batch runner, a worker takes up to `batch_size` queued
+  jobs at once and answers them with one call.
+
+The backend is any callable `event -> result dict` that raises on failure;
+a batch runner maps a list of events to a list of results.
+`default_runner()` / `default_batch_runner()` pick Gemini, or the offline
+`FakeLLM` when LLM_BACKEND=fake.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "2"))
+LLM_QUEUE_SIZE = int(os.environ.get("LLM_QUEUE_SIZE", "100"))
+LLM_TIMEOUT_S = float(os.environ.get("LLM_TIMEOUT_S", "60"))
+LLM_RETRIES = int(os.environ.get("LLM_RETRIES", "2"))
+LLM_BACKOFF_S = float(os.environ.get("LLM_BACKOFF_S", "1.0"))
+LLM_BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "8"))
+
+Runner = Callable[[Dict[str, Any]], Dict[str, Any]]
+BatchRunner = Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]
+Callback = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+
+def default_runner() -> Runner:
+    """The configured LLM backend (imported on first use)."""
+    if os.environ.get("LLM_BACKEND", "gemini").lower() == "fake":
+        from .fake_llm import FakeLLM
+
+        return FakeLLM()
+    from .llm_runner import run_llm
+
+    return lambda event: run_llm(event, raise_errors=True)
+
+
+def default_batch_runner() -> BatchRunner:
+    """Batch counterpart of `default_runner()`."""
+    if os.environ.get("LLM_BACKEND", "gemini").lower() == "fake":
+        from .fake_llm import FakeLLM
+
+        return FakeLLM().batch
+    from .llm_runner import run_llm_batch
+
+    return lambda events: run_llm_batch(events, raise_errors=True)
+
+
+class _Job:
+    __slots__ = ("doc", "event", "callback", "cancelled")
+
+    def __init__(self, event: Dict[str, Any], callback: Optional[Callback]):
+        self.doc = event.get("changed_doc", "")
+        self.event = event
+        self.callback = callback
+        self.cancelled = threading.Event()
+
+
+class LLMWorkerPool:
+    """Bounded, cancellable thread pool around an LLM runner."""
+
+    def __init__(
+        self,
+        run: Optional[Runner] = None,
+        on_result: Optional[Callback] = None,
+        run_batch: Optional[BatchRunner] = None,
+        batch_size: int = LLM_BATCH_SIZE,
+        concurrency: int = LLM_CONCURRENCY,
+        max_queue: int = LLM_QUEUE_SIZE,
+        timeout: float = LLM_TIMEOUT_S,
+        retries: int = LLM_RETRIES,
+        backoff: float = LLM_BACKOFF_S,
+    ):
+        self._run = run
+        self._run_batch = run_batch
+        self._resolve_lock = threading.Lock()
+        self.on_result = on_result
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(1, max_queue)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, _Job]" = OrderedDict()
+        self._running: Dict[str, _Job] = {}
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+        # counters
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.superseded = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.batches = 0
+
+    @property
+    def run(self) -> Runner:
+        with self._resolve_lock:
+            if self._run is None:
+                self._run = default_runner()
+                # only batch the default backend unless told otherwise
+                if self._run_batch is None and self.batch_size > 1:
+                    self._run_batch = default_batch_runner()
+        return self._run
+
+    def start(self) -> "LLMWorkerPool":
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._worker, name=f"llm-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Drop queued jobs, cancel running ones and wait for the workers."""
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            for job in self._running.values():
+                job.cancelled.set()
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def submit(self, event: Dict[str, Any], callback: Optional[Callback] = None) -> None:
+        """Queue `event`; supersedes any queued or running job for the same doc."""
+        job = _Job(event, callback)
+        with self._cond:
+            self.submitted += 1
+            if job.doc in self._pending:
+                # keep the queue position, replace the payload
+                self.superseded += 1
+            elif len(self._pending) >= self.max_queue:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[job.doc] = job
+            running = self._running.get(job.doc)
+            if running is not None and not running.cancelled.is_set():
+                running.cancelled.set()
+                self.superseded += 1
+            # all: a worker backing off before a retry waits on the same condition
+            self._cond.notify_all()
+
+    def cancel(self, doc: str) -> None:
+        """Drop the queued job for `doc` and cancel a running one."""
+        with self._cond:
+            cancelled = self._pending.pop(doc, None) is not None
+            running = self._running.get(doc)
+            if running is not None and not running.cancelled.is_set():
+                running.cancelled.set()
+                cancelled = True
+            if cancelled:
+                self.superseded += 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "running": len(self._running),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "superseded": self.superseded,
+                "dropped": self.dropped,
+                "timeouts": self.timeouts,
+                "retried": self.retried,
+                "batches": self.batches,
+            }
+
+    def _worker(self) -> None:
+        try:
+            # resolve the backend up front so the first burst can be batched;
+            # a failure here surfaces per job in _call
+            self.run
+        except Exception:
+            pass
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                limit = self.batch_size if self._run_batch is not None else 1
+                jobs = [self._pending.popitem(last=False)[1] for _ in range(min(limit, len(self._pending)))]
+                for job in jobs:
+                    self._running[job.doc] = job
+            try:
+                self._process(jobs)
+            finally:
+                with self._cond:
+                    for job in jobs:
+                        if self._running.get(job.doc) is job:
+                            del self._running[job.doc]
+
+    def _process(self, jobs: List[_Job]) -> None:
+        results: List[Dict[str, Any]] = []
+        for attempt in range(self.retries + 1):
+            jobs = [job for job in jobs if not job.cancelled.is_set()]
+            if not jobs:
+                return
+            try:
+                results = self._call([job.event for job in jobs])
+                break
+            except Exception as e:
+                if isinstance(e, FutureTimeout):
+                    with self._cond:
+                        self.timeouts += 1
+                if attempt == self.retries:
+                    with self._cond:
+                        self.failed += len(jobs)
+                    reason = f"timed out after {self.timeout}s" if isinstance(e, FutureTimeout) else str(e) or type(e).__name__
+                    results = [
+                        {
+                            "summary": f"LLM call failed after {attempt + 1} attempt(s): {reason}",
+                            "severity": "medium",
+                            "impacted_docs": [],
+                        }
+                        for _ in jobs
+                    ]
+                    break
+                with self._cond:
+                    self.retried += 1
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+                if not self._backoff(jobs, delay):
+                    return
+        for job, result in zip(jobs, results):
+            if job.cancelled.is_set():
+                continue
+            with self._cond:
+                self.completed += 1
+            callback = job.callback or self.on_result
+            if callback:
+                callback(job.event, result)
+
+    def _backoff(self, jobs: List[_Job], delay: float) -> bool:
+        """Wait `delay` seconds before a retry; False if the pool stopped or every job was cancelled meanwhile."""
+        deadline = time.monotonic() + delay
+        with self._cond:
+            while not self._stopped and not all(job.cancelled.is_set() for job in jobs):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                # submit, cancel and stop notify all waiters
+                self._cond.wait(remaining)
+        return False
+
+    def _call(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # run on a helper thread so a hung call can be timed out; the thread
+        # is abandoned (daemon) and its late result ignored
+        fut: Future = Future()
+        run = self.run
+        run_batch = self._run_batch if len(events) > 1 else None
+        if run_batch is not None:
+            with self._cond:
+                self.batches += 1
+
+        def target():
+            try:
+                fut.set_result(run_batch(events) if run_batch is not None else [run(events[0])])
+            except BaseException as e:
+                fut.set_exception(e)
+
+        threading.Thread(target=target, name="llm-call", daemon=True).start()
+        return fut.result(timeout=self.timeout)
@@ -1,24 +1,77 @@
 import os
 import json
 import re
-from typing import Dict, Any, List
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 
-import google.generativeai as genai
-from dotenv import load_dotenv
+from .llm_cache import LLMCache
+from .prompts import batch_section, build_batch_prompt, pack_sections, prompt_for_event
 
-from .prompts import build_prompt
+MODEL_NAME = "models/gemini-2.5-flash"
+LLM_CACHE = os.environ.get("LLM_CACHE", "1").lower() not in ("0", "false", "no")
+LLM_BATCH_TOKENS = int(os.environ.get("LLM_BATCH_TOKENS", "6000"))
 
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+# google.generativeai, imported and configured by the first call (see `get_client`)
+_genai = None
+_genai_lock = threading.Lock()
 
-# Load Gemini API key
-load_dotenv()
-api_key = os.environ.get("GOOGLE_API_KEY")
 
-if not api_key:
-    raise RuntimeError("GOOGLE_API_KEY not found in .env")
+def get_client():
+    """The configured `google.generativeai` module, imported on first use.
 
-genai.configure(api_key=api_key)
+    Importing this module stays cheap and works without an API key; a
+    missing key or SDK is reported by the first Gemini call instead.
+    """
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+            from dotenv import load_dotenv
+
+            # Load Gemini API key
+            load_dotenv()
+            api_key = os.environ.get("GOOGLE_API_KEY")
+            if not api_key:
+                raise RuntimeError("GOOGLE_API_KEY not found in .env")
+            genai.configure(api_key=api_key)
+            _genai = genai
+        return _genai
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Shared response cache (None when LLM_CACHE=0)."""
+    global _cache
+    if not LLM_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def current_llm_cache() -> Optional[LLMCache]:
+    """The shared cache if it has been opened, without opening it."""
+    return _cache
+
+
+def _parse_json(text: str) -> Optional[dict]:
+    """JSON object in Gemini output (bare or wrapped in other text), or None."""
+    try:
+        # Direct JSON? Try loading directly.
+        return json.loads(text)
+    except:
+        pass
 
-MODEL_NAME = "models/gemini-2.5-flash"
+    # Look for first {...} block
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except:
+            pass
+    return None
 
 
 def extract_json(text: str) -> dict:
@@ -32,20 +85,10 @@ def extract_json(text: str) -> dict:
             "severity": "low",
             "impacted_docs": []
         }
-    
-    try:
-        # Direct JSON? Try loading directly.
-        return json.loads(text)
-    except:
-        pass
 
-    # Look for first {...} block
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except:
-            pass
+    parsed = _parse_json(text)
+    if parsed is not None:
+        return parsed
 
     # If extraction fails, return fallback
     return {
@@ -55,58 +98,148 @@ def extract_json(text: str) -> dict:
     }
 
 
-def run_llm(changed_event: Dict[str, Any]) -> Dict[str, Any]:
+def run_llm(changed_event: Dict[str, Any], raise_errors: bool = False) -> Dict[str, Any]:
     """
     Runs Gemini on changed_event and returns structured JSON safely.
+    With raise_errors=True, API/network errors propagate so callers can retry.
     """
 
-    changed_summary: str = changed_event.get("summary", "")
-    old_snippets: List[str] = changed_event.get("old_snippets", [])
-    new_snippets: List[str] = changed_event.get("new_snippets", [])
-    impacted_docs: Dict[str, List[str]] = changed_event.get("impacted_docs", {})
-
-    prompt = build_prompt(
-        changed_summary=changed_summary,
-        old_snippets=old_snippets,
-        new_snippets=new_snippets,
-        impacted_docs=impacted_docs,
-    )
-
-    model = genai.GenerativeModel(MODEL_NAME)
+    prompt = prompt_for_event(changed_event)
 
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0,
-                "max_output_tokens": 2048,
-            },
-        )
-
-        # Check if response has valid content (check candidates)
-        if not response.candidates or len(response.candidates) == 0:
-            return {
-                "summary": "Gemini blocked response (no valid candidates)",
-                "severity": "low",
-                "impacted_docs": []
-            }
-
-        # Check finish reason of first candidate
-        candidate = response.candidates[0]
-        if hasattr(candidate, "finish_reason") and candidate.finish_reason and candidate.finish_reason.name != "STOP":
-            return {
-                "summary": f"Gemini blocked response (reason: {candidate.finish_reason.name})",
-                "severity": "low",
-                "impacted_docs": []
-            }
-
-        raw_text = response.text.strip()
-
-        return extract_json(raw_text)
+        cache = get_llm_cache()
+        if cache is None:
+            return _generate(prompt)[0]
+        return cache.get_or_compute(MODEL_NAME, prompt, lambda: _generate(prompt))
 
     except Exception as e:
+        if raise_errors:
+            raise
         return {
             "summary": f"Gemini call failed: {str(e)}",
             "severity": "medium",
             "impacted_docs": []
         }
+
+
+def run_llm_batch(
+    changed_events: List[Dict[str, Any]],
+    token_budget: int = LLM_BATCH_TOKENS,
+    raise_errors: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Runs Gemini on several changed_events with as few calls as the token
+    budget allows and returns their results in input order.
+    Events already cached are answered from the cache; the rest are packed
+    into batch prompts that ask for a JSON array keyed by change id. Events
+    a batch answer does not cover (unparsable or blocked output, missing
+    ids) fall back to one run_llm call each.
+    """
+    cache = get_llm_cache()
+    prompts = [prompt_for_event(e) for e in changed_events]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(changed_events)
+    sections: Dict[str, str] = {}
+    for i, (event, prompt) in enumerate(zip(changed_events, prompts)):
+        cached = cache.get(MODEL_NAME, prompt) if cache is not None else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            sections[str(i)] = batch_section(str(i), event)
+
+    for group in pack_sections(sections, token_budget):
+        answered = _run_batch(group, sections, raise_errors) if len(group) > 1 else {}
+        for event_id in group:
+            i = int(event_id)
+            result = answered.get(event_id)
+            if result is None:
+                result = run_llm(changed_events[i], raise_errors=raise_errors)
+            elif cache is not None:
+                # later single calls for the same change hit the cache
+                cache.put(MODEL_NAME, prompts[i], result)
+            results[i] = result
+    return results
+
+
+def _run_batch(ids: List[str], sections: Dict[str, str], raise_errors: bool) -> Dict[str, Dict[str, Any]]:
+    """One batch call; returns the per-id results it could parse."""
+    prompt = build_batch_prompt({event_id: sections[event_id] for event_id in ids})
+    try:
+        raw_text, blocked = _call_model(prompt, max_output_tokens=min(8192, 512 * (len(ids) + 1)))
+    except Exception:
+        if raise_errors:
+            raise
+        return {}
+    if blocked:
+        return {}
+    return _split_batch(raw_text, ids)
+
+
+def _split_batch(text: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Per-id results from a batch answer (a JSON array of objects with "id")."""
+    parsed = None
+    try:
+        parsed = json.loads(text)
+    except:
+        match = re.search(r"\[.*\]", text, re.DOTALL)
+        if match:
+            try:
+                parsed = json.loads(match.group(0))
+            except:
+                pass
+    if isinstance(parsed, dict):
+        parsed = parsed.get("results")
+    if not isinstance(parsed, list):
+        return {}
+
+    wanted = set(ids)
+    out: Dict[str, Dict[str, Any]] = {}
+    for item in parsed:
+        if not isinstance(item, dict) or str(item.get("id")) not in wanted or "summary" not in item:
+            continue
+        out[str(item["id"])] = {
+            "summary": item["summary"],
+            "severity": item.get("severity", "low"),
+            "impacted_docs": item.get("impacted_docs", []),
+        }
+    return out
+
+
+def _call_model(prompt: str, max_output_tokens: int = 2048) -> Tuple[Optional[str], Optional[str]]:
+    """
+    One Gemini call. Returns (text, None), or (None, summary) when the
+    response was blocked.
+    """
+    model = get_client().GenerativeModel(MODEL_NAME)
+    response = model.generate_content(
+        prompt,
+        generation_config={
+            "temperature": 0,
+            "max_output_tokens": max_output_tokens,
+        },
+    )
+
+    # Check if response has valid content (check candidates)
+    if not response.candidates or len(response.candidates) == 0:
+        return None, "Gemini blocked response (no valid candidates)"
+
+    # Check finish reason of first candidate
+    candidate = response.candidates[0]
+    if hasattr(candidate, "finish_reason") and candidate.finish_reason and candidate.finish_reason.name != "STOP":
+        return None, f"Gemini blocked response (reason: {candidate.finish_reason.name})"
+
+    return response.text.strip(), None
+
+
+def _generate(prompt: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    One Gemini call. Returns (result, cacheable); blocked or unparsable
+    responses are returned but not cached, so the next attempt retries.
+    """
+    raw_text, blocked = _call_model(prompt)
+    if blocked:
+        return {
+            "summary": blocked,
+            "severity": "low",
+            "impacted_docs": []
+        }, False
+    return extract_json(raw_text), bool(raw_text) and _parse_json(raw_text) is not None
@@ -0,0 +1,151 @@
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+MAX_BATCH_SIZE = int(os.environ.get("EMBED_MAX_BATCH", "64"))
+MAX_WAIT_MS = float(os.environ.get("EMBED_MAX_WAIT_MS", "5"))
+
+
+def sentence_transformers_available() -> bool:
+    """Whether sentence-transformers is installed, without importing it (or torch)."""
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+
+def _sentence_transformer(model_name: str):
+    # imported here: sentence-transformers pulls in torch, which takes seconds
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
+
+class EmbeddingService:
+    """Process-wide embedding model with a batched encode queue.
+
+    The model weights are loaded once, lazily (or ahead of time via
+    `warm_up`). `encode` can be called from any thread: requests that
+    arrive within `max_wait` seconds of each other are merged into a single
+    forward pass of up to `max_batch_size` texts, and each caller gets back
+    only its own rows.
+
+    `loader` builds the model object (anything with
+    ``encode(texts, convert_to_numpy=True)``); it defaults to
+    `SentenceTransformer`, imported only when the model is first loaded,
+    and offline benchmarks pass a stub.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_wait: float = MAX_WAIT_MS / 1000.0,
+        loader: Optional[Callable[[str], object]] = None,
+    ):
+        if loader is None:
+            if not sentence_transformers_available():
+                raise RuntimeError("sentence-transformers is not installed")
+            loader = _sentence_transformer
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._loader = loader
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending: List[Tuple[List[str], Future]] = []
+        self._worker: Optional[threading.Thread] = None
+        # counters for observability
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._loader(self.model_name)
+            return self._model
+
+    def warm_up(self, background: bool = True) -> None:
+        """Load the weights now instead of on the first `encode`."""
+        if background:
+            threading.Thread(target=lambda: self.model, daemon=True).start()
+        else:
+            self.model
+
+    def encode(self, texts: List[str]):
+        """Encode `texts` (not normalized), batched with concurrent callers."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        fut: Future = Future()
+        with self._cond:
+            self._pending.append((list(texts), fut))
+            self.requests += 1
+            self._ensure_worker()
+            self._cond.notify()
+        return fut.result()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _next_batch(self) -> List[Tuple[List[str], Future]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            # wait up to max_wait for more callers, unless the batch is full
+            deadline = time.monotonic() + self.max_wait
+            while sum(len(t) for t, _ in self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, size = [], 0
+            while self._pending:
+                texts, fut = self._pending[0]
+                # always take at least one request, even an oversized one
+                if batch and size + len(texts) > self.max_batch_size:
+                    break
+                batch.append(self._pending.pop(0))
+                size += len(texts)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            flat = [t for texts, _ in batch for t in texts]
+            try:
+                vecs = self.model.encode(flat, convert_to_numpy=True, batch_size=self.max_batch_size)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(flat)
+            start = 0
+            for texts, fut in batch:
+                fut.set_result(vecs[start : start + len(texts)])
+                start += len(texts)
+
+
+_services: Dict[str, EmbeddingService] = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_MODEL) -> EmbeddingService:
+    """Shared `EmbeddingService` for `model_name`, created on first use."""
+    with _services_lock:
+        service = _services.get(model_name)
+        if service is None:
+            service = EmbeddingService(model_name)
+            _services[model_name] = service
+        return service
@@ -1,4 +1,13 @@
-from typing import List, Dict
+from typing import List, Dict, Any
+
+
+def _preview(snippets: List[str]) -> str:
+    return "\n".join(f"- {s[:200]}" for s in snippets[:3]) if snippets else "(none)"
+
+
+def _docs_list(impacted_docs: Dict[str, List[str]]) -> str:
+    return "\n".join(f"- {doc}: {len(snippets)} snippet(s)" for doc, snippets in impacted_docs.items()) if impacted_docs else "(none)"
+
 
 def build_prompt(
     changed_summary: str,
@@ -11,10 +20,10 @@ def build_prompt(
     This prompt must force strict JSON output.
     """
     # Format snippets and docs more safely
-    old_text = "\n".join(f"- {s[:200]}" for s in old_snippets[:3]) if old_snippets else "(none)"
-    new_text = "\n".join(f"- {s[:200]}" for s in new_snippets[:3]) if new_snippets else "(none)"
-    docs_text = "\n".join(f"- {doc}: {len(snippets)} snippet(s)" for doc, snippets in impacted_docs.items()) if impacted_docs else "(none)"
-    
+    old_text = _preview(old_snippets)
+    new_text = _preview(new_snippets)
+    docs_text = _docs_list(impacted_docs)
+
     prompt = f"""You are a documentation analyst. A policy has changed.
 
 Changed policy summary: {changed_summary}
@@ -36,3 +45,84 @@ Task: Return JSON with this schema (only JSON, no extra text):
 }}
 """
     return prompt
+
+
+def prompt_for_event(changed_event: Dict[str, Any]) -> str:
+    """`build_prompt` for a changed_event."""
+    return build_prompt(
+        changed_summary=changed_event.get("summary", ""),
+        old_snippets=changed_event.get("old_snippets", []),
+        new_snippets=changed_event.get("new_snippets", []),
+        impacted_docs=changed_event.get("impacted_docs", {}),
+    )
+
+
+BATCH_HEADER = """You are a documentation analyst. Several policies have changed.
+Each change below is marked with an id.
+"""
+
+BATCH_FOOTER = """
+Task: Return a JSON array with exactly one object per change id, using this schema
+(only JSON, no extra text):
+[
+  {
+    "id": "change id",
+    "summary": "brief summary of the change impact",
+    "severity": "low",
+    "impacted_docs": ["list", "of", "doc", "names"]
+  }
+]
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def batch_section(event_id: str, changed_event: Dict[str, Any]) -> str:
+    """One change in a batch prompt, formatted like `build_prompt`'s body."""
+    return f"""
+### Change {event_id} (doc: {changed_event.get("changed_doc", "")})
+
+Changed policy summary: {changed_event.get("summary", "")}
+
+Old text (preview):
+{_preview(changed_event.get("old_snippets", []))}
+
+New text (preview):
+{_preview(changed_event.get("new_snippets", []))}
+
+Documents that may be affected:
+{_docs_list(changed_event.get("impacted_docs", {}))}
+"""
+
+
+def build_batch_prompt(sections: Dict[str, str]) -> str:
+    """
+    One prompt for several changes (`id -> batch_section`), answered with a
+    JSON array keyed by id. The instructions are sent once per batch.
+    """
+    return BATCH_HEADER + "".join(sections.values()) + BATCH_FOOTER
+
+
+def pack_sections(sections: Dict[str, str], token_budget: int) -> List[List[str]]:
+    """
+    Greedily group section ids, in order, so that each batch prompt stays
+    within `token_budget` estimated tokens. A section too large for any
+    batch gets a group of its own.
+    """
+    overhead = estimate_tokens(BATCH_HEADER + BATCH_FOOTER)
+    groups: List[List[str]] = []
+    current: List[str] = []
+    used = overhead
+    for event_id, section in sections.items():
+        cost = estimate_tokens(section)
+        if current and used + cost > token_budget:
+            groups.append(current)
+            current, used = [], overhead
+        current.append(event_id)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
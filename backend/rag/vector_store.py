@@ -0,0 +1,206 @@
+import json
+import os
+import uuid
+from typing import Dict, Iterator, List, Optional, Sequence
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+STORE_FILE = "store.json"
+DTYPES = ("float16", "int8")
+# rows scored per block, so a query never materializes the whole matrix as float32
+SCORE_BLOCK_ROWS = 65536
+
+
+def quantize(vectors, dtype: str):
+    """Return (codes, scales) for `vectors`; scales is None for float16."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "int8" and vectors.size == 0:
+        return vectors.astype(np.int8), np.zeros(len(vectors), dtype=np.float32)
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"unsupported vector dtype: {dtype!r} (expected one of {DTYPES})")
+
+
+class StoreMeta(Sequence):
+    """Read-only `meta` list view: item i is {"doc", "text"} read from the blob."""
+
+    def __init__(self, store: "MmapVectorStore"):
+        self._store = store
+
+    def __len__(self) -> int:
+        return self._store.rows
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return {"doc": self._store.doc(i), "text": self._store.text(i)}
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class MmapVectorStore:
+    """Quantized, memory-mapped paragraph vectors plus a text blob.
+
+    Layout of a store directory (one generation of files per `write`):
+    - ``vectors.<gen>.bin``: rows x dim float16, or int8 codes
+    - ``scales.<gen>.bin``: per-row float32 scale (int8 only)
+    - ``offsets.<gen>.bin``: rows + 1 uint64 byte offsets into the blob
+    - ``docs.<gen>.bin``: per-row int32 doc code
+    - ``texts.<gen>.blob``: UTF-8 paragraph texts back to back
+    - ``store.json``: header (dtype, dim, rows, doc names, generation)
+
+    The header is swapped in last with an atomic rename, so readers see
+    either the old or the new generation; the previous generation's files
+    are only removed by the write after. Files are opened read-only with
+    `np.memmap`, so several processes share one copy through the page cache.
+    """
+
+    def __init__(self, path: str, header: Dict):
+        self.path = path
+        self.header = header
+        self.dtype = header["dtype"]
+        self.dim = header["dim"]
+        self.rows = header["rows"]
+        self.doc_names: List[str] = header["doc_names"]
+        self.fingerprint: str = header.get("fingerprint", "")
+        gen = self.generation = header["generation"]
+        self.codes = self._map(f"vectors.{gen}.bin", self.dtype, (self.rows, self.dim))
+        self.scales = self._map(f"scales.{gen}.bin", "float32", (self.rows,)) if self.dtype == "int8" else None
+        self.offsets = self._map(f"offsets.{gen}.bin", "uint64", (self.rows + 1,))
+        self.doc_ids = self._map(f"docs.{gen}.bin", "int32", (self.rows,))
+        self.blob = self._map(f"texts.{gen}.blob", "uint8", (int(self.offsets[-1]) if self.rows else 0,))
+
+    def _map(self, name: str, dtype: str, shape):
+        if not shape or 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape)
+
+    @classmethod
+    def open(cls, path: str) -> Optional["MmapVectorStore"]:
+        # a writer removes the generation before last; a header read just before
+        # two back-to-back writes can name files that are gone, so read it again
+        for _ in range(2):
+            try:
+                return cls(path, cls._read_header(path))
+            except FileNotFoundError:
+                continue
+            except Exception:
+                return None
+        return None
+
+    @staticmethod
+    def _read_header(path: str) -> Dict:
+        with open(os.path.join(path, STORE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        vectors,
+        texts: List[str],
+        docs: List[str],
+        dtype: str = "int8",
+        fingerprint: str = "",
+    ) -> "MmapVectorStore":
+        """Quantize and write a new generation, then atomically publish it."""
+        os.makedirs(path, exist_ok=True)
+        try:
+            previous = cls._read_header(path)["generation"]
+        except Exception:
+            previous = None
+        gen = uuid.uuid4().hex[:12]
+        doc_names = sorted(set(docs))
+        codes_by_name = {fn: i for i, fn in enumerate(doc_names)}
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not texts:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        codes, scales = quantize(vectors, dtype)
+
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.uint64)
+
+        codes.tofile(os.path.join(path, f"vectors.{gen}.bin"))
+        if scales is not None:
+            scales.tofile(os.path.join(path, f"scales.{gen}.bin"))
+        offsets.tofile(os.path.join(path, f"offsets.{gen}.bin"))
+        np.array([codes_by_name[d] for d in docs], dtype=np.int32).tofile(os.path.join(path, f"docs.{gen}.bin"))
+        with open(os.path.join(path, f"texts.{gen}.blob"), "wb") as f:
+            for b in encoded:
+                f.write(b)
+
+        header = {
+            "dtype": dtype,
+            "dim": int(vectors.shape[1]) if len(texts) else 0,
+            "rows": len(texts),
+            "doc_names": doc_names,
+            "generation": gen,
+            "fingerprint": fingerprint,
+        }
+        tmp = os.path.join(path, STORE_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp, os.path.join(path, STORE_FILE))
+        cls._remove_old_generations(path, {gen, previous})
+        return cls(path, header)
+
+    @staticmethod
+    def _remove_old_generations(path: str, keep) -> None:
+        # the previous generation stays until the next write, for a process that
+        # read the old header but has not mapped its files yet; unlinking is safe
+        # for processes that already have them mapped
+        for name in os.listdir(path):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[1] not in keep and parts[2] in ("bin", "blob"):
+                try:
+                    os.remove(os.path.join(path, name))
+                except OSError:
+                    pass
+
+    @property
+    def nbytes(self) -> int:
+        total = self.codes.nbytes + self.offsets.nbytes + self.doc_ids.nbytes + self.blob.nbytes
+        return total + (self.scales.nbytes if self.scales is not None else 0)
+
+    def text(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+    def doc(self, i: int) -> str:
+        return self.doc_names[int(self.doc_ids[i])]
+
+    def meta(self) -> StoreMeta:
+        return StoreMeta(self)
+
+    def vectors(self, rows):
+        """Dequantized float32 vectors for `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.asarray(self.codes[rows], dtype=np.float32)
+        if self.scales is not None:
+            out *= self.scales[rows][:, None]
+        return out
+
+    def scores(self, q):
+        """Cosine scores of normalized queries `q` (m x dim) against every row."""
+        q = np.asarray(q, dtype=np.float32)
+        out = np.empty((q.shape[0], self.rows), dtype=np.float32)
+        for start in range(0, self.rows, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, self.rows)
+            block = np.asarray(self.codes[start:end], dtype=np.float32)
+            sims = q @ block.T
+            if self.scales is not None:
+                sims *= self.scales[start:end]
+            out[:, start:end] = sims
+        return out
@@ -0,0 +1,328 @@
+"""Multi-pattern reference matching for the dependency graph.
+
+`build_dependencies` used to run one regex (or substring test) per
+(doc, candidate filename) pair, so scanning a single doc cost O(corpus).
+
+- `ReferenceMatcher` compiles every current filename and base name into an
+  Aho-Corasick automaton and finds all referenced docs in one pass over
+  the text, so the cost per doc grows with the document length instead.
+- `KeywordIndex` is an inverted index filename keyword -> docs containing
+  it; implicit keyword matches are counted from posting lists instead of
+  testing every text against every filename.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import Counter, deque
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Set, Tuple
+
+# same definition of a word character as the `\b` in the old per-pair regex
+_is_word = re.compile(r"\w").match
+
+
+class AhoCorasick:
+    """Minimal Aho-Corasick automaton over a mutable set of literal patterns.
+
+    Patterns map to one or more keys (doc names). Adding or removing a
+    pattern only marks the automaton dirty; it is recompiled lazily on the
+    next scan, which costs O(total pattern length).
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, Set[str]] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, pattern: str, key: str) -> None:
+        self._keys.setdefault(pattern, set()).add(key)
+        self._dirty = True
+
+    def remove(self, pattern: str, key: str) -> None:
+        keys = self._keys.get(pattern)
+        if not keys or key not in keys:
+            return
+        keys.discard(key)
+        if not keys:
+            del self._keys[pattern]
+        self._dirty = True
+
+    def keys_for(self, pattern: str) -> Set[str]:
+        return self._keys.get(pattern, set())
+
+    def compile(self) -> None:
+        """Recompile now if patterns changed, instead of on the next scan."""
+        if self._dirty:
+            self._build()
+
+    def _build(self) -> None:
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[str]] = [[]]
+        for pattern in self._keys:
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append(pattern)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch) != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto, self._fail, self._out = goto, fail, out
+        self._dirty = False
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (end_index, pattern) for every occurrence, overlaps included."""
+        self.compile()
+        goto, fail, out = self._goto, self._fail, self._out
+        # the empty pattern (if any) sits on the root and matches everywhere
+        if out[0]:
+            for pattern in out[0]:
+                yield 0, pattern
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if node and out[node]:
+                for pattern in out[node]:
+                    yield i + 1, pattern
+
+
+def _word_at(text: str, i: int) -> bool:
+    return 0 <= i < len(text) and _is_word(text, i) is not None
+
+
+def _on_word_boundary(text: str, start: int, end: int) -> bool:
+    # equivalent of r"\b" + re.escape(pattern) + r"\b" for the span [start, end)
+    return (_word_at(text, start - 1) != _word_at(text, start)) and (
+        _word_at(text, end - 1) != _word_at(text, end)
+    )
+
+
+class ReferenceMatcher:
+    """Finds the docs a text references, by filename or by base name.
+
+    - `explicit`: the filename (e.g. ``RefundPolicy.md``) appears in the
+      original text on word boundaries.
+    - `base`: the filename without extension (e.g. ``refund_policy_v2``)
+      appears anywhere in the lowercased text.
+
+    Call `add` / `remove` as files appear and disappear; the automata are
+    recompiled on the next scan.
+    """
+
+    def __init__(self, files: Iterable[str] = ()):
+        self._names = AhoCorasick()
+        self._bases = AhoCorasick()
+        self._files: Set[str] = set()
+        for fn in files:
+            self.add(fn)
+
+    def __contains__(self, fn: str) -> bool:
+        return fn in self._files
+
+    def add(self, fn: str) -> None:
+        if fn in self._files:
+            return
+        self._files.add(fn)
+        self._names.add(fn, fn)
+        self._bases.add(os.path.splitext(fn)[0], fn)
+
+    def remove(self, fn: str) -> None:
+        if fn not in self._files:
+            return
+        self._files.discard(fn)
+        self._names.remove(fn, fn)
+        self._bases.remove(os.path.splitext(fn)[0], fn)
+
+    def compile(self) -> None:
+        self._names.compile()
+        self._bases.compile()
+
+    def explicit(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        for end, pattern in self._names.iter_matches(text):
+            if pattern in found:
+                continue
+            if _on_word_boundary(text, end - len(pattern), end):
+                found.add(pattern)
+        return {fn for pattern in found for fn in self._names.keys_for(pattern)}
+
+    def base(self, lowered: str) -> Set[str]:
+        found = {pattern for _, pattern in self._bases.iter_matches(lowered)}
+        return {fn for pattern in found for fn in self._bases.keys_for(pattern)}
+
+    def scan(self, text: str, lowered: str = None) -> Tuple[Set[str], Set[str]]:
+        """Return (explicit, base) sets of referenced docs for one document."""
+        if lowered is None:
+            lowered = text.lower()
+        return self.explicit(text), self.base(lowered)
+
+
+_TOKEN_RE = re.compile(r"\w+")
+# too common to say anything about which paragraph a change touches
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have in is it its may must not of on or our "
+    "that the their this to was we will with you your".split()
+)
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Lowercased ``\\w+`` tokens of `text`."""
+    return frozenset(_TOKEN_RE.findall(text.lower()))
+
+
+def informative_tokens(tokens: Iterable[str]) -> Set[str]:
+    """`tokens` without stopwords and single characters (digits are kept)."""
+    return {t for t in tokens if t not in STOPWORDS and (len(t) > 1 or t.isdigit())}
+
+
+def name_keywords(fn: str) -> Set[str]:
+    """Lightweight keyword set from a filename (without extension)."""
+    return set(re.findall(r"\w+", os.path.splitext(fn)[0].lower()))
+
+
+class KeywordIndex:
+    """Inverted index: filename keyword -> docs whose text contains it.
+
+    By default a keyword "occurs" in a doc when it is a substring of the
+    lowercased text (the original `k in lowered` test, so ``refund`` also
+    hits ``refunds``). With ``strict=True`` it must be a whole ``\\w+`` token.
+
+    `lowered_texts` is the caller's live mapping doc -> lowercased text; it
+    is only read when a filename introduces a keyword not seen before.
+    """
+
+    def __init__(self, lowered_texts: Dict[str, str], strict: bool = False):
+        self.strict = strict
+        self._texts = lowered_texts
+        self._automaton = AhoCorasick()
+        # filename -> its keywords, and keyword -> filenames using it
+        self._name_keys: Dict[str, Set[str]] = {}
+        self._key_names: Dict[str, Set[str]] = {}
+        # doc -> keywords present in its text, and the posting lists
+        self._doc_keys: Dict[str, Set[str]] = {}
+        self._key_docs: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def restore(
+        cls,
+        lowered_texts: Dict[str, str],
+        names: Iterable[str],
+        doc_keys: Dict[str, Set[str]],
+        key_docs: Dict[str, Set[str]],
+        strict: bool = False,
+    ) -> "KeywordIndex":
+        """Index over `names` from saved postings (see `doc_keywords`), without reading any text.
+
+        `doc_keys` maps every indexed doc to the keywords in its text, and
+        `key_docs` holds the same pairs keyed by keyword (a keyword missing
+        from it occurs in no doc).
+        """
+        index = cls(lowered_texts, strict=strict)
+        for fn in names:
+            keys = name_keywords(fn)
+            index._name_keys[fn] = keys
+            for k in keys:
+                index._key_names.setdefault(k, set()).add(fn)
+        for k in index._key_names:
+            index._automaton.add(k, k)
+            index._key_docs[k] = key_docs.get(k, set())
+        index._doc_keys = doc_keys
+        return index
+
+    def compile(self) -> None:
+        self._automaton.compile()
+
+    def _occurring(self, lowered: str) -> Set[str]:
+        if self.strict:
+            return set(re.findall(r"\w+", lowered)) & self._key_names.keys()
+        return {k for _, k in self._automaton.iter_matches(lowered)}
+
+    def _contains(self, lowered: str, keyword: str) -> bool:
+        if self.strict:
+            return re.search(r"(?<!\w)" + re.escape(keyword) + r"(?!\w)", lowered) is not None
+        return keyword in lowered
+
+    def add_name(self, fn: str) -> None:
+        """Register filename `fn`; new keywords get posting lists built."""
+        if fn in self._name_keys:
+            return
+        keys = name_keywords(fn)
+        self._name_keys[fn] = keys
+        for k in keys:
+            if k in self._key_names:
+                self._key_names[k].add(fn)
+                continue
+            self._key_names[k] = {fn}
+            self._automaton.add(k, k)
+            postings = {doc for doc in self._doc_keys if self._contains(self._texts[doc], k)}
+            self._key_docs[k] = postings
+            for doc in postings:
+                self._doc_keys[doc].add(k)
+
+    def remove_name(self, fn: str) -> None:
+        for k in self._name_keys.pop(fn, ()):
+            names = self._key_names[k]
+            names.discard(fn)
+            if names:
+                continue
+            del self._key_names[k]
+            self._automaton.remove(k, k)
+            for doc in self._key_docs.pop(k, ()):
+                self._doc_keys[doc].discard(k)
+
+    def set_doc(self, doc: str, lowered: str) -> None:
+        """(Re)index the text of `doc`."""
+        self.remove_doc(doc)
+        keys = self._occurring(lowered)
+        self._doc_keys[doc] = keys
+        for k in keys:
+            self._key_docs[k].add(doc)
+
+    def remove_doc(self, doc: str) -> None:
+        for k in self._doc_keys.pop(doc, ()):
+            self._key_docs[k].discard(doc)
+
+    def doc_keywords(self) -> Dict[str, Set[str]]:
+        """doc -> filename keywords occurring in its text (what `restore` takes)."""
+        return self._doc_keys
+
+    def keywords(self, fn: str) -> Set[str]:
+        return self._name_keys.get(fn, set())
+
+    def match_counts(self, doc: str) -> Dict[str, int]:
+        """filename -> number of its keywords occurring in `doc` (only > 0)."""
+        counts: Counter = Counter()
+        for k in self._doc_keys.get(doc, ()):
+            counts.update(self._key_names[k])
+        return counts
+
+    def incoming_counts(self, fn: str) -> Dict[str, int]:
+        """doc -> number of `fn`'s keywords occurring in it (only > 0)."""
+        counts: Counter = Counter()
+        for k in self._name_keys.get(fn, ()):
+            counts.update(self._key_docs.get(k, ()))
+        return counts
@@ -0,0 +1,133 @@
+"""Debouncing, coalescing scheduler between the file observer and the pipeline.
+
+Editors often write a file several times per save, and `git checkout` can
+touch hundreds of files at once. Running the whole pipeline inline on the
+observer thread for every raw event blocks the observer and repeats work.
+`EventScheduler` instead:
+
+- keeps at most one pending entry per path (repeat events are coalesced),
+- waits until the folder has been quiet for `debounce` seconds (but never
+  longer than `max_delay` after the first pending event),
+- hands every pending path to `process_batch` in one call, on its own
+  worker thread, so the observer only ever enqueues.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+DEBOUNCE_MS = float(os.environ.get("DEBOUNCE_MS", "300"))
+MAX_BATCH_DELAY_MS = float(os.environ.get("MAX_BATCH_DELAY_MS", "2000"))
+
+
+class EventScheduler:
+    """Collects raw file events and runs `process_batch({path: kind})`."""
+
+    def __init__(
+        self,
+        process_batch: Callable[[Dict[str, str]], None],
+        debounce: float = DEBOUNCE_MS / 1000.0,
+        max_delay: float = MAX_BATCH_DELAY_MS / 1000.0,
+    ):
+        self.process_batch = process_batch
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self._cond = threading.Condition()
+        self._pending: Dict[str, str] = {}
+        self._first_at: Optional[float] = None
+        self._last_at: Optional[float] = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="event-scheduler", daemon=True)
+        # stats
+        self.events_received = 0
+        self.events_coalesced = 0
+        self.batches_run = 0
+        self.paths_processed = 0
+        self.largest_batch = 0
+        self.last_batch_seconds = 0.0
+        self.busy = False
+
+    def start(self) -> "EventScheduler":
+        self._thread.start()
+        return self
+
+    def stop(self, flush: bool = True) -> None:
+        with self._cond:
+            self._stopped = True
+            if not flush:
+                self._pending.clear()
+            self._cond.notify()
+        self._thread.join()
+
+    def submit(self, path: str, kind: str) -> None:
+        """Record a raw event (`created` / `modified` / `deleted`); never blocks on work."""
+        now = time.monotonic()
+        with self._cond:
+            self.events_received += 1
+            if path in self._pending:
+                self.events_coalesced += 1
+            # the batch handler looks at the file itself, the latest kind is informational
+            self._pending[path] = kind
+            if self._first_at is None:
+                self._first_at = now
+            self._last_at = now
+            self._cond.notify()
+
+    @property
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "busy": self.busy,
+                "events_received": self.events_received,
+                "events_coalesced": self.events_coalesced,
+                "batches_run": self.batches_run,
+                "paths_processed": self.paths_processed,
+                "largest_batch": self.largest_batch,
+                "last_batch_seconds": round(self.last_batch_seconds, 4),
+            }
+
+    def _take_batch(self) -> Optional[Dict[str, str]]:
+        with self._cond:
+            while True:
+                if not self._pending:
+                    if self._stopped:
+                        return None
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                quiet_until = self._last_at + self.debounce
+                latest = self._first_at + self.max_delay
+                if self._stopped or now >= min(quiet_until, latest):
+                    batch, self._pending = self._pending, {}
+                    self._first_at = self._last_at = None
+                    self.busy = True
+                    return batch
+                self._cond.wait(min(quiet_until, latest) - now)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.monotonic()
+            try:
+                self.process_batch(batch)
+            except Exception:
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self.busy = False
+                    self.batches_run += 1
+                    self.paths_processed += len(batch)
+                    self.largest_batch = max(self.largest_batch, len(batch))
+                    self.last_batch_seconds = time.monotonic() - started
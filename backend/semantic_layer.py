@@ -0,0 +1,142 @@
+"""Doc -> doc semantic links kept in sync with a long-lived paragraph index.
+
+Each doc's full text is a query against every indexed paragraph. The
+`top_k` best hits are kept per doc, and every other doc among them that
+scores at least `threshold` becomes a link with its best score.
+
+A batch of edits only recomputes what it can change:
+- docs whose text changed are queried again,
+- every other doc is scored against the new paragraphs only, which are
+  merged into its kept hits,
+- a doc that had a changed or removed paragraph among its hits is queried
+  again with its cached query vector, since the hit that would take the
+  freed slot is not known.
+
+With exact search the links equal a full pass over the current texts;
+`bench.incremental` checks this against fresh builds.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, Iterable, List, Set, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+Hit = Tuple[float, str, str]  # (score, doc, paragraph md5)
+
+SEMANTIC_TOP_K = 10
+# scores are ranked at this precision, so paragraphs that score the same (a
+# boilerplate paragraph shared by several docs) tie exactly and go by doc
+# name, whichever matmul computed them; the index is asked for `top_k`
+# extra candidates to have all of a tie at the cut
+SCORE_DECIMALS = 4
+SEMANTIC_THRESHOLD = float(os.environ.get("SEMANTIC_THRESHOLD", "0.70"))
+
+
+class SemanticLayer:
+    """Top-k paragraph hits per doc over a `DocIndex`, and the links they give."""
+
+    def __init__(self, index, top_k: int = SEMANTIC_TOP_K, threshold: float = SEMANTIC_THRESHOLD):
+        self.index = index
+        self.top_k = top_k
+        self.threshold = threshold
+        # doc -> best hits, by `_rank`
+        self._hits: Dict[str, List[Hit]] = {}
+        # doc -> normalized query vector of its full text
+        self._queries: Dict[str, "np.ndarray"] = {}
+
+    def build(self, texts: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+        """Query every doc; returns {from_doc: {to_doc: score}} for docs with links."""
+        self._hits, self._queries = {}, {}
+        self._query(texts, list(texts))
+        links = {fn: self.links(fn) for fn in self._hits}
+        return {fn: targets for fn, targets in links.items() if targets}
+
+    def options(self) -> Dict:
+        """What saved hits depend on besides the texts: model, `top_k`, `threshold`."""
+        return {"model": getattr(self.index, "model_name", None), "top_k": self.top_k, "threshold": self.threshold}
+
+    def state(self) -> Tuple[Dict[str, List[Hit]], Dict[str, "np.ndarray"]]:
+        """(hits, query vectors) per doc, to be saved and handed to `restore`."""
+        return {fn: list(hits) for fn, hits in self._hits.items()}, dict(self._queries)
+
+    def restore(self, hits: Dict[str, List[Hit]], queries: Dict[str, "np.ndarray"]) -> None:
+        """Take over the `state` of a layer with the same `options` over the same texts, instead of `build`."""
+        self._hits, self._queries = dict(hits), dict(queries)
+
+    def update(self, texts: Dict[str, str], updated: Iterable[str], removed: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        """Apply edited and removed docs; `texts` holds every current doc.
+
+        Returns the links of every doc whose hits may have changed, empty
+        when it has none left. Removed docs are not in the result.
+        """
+        updated = [fn for fn in updated if fn in texts]
+        removed = list(removed)
+        changed = self.index.update_docs({fn: texts[fn] for fn in updated}, removed)
+        for fn in removed + updated:
+            self._hits.pop(fn, None)
+            self._queries.pop(fn, None)
+        requery = set(updated)
+        if changed:
+            for fn, hits in self._hits.items():
+                if any((doc, h) in changed for _, doc, h in hits):
+                    requery.add(fn)
+        merged = self._merge(changed, [fn for fn in self._hits if fn not in requery])
+        self._query(texts, sorted(requery))
+        return {fn: self.links(fn) for fn in requery | merged}
+
+    def links(self, fn: str) -> Dict[str, float]:
+        """{to_doc: best score} of `fn`'s hits at or above the threshold."""
+        out: Dict[str, float] = {}
+        for score, doc, _ in self._hits.get(fn, ()):
+            if score < self.threshold:
+                break
+            if doc != fn and doc not in out:
+                out[doc] = score
+        return out
+
+    def _query(self, texts: Dict[str, str], names: List[str]) -> None:
+        todo = [fn for fn in names if fn not in self._queries]
+        if todo:
+            self._queries.update(zip(todo, self.index.encode_queries([texts[fn] for fn in todo])))
+        if not names:
+            return
+        idx, scores = self.index.query_vectors(np.stack([self._queries[fn] for fn in names]), top_k=2 * self.top_k)
+        doc_names, doc_ids, hashes = self.index.doc_names, self.index.doc_ids, self.index.hashes
+        scores = np.round(scores.astype(np.float64), SCORE_DECIMALS)
+        for fn, rows, row_scores in zip(names, idx.tolist(), scores.tolist()):
+            hits = [(s, doc_names[doc_ids[r]], hashes[r]) for r, s in zip(rows, row_scores) if r >= 0]
+            self._hits[fn] = self._rank(hits)
+
+    def _merge(self, changed: Set[Tuple[str, str]], names: List[str]) -> Set[str]:
+        """Score `names` against the rows of `changed` keys only; returns the docs whose hits changed."""
+        index = self.index
+        rows, keys = [], []
+        for r in index.rows_of({doc for doc, _ in changed}):
+            key = (index.doc_names[index.doc_ids[r]], index.hashes[r])
+            if key in changed:
+                rows.append(r)
+                keys.append(key)
+        if not rows or not names:
+            return set()
+        sims = index.row_scores(np.stack([self._queries[fn] for fn in names]), rows)
+        # a new paragraph only matters to a doc if it reaches that doc's current k-th hit
+        sims = np.round(sims.astype(np.float64), SCORE_DECIMALS)
+        floor = np.array([hits[-1][0] if len(hits) >= self.top_k else -np.inf for hits in (self._hits[fn] for fn in names)])
+        extra: Dict[int, List[Hit]] = {}
+        for i, j in zip(*np.nonzero(sims >= floor[:, None])):
+            extra.setdefault(int(i), []).append((float(sims[i, j]), *keys[j]))
+        merged = set()
+        for i, hits in extra.items():
+            fn = names[i]
+            self._hits[fn] = self._rank(self._hits[fn] + hits)
+            merged.add(fn)
+        return merged
+
+    def _rank(self, hits: List[Hit]) -> List[Hit]:
+        # a strict order, so the top k are the same however the hits were collected
+        return sorted(hits, key=lambda hit: (-hit[0], hit[1], hit[2]))[: self.top_k]
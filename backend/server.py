@@ -2,13 +2,26 @@ import asyncio
 import json
 import threading
 import os
-from typing import List
+import uuid
+from typing import Callable, Dict, List, Literal, Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import uvicorn
 
-from doc_watcher import start_watchdog, load_prev_state, scan_all_docs_and_update, save_prev_state
+from bootstrap import progress
+from doc_watcher import (
+    IMPACT_MIN_CONFIDENCE,
+    current_dependency_graph,
+    load_prev_state,
+    save_graph_snapshot,
+    save_prev_state,
+    scan_all_docs_and_update,
+    start_watchdog,
+)
+from event_log import EVENT_LOG_FILE, EVENT_LOG_PERSIST, EventLog, encode_event
+from metrics import metrics
 
 app = FastAPI()
 
@@ -19,49 +32,169 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+WS_SEND_QUEUE = int(os.environ.get("WS_SEND_QUEUE", "256"))
+WS_SLOW_POLICY = os.environ.get("WS_SLOW_POLICY", "drop").lower()  # drop | disconnect
+
+
+class _Client:
+    __slots__ = ("websocket", "queue", "writer", "dropped", "cursor")
+
+    def __init__(self, websocket: WebSocket, max_queue: int, cursor: int = 0):
+        self.websocket = websocket
+        # (seq or None, text)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.writer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        # events with seq <= cursor were already sent in a replay
+        self.cursor = cursor
+
+
 # Store active connections
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """Fan-out to websocket clients without letting one client stall the rest.
+
+    Every connection has a bounded send queue drained by its own writer
+    task, and `broadcast` only enqueues a payload serialized once. When a
+    client's queue is full, `slow_policy` "drop" discards that client's
+    oldest queued message and "disconnect" closes the connection. A
+    connection whose send fails is removed.
+
+    A client registered with a replay `backlog` gets it first, and live
+    events it already received in that backlog are skipped.
+    """
+
+    def __init__(self, max_queue: int = WS_SEND_QUEUE, slow_policy: str = WS_SLOW_POLICY):
+        self.max_queue = max(1, max_queue)
+        self.slow_policy = slow_policy
+        self._clients: Dict[WebSocket, _Client] = {}
+        # counters
+        self.sent = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.pruned = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self._clients)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.register(websocket)
+
+    def register(self, websocket: WebSocket, backlog: Optional[str] = None, cursor: int = 0) -> None:
+        """Start the writer for an accepted websocket."""
+        client = _Client(websocket, self.max_queue, cursor)
+        if backlog is not None:
+            client.queue.put_nowait((None, backlog))
+        client.writer = asyncio.get_running_loop().create_task(self._write(client))
+        self._clients[websocket] = client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self._clients.pop(websocket, None)
+        if client is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+        self.broadcast_text(encode_event(message))
+
+    def broadcast_text(self, text: str, seq: Optional[int] = None) -> None:
+        """Queue an already serialized event for every client (event loop thread)."""
+        item = (seq, text)
+        for client in list(self._clients.values()):
             try:
-                await connection.send_json(message)
-            except Exception:
-                pass
+                client.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self._on_slow(client, item)
+
+    def stats(self) -> Dict[str, int]:
+        queued = [c.queue.qsize() for c in self._clients.values()]
+        return {
+            "connections": len(queued),
+            "queued": sum(queued),
+            "max_queue_depth": max(queued, default=0),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "pruned": self.pruned,
+        }
+
+    def _on_slow(self, client: _Client, item) -> None:
+        if self.slow_policy == "disconnect":
+            self.slow_disconnects += 1
+            self.disconnect(client.websocket)
+            asyncio.get_running_loop().create_task(self._close(client.websocket, 1013))
+            return
+        client.queue.get_nowait()
+        client.queue.put_nowait(item)
+        client.dropped += 1
+        self.dropped += 1
+
+    async def _write(self, client: _Client) -> None:
+        try:
+            while True:
+                seq, text = await client.queue.get()
+                if seq is not None and seq <= client.cursor:
+                    continue
+                await client.websocket.send_text(text)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # the socket is gone; stop sending to it
+            if self._clients.get(client.websocket) is client:
+                self.pruned += 1
+                self.disconnect(client.websocket)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int) -> None:
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
 
 manager = ConnectionManager()
+metrics.register("websocket", manager.stats, counters=("sent", "dropped", "slow_disconnects", "pruned"))
 
 # Event loop for the main thread (FastAPI)
 # We need a way to bridge the sync callback from watchdog to the async websocket broadcast
 # We'll use an asyncio loop running in the main thread, but the watchdog runs in a separate thread.
 # The callback is called from the watchdog thread.
-# We can use `asyncio.run_coroutine_threadsafe` if we have access to the loop.
+# We use `loop.call_soon_threadsafe` to hand each serialized event to the manager.
 
 loop = None
+# replay buffer for reconnecting clients; opened at startup
+event_log: Optional[EventLog] = None
 
 def on_change_event(event):
     """Callback called by doc_watcher from a background thread."""
     print(f"Server received event: {event['changed_doc']}")
+    # number, serialize and log here, once, and only hand the text to the event loop
+    def publish(seq, text):
+        if loop and loop.is_running():
+            loop.call_soon_threadsafe(manager.broadcast_text, text, seq)
+
+    if event_log is not None:
+        # scheduled under the log's lock: the watcher and the LLM workers both
+        # emit events, and clients drop any seq at or below their cursor
+        event_log.append(event, publish)
+    else:
+        publish(None, encode_event(event))
+
+def on_indexing_progress(snapshot: dict):
+    """Cold-start progress for connected clients (not logged, not replayed)."""
     if loop and loop.is_running():
-        asyncio.run_coroutine_threadsafe(manager.broadcast(event), loop)
+        loop.call_soon_threadsafe(manager.broadcast_text, encode_event({"type": "indexing", **snapshot}))
 
 def start_background_watcher():
     """Starts the doc_watcher in a separate thread."""
     print("Starting background watcher...")
     prev = load_prev_state()
-    if not prev:
-        scan_all_docs_and_update(prev)
+    # build the initial snapshot, or refresh only the docs edited since the last run
+    if scan_all_docs_and_update(prev) or not prev:
         save_prev_state(prev)
     
     # This blocks, so run in thread
@@ -69,21 +202,48 @@ def start_background_watcher():
 
 @app.on_event("startup")
 async def startup_event():
-    global loop
+    global loop, event_log
     loop = asyncio.get_running_loop()
+    event_log = EventLog(path=EVENT_LOG_FILE if EVENT_LOG_PERSIST else None)
+    metrics.register("event_log", lambda: {"last_seq": event_log.last_seq, "retained": len(event_log)})
+    metrics.register("indexing", progress.snapshot)
+    progress.subscribe(on_indexing_progress)
     
     # Start watchdog in a daemon thread
     t = threading.Thread(target=start_background_watcher, daemon=True)
     t.start()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    # the watcher runs on a daemon thread and never reaches its own cleanup
+    save_graph_snapshot()
+
+def replay_frame(events, complete: bool) -> str:
+    """One message carrying logged events, already serialized, in order."""
+    last_seq = events[-1][0] if events else None
+    return (
+        f'{{"type":"replay","complete":{json.dumps(complete)},"last_seq":{json.dumps(last_seq)},'
+        f'"events":[{",".join(text for _, text in events)}]}}'
+    )
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, since: Optional[int] = None):
+    # ?since=<seq> replays the logged events after that seq, then streams live
+    await websocket.accept()
+    if since is None or event_log is None:
+        manager.register(websocket)
+    else:
+        # no await between the snapshot and registering, so no live event is missed
+        events, complete = event_log.since(since)
+        cursor = events[-1][0] if events else (since if complete else 0)
+        manager.register(websocket, backlog=replay_frame(events, complete), cursor=cursor)
     try:
         while True:
             # Keep connection alive
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 from pydantic import BaseModel
@@ -109,5 +269,129 @@ async def update_doc(request: UpdateDocRequest):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# Graph queries: answered from the watcher's in-memory graph, never by rescanning docs/.
+# Each response carries the graph version as its ETag; polls with a matching
+# If-None-Match get 304.
+
+GRAPH_PAGE_LIMIT = int(os.environ.get("GRAPH_PAGE_LIMIT", "500"))
+GRAPH_MAX_LIMIT = 5000
+GRAPH_MAX_DEPTH = 10
+# versions restart with the process, so ETags also name the run
+_graph_epoch = uuid.uuid4().hex[:8]
+
+
+def _graph_view():
+    graph = current_dependency_graph()
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Dependency graph is still being built", headers={"Retry-After": "1"})
+    return graph.view()
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _versioned(request: Request, view, build: Callable[[], dict]) -> Response:
+    etag = f'"{_graph_epoch}-{view.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
+
+
+def _page_info(total: int, offset: int, limit: int) -> dict:
+    end = min(total, offset + limit)
+    return {"total": total, "offset": offset, "limit": limit, "next_offset": end if end < total else None}
+
+
+@app.get("/graph")
+def get_graph(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(GRAPH_PAGE_LIMIT, ge=1, le=GRAPH_MAX_LIMIT),
+):
+    """All docs, sorted by name and paginated, each page with its docs' outgoing edges."""
+    view = _graph_view()
+    return _versioned(request, view, lambda: view.page(offset, limit))
+
+
+@app.get("/graph/neighbourhood/{doc}")
+def get_neighbourhood(
+    request: Request,
+    doc: str,
+    depth: int = Query(1, ge=0, le=GRAPH_MAX_DEPTH),
+    direction: Literal["in", "out", "both"] = "both",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(GRAPH_PAGE_LIMIT, ge=1, le=GRAPH_MAX_LIMIT),
+):
+    """Docs within `depth` hops of `doc`, nearest first.
+
+    Each edge is returned once, on the page of whichever of its two docs
+    comes later, so a page's edges only reference docs seen so far.
+    """
+    view = _graph_view()
+    if doc not in view:
+        raise HTTPException(status_code=404, detail=f"Unknown doc: {doc}")
+
+    def build():
+        hood = view.neighbourhood(doc, depth, direction)
+        nodes = hood["nodes"]
+        pos = {n["doc"]: i for i, n in enumerate(nodes)}
+        end = offset + limit
+        edges = [e for e in hood["edges"] if offset <= max(pos[e["from_doc"]], pos[e["to_doc"]]) < end]
+        return {
+            "version": view.version,
+            "doc": doc,
+            "depth": depth,
+            "direction": direction,
+            **_page_info(len(nodes), offset, limit),
+            "nodes": nodes[offset:end],
+            "edges": edges,
+        }
+
+    return _versioned(request, view, build)
+
+
+@app.get("/graph/dependents/{doc}")
+def get_dependents(
+    request: Request,
+    doc: str,
+    depth: int = Query(1, ge=1, le=GRAPH_MAX_DEPTH),
+    min_confidence: float = Query(IMPACT_MIN_CONFIDENCE, ge=0.0, le=1.0),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(GRAPH_PAGE_LIMIT, ge=1, le=GRAPH_MAX_LIMIT),
+):
+    """Docs that depend on `doc` (transitively when depth > 1), strongest first."""
+    view = _graph_view()
+    if doc not in view:
+        raise HTTPException(status_code=404, detail=f"Unknown doc: {doc}")
+
+    def build():
+        rows = view.dependents(doc, depth, min_confidence)
+        return {
+            "version": view.version,
+            "doc": doc,
+            "depth": depth,
+            **_page_info(len(rows), offset, limit),
+            "dependents": rows[offset : offset + limit],
+        }
+
+    return _versioned(request, view, build)
+
+
+@app.get("/indexing")
+def get_indexing():
+    """Cold-start progress: phase (scan, embed, graph, ready), counts and timings."""
+    return progress.snapshot()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Stage latency histograms and pipeline counters in Prometheus text format."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
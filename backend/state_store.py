@@ -0,0 +1,134 @@
+"""SQLite-backed paragraph snapshot (replaces rewriting prev_paragraphs.json).
+
+The watcher keeps its snapshot as a plain dict, `{doc: [(paragraph, md5), ...]}`,
+plus per-file fingerprints. `StateStore.save` diffs that dict against what it
+last wrote and rewrites only the rows of docs that changed, inside one
+transaction. An event therefore costs I/O proportional to the edited doc,
+not the corpus. The database runs in WAL mode, so a crash leaves either the
+previous or the new snapshot, never a half-written file.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS paragraphs (
+    doc TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (doc, pos)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS docs (doc TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS fingerprints (
+    doc TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    md5 TEXT NOT NULL,
+    checked_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class StateStore:
+    """Incremental, transactional store for the paragraph snapshot.
+
+    `load` returns `(state, fingerprints)`; `save(state, fingerprints)` writes
+    only what differs from the last load/save. Docs are compared by
+    identity first: the watcher replaces a doc's list on every change, so
+    an unchanged doc costs one pointer comparison.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL in WAL mode: commits stay atomic, only the last one can be lost on power failure
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),)
+        )
+        # what the database currently holds, as the objects last saved
+        self._written: Dict[str, List[Tuple[str, str]]] = {}
+        self._written_fps: Dict[str, Dict] = {}
+        self.rows_written = 0
+        self.commits = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM docs LIMIT 1").fetchone() is None
+
+    def load(self) -> Tuple[Dict[str, List[Tuple[str, str]]], Dict[str, Dict]]:
+        with self._lock:
+            state: Dict[str, List[Tuple[str, str]]] = {
+                doc: [] for (doc,) in self._conn.execute("SELECT doc FROM docs")
+            }
+            for doc, text, h in self._conn.execute("SELECT doc, text, hash FROM paragraphs ORDER BY doc, pos"):
+                state[doc].append((text, h))
+            fingerprints = {
+                doc: {"mtime_ns": m, "size": s, "md5": h, "checked_ns": c}
+                for doc, m, s, h, c in self._conn.execute(
+                    "SELECT doc, mtime_ns, size, md5, checked_ns FROM fingerprints"
+                )
+            }
+            self._written = dict(state)
+            self._written_fps = dict(fingerprints)
+            return state, fingerprints
+
+    def save(self, state: Dict[str, List[Tuple[str, str]]], fingerprints: Dict[str, Dict] = None) -> int:
+        """Write the docs whose snapshot changed in one transaction; returns docs written."""
+        state = dict(state)
+        fingerprints = {k: v for k, v in dict(fingerprints or {}).items() if k in state}
+        with self._lock:
+            changed = [d for d, pars in state.items() if self._written.get(d) is not pars and self._written.get(d) != pars]
+            gone = [d for d in self._written if d not in state]
+            fp_changed = [d for d, fp in fingerprints.items() if self._written_fps.get(d) != fp]
+            fp_gone = [d for d in self._written_fps if d not in fingerprints]
+            if not (changed or gone or fp_changed or fp_gone):
+                return 0
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for doc in gone + changed:
+                    cur.execute("DELETE FROM paragraphs WHERE doc = ?", (doc,))
+                cur.executemany("DELETE FROM docs WHERE doc = ?", [(d,) for d in gone])
+                cur.executemany("INSERT OR IGNORE INTO docs (doc) VALUES (?)", [(d,) for d in changed])
+                rows = [(doc, pos, p, h) for doc in changed for pos, (p, h) in enumerate(state[doc])]
+                cur.executemany("INSERT INTO paragraphs (doc, pos, text, hash) VALUES (?, ?, ?, ?)", rows)
+                cur.executemany("DELETE FROM fingerprints WHERE doc = ?", [(d,) for d in fp_gone])
+                cur.executemany(
+                    "INSERT OR REPLACE INTO fingerprints (doc, mtime_ns, size, md5, checked_ns) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (d, fingerprints[d]["mtime_ns"], fingerprints[d]["size"], fingerprints[d]["md5"], fingerprints[d]["checked_ns"])
+                        for d in fp_changed
+                    ],
+                )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            for doc in gone:
+                del self._written[doc]
+            for doc in changed:
+                self._written[doc] = state[doc]
+            for doc in fp_gone:
+                del self._written_fps[doc]
+            for doc in fp_changed:
+                self._written_fps[doc] = dict(fingerprints[doc])
+            self.rows_written += len(rows)
+            self.commits += 1
+            return len(changed) + len(gone)
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from rag.fake_llm import FakeLLM
+from rag.llm_pool import LLMWorkerPool
+
+
+def event(doc, summary="Refund window changed."):
+    return {"changed_doc": doc, "summary": summary, "impacted_docs": {"FAQ_Refunds": []}}
+
+
+def collect(pool_kwargs, events, wait=5.0, between=0.0):
+    """Submit `events` to a fresh pool; returns (results, pool) once one result arrived per doc."""
+    results = []
+    done = threading.Event()
+    docs = {e["changed_doc"] for e in events}
+
+    def on_result(ev, result):
+        results.append((ev, result))
+        if len({ev["changed_doc"] for ev, _ in results}) == len(docs):
+            done.set()
+
+    pool = LLMWorkerPool(on_result=on_result, batch_size=1, concurrency=1, **pool_kwargs).start()
+    for e in events:
+        pool.submit(e)
+        time.sleep(between)
+    done.wait(wait)
+    time.sleep(0.1)  # let a superseded call finish, so a late result would show
+    pool.stop(timeout=1.0)
+    return results, pool
+
+
+def test_retry_with_backoff():
+    fake = FakeLLM(latency=0, fail_rate=1.0)
+
+    def run(ev):
+        # the first two calls fail, the third succeeds
+        if fake.calls >= 2:
+            fake.fail_rate = 0.0
+        return fake(ev)
+
+    started = time.monotonic()
+    results, pool = collect({"run": run, "retries": 2, "backoff": 0.05}, [event("RefundPolicy")])
+    assert len(results) == 1 and results[0][1]["impacted_docs"] == ["FAQ_Refunds"], results
+    assert fake.calls == 3 and pool.retried == 2 and pool.failed == 0, pool.stats()
+    # two backoffs of at least backoff * 2**attempt * 0.5
+    assert time.monotonic() - started >= 0.05 * 0.5 + 0.1 * 0.5
+
+    fake = FakeLLM(latency=0, fail_rate=1.0)
+    results, pool = collect({"run": fake, "retries": 1, "backoff": 0.01}, [event("RefundPolicy")])
+    assert results[0][1]["summary"].startswith("LLM call failed after 2 attempt(s)"), results
+    assert fake.calls == 2 and pool.failed == 1, pool.stats()
+    print("retry/backoff: ok")
+
+
+def test_timeout():
+    fake = FakeLLM(latency=0.5)
+    results, pool = collect({"run": fake, "retries": 0, "timeout": 0.1}, [event("RefundPolicy")])
+    assert "timed out after 0.1s" in results[0][1]["summary"], results
+    assert pool.timeouts == 1 and pool.failed == 1, pool.stats()
+    print("timeout: ok")
+
+
+def test_superseded():
+    # a newer change to the same doc cancels the running call; only its result is delivered
+    fake = FakeLLM(latency=0.3)
+    events = [event("RefundPolicy", "first"), event("RefundPolicy", "second")]
+    results, pool = collect({"run": fake, "retries": 0}, events, between=0.1)
+    assert [ev["summary"] for ev, _ in results] == ["second"], results
+    assert fake.calls == 2 and pool.superseded == 1 and pool.completed == 1, pool.stats()
+
+    # a job waiting out its backoff is dropped as soon as it is cancelled
+    fake = FakeLLM(latency=0, fail_rate=1.0)
+    pool = LLMWorkerPool(run=fake, batch_size=1, concurrency=1, retries=3, backoff=30.0).start()
+    pool.submit(event("RefundPolicy"))
+    time.sleep(0.1)
+    started = time.monotonic()
+    pool.cancel("RefundPolicy")
+    pool.stop(timeout=2.0)
+    assert time.monotonic() - started < 1.0 and fake.calls == 1 and pool.completed == 0, pool.stats()
+    print("superseded/cancel: ok")
+
+
+def main():
+    test_retry_with_backoff()
+    test_timeout()
+    test_superseded()
+    print("=== LLM POOL OK ===")
+
+
+if __name__ == "__main__":
+    main()
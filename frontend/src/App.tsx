@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { GitBranch, RefreshCw, Activity, Plus, List, Network, FileText } from 'lucide-react';
 import { DocList } from './components/DocList';
 import { DiffViewer } from './components/DiffViewer';
@@ -53,62 +53,123 @@ export default function App() {
   const [impactEvent, setImpactEvent] = useState(initialImpactEvent);
   const [impactReport, setImpactReport] = useState(initialImpactReport);
 
+  // Last event seq seen; reconnects resume from it instead of losing events
+  const lastSeq = useRef<number | null>(null);
+  // Doc the impact report belongs to; LLM results for any other change are stale
+  const currentDoc = useRef<string>(initialChangeEvent.doc_id);
+
   // WebSocket connection
   useEffect(() => {
-    const ws = new WebSocket('ws://localhost:8000/ws');
+    let ws: WebSocket;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
 
-    ws.onopen = () => {
-      console.log('Connected to WebSocket');
-    };
+    const applyEvent = (data: any) => {
+      if (typeof data.seq === 'number') {
+        lastSeq.current = Math.max(lastSeq.current ?? 0, data.seq);
+      }
 
-    ws.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data);
-        console.log('Received event:', data);
-
-        // Map backend event to frontend ChangeEvent
-        const newChangeEvent: ChangeEvent = {
-          doc_id: data.changed_doc,
-          old_version: 'Previous',
-          new_version: 'Current',
-          timestamp: new Date().toISOString(),
-          old_text_snippet: data.old_snippets ? data.old_snippets.join('\n') : '',
-          new_text_snippet: data.new_snippets ? data.new_snippets.join('\n') : '',
-          diff_blocks: [
-            ...(data.old_snippets || []).map((t: string) => ({ type: 'removed' as const, text: t })),
-            ...(data.new_snippets || []).map((t: string) => ({ type: 'added' as const, text: t })),
-          ],
-        };
-
-        setChangeEvent(newChangeEvent);
-        setSelectedDocId(data.changed_doc);
-        setLastUpdated(new Date());
-
-        // Map impacted docs
-        if (data.impacted_docs) {
-          const newImpactReports = Object.entries(data.impacted_docs).map(([docId, snippets]) => {
-            const doc = documents.find(d => d.id === docId);
-            return {
-              doc_id: docId,
-              severity: 'HIGH' as const, // Default to HIGH for now
-              issue_summary: `Dependency impact detected from ${data.changed_doc}`,
-              suggested_rewrite: `Review the following snippets: ${(snippets as string[]).join(', ')}`,
-              impacted_section: 'Content dependency'
-            };
-          });
-          setImpactReport(newImpactReports);
-          setImpactEvent({
-            changed_doc: data.changed_doc,
-            affected_docs: Object.keys(data.impacted_docs)
-          });
+      // LLM enrichment arrives as a follow-up for the doc that changed
+      if (data.type === 'llm_result') {
+        if (data.changed_doc !== currentDoc.current) {
+          return;
         }
+        const llm = data.llm || {};
+        const level = String(llm.severity || '').toUpperCase();
+        const severity = level === 'LOW' || level === 'MEDIUM' || level === 'HIGH' ? level : null;
+        setImpactReport(reports => reports.map(report => ({
+          ...report,
+          severity: severity ?? report.severity,
+          issue_summary: llm.summary || report.issue_summary,
+        })));
+        return;
+      }
+
+      // Map backend event to frontend ChangeEvent
+      const newChangeEvent: ChangeEvent = {
+        doc_id: data.changed_doc,
+        old_version: 'Previous',
+        new_version: 'Current',
+        timestamp: new Date().toISOString(),
+        old_text_snippet: data.old_snippets ? data.old_snippets.join('\n') : '',
+        new_text_snippet: data.new_snippets ? data.new_snippets.join('\n') : '',
+        diff_blocks: [
+          ...(data.old_snippets || []).map((t: string) => ({ type: 'removed' as const, text: t })),
+          ...(data.new_snippets || []).map((t: string) => ({ type: 'added' as const, text: t })),
+        ],
+      };
+
+      setChangeEvent(newChangeEvent);
+      setSelectedDocId(data.changed_doc);
+      setLastUpdated(new Date());
 
-      } catch (error) {
-        console.error('Error parsing WebSocket message:', error);
+      // Map impacted docs
+      if (data.impacted_docs) {
+        const newImpactReports = Object.entries(data.impacted_docs).map(([docId, snippets]) => {
+          const doc = documents.find(d => d.id === docId);
+          return {
+            doc_id: docId,
+            severity: 'HIGH' as const, // Default to HIGH for now
+            issue_summary: `Dependency impact detected from ${data.changed_doc}`,
+            suggested_rewrite: `Review the following snippets: ${(snippets as string[]).join(', ')}`,
+            impacted_section: 'Content dependency'
+          };
+        });
+        currentDoc.current = data.changed_doc;
+        setImpactReport(newImpactReports);
+        setImpactEvent({
+          changed_doc: data.changed_doc,
+          affected_docs: Object.keys(data.impacted_docs)
+        });
       }
     };
 
+    const connect = () => {
+      // only a reconnect resumes; a first connect starts from live events
+      const since = lastSeq.current;
+      ws = new WebSocket(since === null ? 'ws://localhost:8000/ws' : `ws://localhost:8000/ws?since=${since}`);
+
+      ws.onopen = () => {
+        console.log('Connected to WebSocket');
+      };
+
+      ws.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+          console.log('Received event:', data);
+
+          // events missed while disconnected arrive in one replay message
+          if (data.type === 'replay') {
+            if (!data.complete) {
+              console.warn('Event log no longer covers the last seen event; some changes were missed');
+            }
+            // applyEvent tracks the current doc as it goes, so a replayed
+            // llm_result only lands on the change it followed
+            (data.events || []).forEach(applyEvent);
+            return;
+          }
+          // cold-start progress from the server, not a document change
+          if (data.type === 'indexing') {
+            return;
+          }
+          applyEvent(data);
+        } catch (error) {
+          console.error('Error parsing WebSocket message:', error);
+        }
+      };
+
+      ws.onclose = () => {
+        if (!closed) {
+          retry = setTimeout(connect, 2000);
+        }
+      };
+    };
+
+    connect();
+
     return () => {
+      closed = true;
+      clearTimeout(retry);
       ws.close();
     };
   }, [documents]);